@@ -13,6 +13,8 @@ from datetime import datetime
 import matplotlib.pyplot as plt
 
 from simulation.simulation_analyzer import BracketAnalyzer, analyze_simulations
+from utils.scoring import RULE_SET_PRESETS
+from utils.kernels import BACKENDS, BACKEND_ENV_VAR, set_backend
 
 def parse_arguments():
     """Parse command line arguments."""
@@ -42,17 +44,51 @@ def parse_arguments():
         default='saved_brackets',
         help='Directory containing user brackets (default: saved_brackets)'
     )
+    parser.add_argument(
+        '--rule-sets',
+        nargs='+',
+        choices=sorted(RULE_SET_PRESETS),
+        help='Also analyze under these preset rule sets, scored in the same pass; '
+             'the first one is the primary analysis (e.g. standard no_bonus flat). '
+             'Streaming pipeline runs score the standard rules only; run them with '
+             '--save-simulations and analyze the file here to compare rule sets'
+    )
+    parser.add_argument(
+        '--rule-sets-file',
+        type=str,
+        help='JSON file mapping rule set names to {"round_points": {...}, "bonus_multipliers": {...}} '
+             'overrides by round name; added after --rule-sets'
+    )
     parser.add_argument(
         '--visualize',
         action='store_true',
         help='Generate visualizations of the results'
     )
+    parser.add_argument(
+        '--chunk-size',
+        type=int,
+        help='Analyze the simulations in blocks of this many without keeping the full score '
+             'and rank matrices, so memory does not grow with the simulation count'
+    )
+    parser.add_argument(
+        '--no-head-to-head',
+        action='store_true',
+        help='Skip the head-to-head matrix of how often each user finishes ahead of each other user'
+    )
+    parser.add_argument(
+        '--backend',
+        choices=BACKENDS,
+        help=f'Kernel backend; numba compiles the simulation, scoring and ranking loops '
+             f'(default: ${BACKEND_ENV_VAR} or auto, which uses numba when installed)'
+    )
     
     return parser.parse_args()
 
 def main():
     """Main function to run the simulation analysis."""
     args = parse_arguments()
+    if args.backend:
+        set_backend(args.backend)
     
     # Validate input file
     if not os.path.exists(args.simulation_file):
@@ -76,22 +112,46 @@ def main():
     
     # Run the analysis
     try:
+        # Collect the rule sets to analyze, if any
+        rule_sets = None
+        if args.rule_sets or args.rule_sets_file:
+            rule_sets = {name: None for name in (args.rule_sets or [])}
+            if args.rule_sets_file:
+                with open(args.rule_sets_file, 'r') as f:
+                    rule_sets.update(json.load(f))
+        
         # Create the analyzer
-        analyzer = BracketAnalyzer()
+        analyzer = BracketAnalyzer(rule_sets=rule_sets)
         
         # Load simulations and user brackets
         analyzer.load_simulations(args.simulation_file)
         analyzer.load_user_brackets(args.user_brackets_dir)
         
-        # Calculate scores and rankings
-        print("Calculating scores...")
-        analyzer.calculate_scores()
-        
-        print("Calculating rankings...")
-        analyzer.calculate_rankings()
+        if args.chunk_size:
+            # Score, rank and accumulate one block of simulations at a time
+            print("Analyzing simulations in chunks...")
+            results = analyzer.analyze_in_chunks(args.chunk_size, head_to_head=not args.no_head_to_head)
+        elif rule_sets is not None:
+            print("Calculating scores...")
+            analyzer.calculate_scores()
+            
+            print("Analyzing rule sets...")
+            analyzer.analyze_rule_sets()
+            results = analyzer.analysis_results
+        else:
+            # Calculate scores and rankings
+            print("Calculating scores...")
+            analyzer.calculate_scores()
+            
+            print("Calculating rankings...")
+            analyzer.calculate_rankings()
+            
+            print("Analyzing results...")
+            results = analyzer.analyze_results()
         
-        print("Analyzing results...")
-        results = analyzer.analyze_results()
+        if not args.no_head_to_head and not args.chunk_size:
+            print("Calculating head-to-head results...")
+            analyzer.calculate_head_to_head()
         
         # Save the analysis results
         print(f"Saving analysis to: {analysis_file}")
@@ -138,6 +198,15 @@ def main():
         
         print("-" * table_width)
         
+        # Compare win chances under every rule set
+        if analyzer.rule_set_results:
+            names = list(analyzer.rule_set_results)
+            print("\nWin % by rule set:")
+            print(f"| {'USERNAME':<{username_width}} | " + " | ".join(f"{name:<{numeric_width}}" for name in names) + " |")
+            for username, _ in sorted_users:
+                row = [f"{analyzer.rule_set_results[name][username]['pct_first_place']:.1f}" for name in names]
+                print(f"| {username:<{username_width}} | " + " | ".join(f"{value:<{numeric_width}}" for value in row) + " |")
+        
         # Create visualizations if requested
         if args.visualize:
             print("\nGenerating visualizations...")
@@ -2,8 +2,12 @@ from flask import Flask, render_template, jsonify, request, redirect, url_for, s
 from data.teams import teams
 from datetime import datetime
 from bracket_logic import initialize_bracket, select_team, auto_fill_bracket, pretty_print_bracket, update_winners, random_fill_bracket, reset_team_completely
-from utils.scoring import compare_with_truth, calculate_points_for_pick, get_correct_picks_and_scores
+from utils.scoring import score_many, score_record, TruthState
 from utils.bracket_utils import get_sorted_truth_files
+from utils.bracket_encoding import NUM_SLOTS, encode_bracket, encode_brackets, get_slot
+from utils.timeline import ScoreTimeline
+from utils.comparison_cache import ComparisonCache
+from simulation.rooting_guide import first_place_file, load_rooting_guide
 import json
 import os
 import copy
@@ -13,6 +17,7 @@ import argparse
 import glob  # For finding truth bracket files
 import traceback
 import time  # Added import for time.time()
+import numpy as np
 
 # Add command-line argument parsing
 parser = argparse.ArgumentParser(description='March Madness Bracket Application')
@@ -31,6 +36,12 @@ READ_ONLY_MODE = args.read_only
 
 # No longer using a global bracket - each user will have their own in their session
 
+# Annotated brackets and score records shared across requests, by content hash
+comparison_cache = ComparisonCache()
+
+# Rooting guides by (analysis file, modification time of its first-place bitmaps)
+rooting_guides = {}
+
 # Ensure the saved_brackets directory exists
 os.makedirs('saved_brackets', exist_ok=True)
 # Ensure the truth_brackets directory exists
@@ -225,14 +236,9 @@ def index():
                 
         # Compare user bracket with truth data
         if truth_bracket:
-            # Create a copy of the user's bracket to avoid modifying the original
-            compared_bracket = copy.deepcopy(user_bracket)
-            
-            # Mark correct and incorrect picks
-            compared_bracket = compare_with_truth(compared_bracket, truth_bracket)
-            
-            # Use the compared bracket for display
-            user_bracket = compared_bracket
+            # Mark correct and incorrect picks; compare_with_truth works on a
+            # copy, so the original is not modified
+            user_bracket = comparison_cache.compare(user_bracket, truth_bracket)
             
         return render_template('index.html', 
                              username=display_username, 
@@ -514,7 +520,7 @@ def manage_bracket():
                 
             # Compare with truth bracket if available
             if truth_bracket:
-                comparison_data = compare_with_truth(user_bracket, truth_bracket)
+                comparison_data = comparison_cache.compare(user_bracket, truth_bracket)
                 print(f"Compared bracket with truth data")
             else:
                 comparison_data = None
@@ -856,7 +862,7 @@ def manage_bracket():
         # Get the appropriate truth bracket
         truth_bracket = get_most_recent_truth_bracket(selected_index)
         # Compare the user's bracket with the selected truth bracket
-        user_bracket = compare_with_truth(user_bracket, truth_bracket)
+        user_bracket = comparison_cache.compare(user_bracket, truth_bracket)
     
     print('Bracket data being returned:', pretty_print_bracket(user_bracket))
     return jsonify(user_bracket)
@@ -886,6 +892,14 @@ def get_bracket_status():
         print(f"Error getting bracket status: {str(e)}")
         return jsonify({"success": False, "error": str(e)}), 500
 
+@app.route('/api/cache-stats')
+def get_cache_stats():
+    """Get hit and miss counters of the bracket comparison cache."""
+    return jsonify({
+        "success": True,
+        "comparison_cache": comparison_cache.stats()
+    })
+
 def format_percentage(value):
     """Format a percentage value to 1 decimal place."""
     if value > 0 and value < 0.5:
@@ -893,8 +907,16 @@ def format_percentage(value):
     else: 
         return round(value, 0)
 
-def add_mc_data(truth_file, user_data):
-    # Load Monte Carlo analysis data if available
+def load_monte_carlo_analysis(truth_file):
+    """
+    Load the Monte Carlo analysis for a truth file.
+    
+    Args:
+        truth_file (str): Path to the truth file
+        
+    Returns:
+        dict: The analysis JSON, or an empty dict if there is none
+    """
     monte_carlo_data = {}
     if truth_file:
         # Find the Monte Carlo analysis file
@@ -909,6 +931,11 @@ def add_mc_data(truth_file, user_data):
                 print(f"Error loading Monte Carlo data: {str(e)}")
         else:
             print("No Monte Carlo analysis file found")
+    return monte_carlo_data
+
+def add_mc_data(truth_file, user_data):
+    # Load Monte Carlo analysis data if available
+    monte_carlo_data = load_monte_carlo_analysis(truth_file)
     
     # Add Monte Carlo data to user data if available
     if monte_carlo_data:
@@ -922,230 +949,30 @@ def add_mc_data(truth_file, user_data):
                 user['monte_carlo_max_rank'] = user_stats.get('max_rank', 0)
                 user['monte_carlo_min_score'] = user_stats.get('min_score', 0)
                 user['monte_carlo_max_score'] = user_stats.get('max_score', 0)
+                # Percentage of simulations finishing at each rank, for placement charts
+                user['monte_carlo_rank_distribution'] = user_stats.get('rank_distribution', {})
+                # Adaptive runs report a 95% confidence interval for the win percentage
+                if 'pct_first_place_ci_low' in user_stats:
+                    ci_low = user_stats['pct_first_place_ci_low']
+                    ci_high = user_stats['pct_first_place_ci_high']
+                    user['monte_carlo_pct_first_place_ci_low'] = round(ci_low, 2)
+                    user['monte_carlo_pct_first_place_ci_high'] = round(ci_high, 2)
+                    user['monte_carlo_pct_first_place_error'] = round((ci_high - ci_low) / 2, 1)
     return user_data, bool(monte_carlo_data)
 
-def get_users_list(truth_bracket):
+def load_user_entries():
     """
-    Process and return user data with scores based on the provided truth bracket.
+    Load the latest bracket of every user along with its leaderboard details.
     
-    Args:
-        truth_bracket: The truth bracket to compare user brackets against
-        
     Returns:
-        list: List of user data dictionaries with scores and rankings
+        tuple: (user_rows, brackets) where user_rows are leaderboard rows
+               without scores and brackets holds each user's latest bracket
+               (None if it could not be read), in the same order
     """
     # Get all unique usernames from saved bracket files
     users = set()
-    user_data = []
-
-    # Create "PERFECT" entry - get the truth bracket first
-    if truth_bracket:
-        # Use the existing compare_with_truth function to compare the truth bracket with itself
-        # This will mark all teams as correct and calculate bonus points
-        perfect_bracket = copy.deepcopy(truth_bracket)
-        compared_bracket = compare_with_truth(perfect_bracket, truth_bracket)
-        
-        # Count completed picks and extract champion
-        completed_picks = 0
-        champion = None
-        if compared_bracket.get("champion"):
-            champion = compared_bracket["champion"]["name"]
-        
-        # Initialize the perfect score dictionary
-        perfect_score = {
-            "round_1": 0, "round_2": 0, "round_3": 0,
-            "final_four": 0, "championship": 0, "champion": 0,
-            "total": 0,
-            "round_1_score": 0, "round_2_score": 0, "round_3_score": 0,
-            "final_four_score": 0, "championship_score": 0, "champion_score": 0,
-            "total_score": 0,
-            "round_1_bonus": 0, "round_2_bonus": 0, "round_3_bonus": 0,
-            "final_four_bonus": 0, "championship_bonus": 0, "champion_bonus": 0,
-            "total_bonus": 0, "total_with_bonus": 0
-        }
-        
-        # Count regional rounds (1-3)
-        for region in ["midwest", "west", "south", "east"]:
-            for round_idx in range(1, 4):
-                if region not in compared_bracket or round_idx >= len(compared_bracket[region]):
-                    continue
-                    
-                for team in compared_bracket[region][round_idx]:
-                    if not team:
-                        continue
-                        
-                    completed_picks += 1
-                    
-                    if team.get("correct", False):
-                        base_points, bonus_points = calculate_points_for_pick(team, round_idx)
-                        
-                        if round_idx == 1:
-                            perfect_score["round_1"] += 1
-                            perfect_score["round_1_score"] += base_points
-                        elif round_idx == 2:
-                            perfect_score["round_2"] += 1
-                            perfect_score["round_2_score"] += base_points
-                        elif round_idx == 3:
-                            perfect_score["round_3"] += 1
-                            perfect_score["round_3_score"] += base_points
-                        
-                        perfect_score["total"] += 1
-                        perfect_score["total_score"] += base_points
-                        
-                        # Add bonus if any
-                        if bonus_points > 0:
-                            bonus_key = f"round_{round_idx}_bonus"
-                            perfect_score[bonus_key] += bonus_points
-                            perfect_score["total_bonus"] += bonus_points
-        
-        # Count Final Four picks
-        for team in compared_bracket.get("finalFour", []):
-            if not team:
-                continue
-            
-            completed_picks += 1
-            
-            if team.get("correct", False):
-                perfect_score["final_four"] += 1
-                perfect_score["total"] += 1
-                
-                if team.get("bonus", 0) > 0:
-                    perfect_score["final_four_bonus"] += team["bonus"]
-                    perfect_score["total_bonus"] += team["bonus"]
-        
-        # Count Championship picks
-        for team in compared_bracket.get("championship", []):
-            if not team:
-                continue
-            
-            completed_picks += 1
-            
-            if team.get("correct", False):
-                perfect_score["championship"] += 1
-                perfect_score["total"] += 1
-                
-                if team.get("bonus", 0) > 0:
-                    perfect_score["championship_bonus"] += team["bonus"]
-                    perfect_score["total_bonus"] += team["bonus"]
-        
-        # Count Champion pick
-        if compared_bracket.get("champion"):
-            completed_picks += 1
-            
-            if compared_bracket["champion"].get("correct", False):
-                perfect_score["champion"] = 1
-                perfect_score["total"] += 1
-                
-                if compared_bracket["champion"].get("bonus", 0) > 0:
-                    perfect_score["champion_bonus"] = compared_bracket["champion"]["bonus"]
-                    perfect_score["total_bonus"] += compared_bracket["champion"]["bonus"]
-        
-        # Calculate scores using the standard point values
-        perfect_score["round_1_score"] = perfect_score["round_1"] * 10
-        perfect_score["round_2_score"] = perfect_score["round_2"] * 20
-        perfect_score["round_3_score"] = perfect_score["round_3"] * 40
-        perfect_score["final_four_score"] = perfect_score["final_four"] * 80
-        perfect_score["championship_score"] = perfect_score["championship"] * 120
-        perfect_score["champion_score"] = perfect_score["champion"] * 160
-        
-        # Calculate total score
-        perfect_score["total_score"] = (
-            perfect_score["round_1_score"] + 
-            perfect_score["round_2_score"] + 
-            perfect_score["round_3_score"] + 
-            perfect_score["final_four_score"] + 
-            perfect_score["championship_score"] + 
-            perfect_score["champion_score"]
-        )
-        
-        # Calculate total with bonus
-        perfect_score["total_with_bonus"] = perfect_score["total_score"] + perfect_score["total_bonus"]
-        
-        # Calculate remaining picks
-        picks_remaining = 63 - completed_picks
-        
-        # Generate an optimal future bracket that maximizes upset potential
-        optimal_future_bracket = generate_optimal_future_bracket(truth_bracket)
-        
-        # Score the optimal bracket using existing compare_with_truth function
-        scored_optimal_bracket = compare_with_truth(optimal_future_bracket, truth_bracket)
-        
-        # Calculate max possible scores from the scored optimal bracket
-        max_possible_score = {
-            "max_base": 0,
-            "max_bonus": 0,
-            "max_total": 0
-        }
-        
-        # Calculate scores for the optimal bracket
-        for region in ["midwest", "west", "south", "east"]:
-            for round_idx in range(4):  # 0 to 3 (First round through Elite Eight)
-                for team_idx, team in enumerate(scored_optimal_bracket[region][round_idx]):
-                    if team:
-                        # Calculate base points
-                        base_points, _ = calculate_points_for_pick(team, round_idx + 1)
-                        max_possible_score["max_base"] += base_points
-                        
-                        # Add bonus if exists
-                        if 'bonus' in team and team['bonus']:
-                            max_possible_score["max_bonus"] += team['bonus']
-        
-        # Final Four
-        for i, team in enumerate(scored_optimal_bracket["finalFour"]):
-            if team:
-                base_points, _ = calculate_points_for_pick(team, 4)
-                max_possible_score["max_base"] += base_points
-                
-                if 'bonus' in team and team['bonus']:
-                    max_possible_score["max_bonus"] += team['bonus']
-        
-        # Championship
-        for i, team in enumerate(scored_optimal_bracket["championship"]):
-            if team:
-                base_points, _ = calculate_points_for_pick(team, 5)
-                max_possible_score["max_base"] += base_points
-                
-                if 'bonus' in team and team['bonus']:
-                    max_possible_score["max_bonus"] += team['bonus']
-        
-        # Champion
-        if scored_optimal_bracket["champion"]:
-            base_points, _ = calculate_points_for_pick(scored_optimal_bracket["champion"], 6)
-            max_possible_score["max_base"] += base_points
-            
-            if 'bonus' in scored_optimal_bracket["champion"] and scored_optimal_bracket["champion"]['bonus']:
-                max_possible_score["max_bonus"] += scored_optimal_bracket["champion"]["bonus"]
-        
-        # Calculate total max possible points
-        max_possible_score["max_total"] = max_possible_score["max_base"] + max_possible_score["max_bonus"]
-        max_possible_total = max_possible_score["max_total"]
-        
-        # Create the perfect entry with maximum possible points
-        perfect_entry = {
-            "username": "PERFECT",
-            "last_updated": "Current truth bracket",
-            "bracket_count": 1,
-            "picks_remaining": picks_remaining,
-            "champion": champion,
-            "correct_picks": perfect_score,
-            # "max_possible_base": max_possible_score["max_base"],
-            # "max_possible_bonus": max_possible_score["max_bonus"],
-            # "max_possible_total": max_possible_score["max_total"],
-            "max_possible_base": 1680,
-            "max_possible_bonus": "-",
-            "max_possible_total": "-",
-            "max_possible_base_remaining": 1680 - perfect_score["total_score"],
-            "max_possible_bonus_remaining": "-",
-            "max_possible_total_remaining": "-",
-            "monte_carlo_pct_first_place": 0,
-            "monte_carlo_min_rank": 0,
-            "monte_carlo_max_rank": 0,
-            "monte_carlo_min_score": 0,
-            "monte_carlo_max_score": 0,
-        }
-        
-        # Add the perfect entry to the user data
-        user_data.append(perfect_entry)
+    user_rows = []
+    brackets = []
     
     # Get list of all bracket files
     for file in os.listdir('saved_brackets'):
@@ -1182,6 +1009,7 @@ def get_users_list(truth_bracket):
                     picks_remaining = 63  # Default - all picks remaining
                     champion = "None"  # Default - no champion selected
                     formatted_time = "Unknown"
+                    bracket_data = None
                     
                     if sorted_brackets:
                         latest_bracket_file = sorted_brackets[0][0]
@@ -1219,103 +1047,181 @@ def get_users_list(truth_bracket):
                             
                             # Calculate remaining picks
                             picks_remaining = 63 - completed_picks
-                            
-                  
-                            
-                            # Get the truth bracket
-                            if truth_bracket:
-                                # Create a copy of the user's bracket for comparison
-                                comparison_bracket = copy.deepcopy(bracket_data)
-                                
-                                # Use the compare_with_truth function to mark correct picks and calculate bonuses
-                                compared_bracket = compare_with_truth(comparison_bracket, truth_bracket)
-
-                            correct_picks = get_correct_picks_and_scores(compared_bracket) 
-                               
-                            # Check if champion is eliminated
-                            champion_eliminated = False
-                            if compared_bracket.get("champion") and compared_bracket["champion"].get("isEliminated", False):
-                                champion_eliminated = True
-
-                            # Calculate maximum possible points (current + potential)
-                            max_possible_base = correct_picks["total_score"]  # Start with current score
-                            max_possible_bonus = correct_picks["total_bonus"]  # Start with current bonus
-                            
-                            # For each region, calculate potential points
-                            for region in ["midwest", "west", "south", "east"]:
-                                for round_idx in range(1, 4):
-                                    if region not in compared_bracket or round_idx >= len(compared_bracket[region]):
-                                        continue
-                                        
-                                    for team in compared_bracket[region][round_idx]:
-                                        # Only count teams that aren't already scored (not correct/incorrect)
-                                        # and haven't been eliminated
-                                        if team and team.get("correct") is None and not team.get("isEliminated", False):
-                                            base, bonus = calculate_points_for_pick(team, round_idx)
-                                            max_possible_base += base
-                                            max_possible_bonus += bonus
-                            
-                            # Calculate potential points for Final Four
-                            for team in compared_bracket.get("finalFour", []):
-                                if team and team.get("correct") is None and not team.get("isEliminated", False):
-                                    base, bonus = calculate_points_for_pick(team, "final_four")
-                                    max_possible_base += base
-                                    max_possible_bonus += bonus
-                            
-                            # Calculate potential points for Championship
-                            for team in compared_bracket.get("championship", []):
-                                if team and team.get("correct") is None and not team.get("isEliminated", False):
-                                    base, bonus = calculate_points_for_pick(team, "championship")
-                                    max_possible_base += base
-                                    max_possible_bonus += bonus
-                            
-                            # Calculate potential points for Champion
-                            if compared_bracket.get("champion") and compared_bracket["champion"].get("correct") is None and not compared_bracket["champion"].get("isEliminated", False):
-                                base, bonus = calculate_points_for_pick(compared_bracket["champion"], "champion")
-                                max_possible_base += base
-                                max_possible_bonus += bonus
-                            
-                            # Calculate total maximum possible points
-                            max_possible_total = max_possible_base + max_possible_bonus
 
                         except Exception as e:
                             print(f"Error calculating picks for {username}: {str(e)}")
+                            bracket_data = None
                     
-                    # Add to user data
-                    user_data.append({
+                    # Add to user rows; scores are added by get_users_list
+                    user_rows.append({
                         "username": username,
                         "last_updated": formatted_time,
                         "bracket_count": len(user_brackets),
                         "picks_remaining": picks_remaining,
                         "champion": champion,
-                        "champion_eliminated": champion_eliminated if 'champion_eliminated' in locals() else False,
-                        "correct_picks": correct_picks if 'correct_picks' in locals() else {
-                            "round_1": 0, "round_2": 0, "round_3": 0,
-                            "final_four": 0, "championship": 0, "champion": 0,
-                            "total": 0,
-                            "round_1_score": 0, "round_2_score": 0, "round_3_score": 0,
-                            "final_four_score": 0, "championship_score": 0, "champion_score": 0,
-                            "total_score": 0, 
-                            "round_1_bonus": 0, "round_2_bonus": 0, "round_3_bonus": 0,
-                            "final_four_bonus": 0, "championship_bonus": 0, "champion_bonus": 0,
-                            "total_bonus": 0, "total_with_bonus": 0
-                        },
-                        "max_possible_base": max_possible_base if 'max_possible_base' in locals() else correct_picks["total_score"],
-                        "max_possible_bonus": max_possible_bonus if 'max_possible_bonus' in locals() else correct_picks["total_bonus"],
-                        "max_possible_total": max_possible_total if 'max_possible_total' in locals() else correct_picks["total_with_bonus"],
-                        "max_possible_base_remaining": max_possible_base - correct_picks["total_score"],
-                        "max_possible_bonus_remaining": max_possible_bonus - correct_picks["total_bonus"],
-                        "max_possible_total_remaining": max_possible_total - correct_picks["total_with_bonus"],
                         "monte_carlo_pct_first_place": 0,
                         "monte_carlo_min_rank": 0,
                         "monte_carlo_max_rank": 0,
                         "monte_carlo_min_score": 0,
                         "monte_carlo_max_score": 0
                     })
+                    brackets.append(bracket_data)
                     
                     # Add to users set
                     users.add(username)
     
+    return user_rows, brackets
+
+# Score timeline of the saved brackets and truth files, rebuilt when either changes
+_score_timeline_cache = {"signature": None}
+
+def get_score_timeline():
+    """
+    Get the precomputed scores and ranks of every user at every truth file.
+    
+    The timeline is built once and reused until a truth file or a saved
+    bracket is added, removed or modified.
+    
+    Returns:
+        tuple: (timeline, user_rows, loaded) where timeline is a ScoreTimeline
+               whose columns follow get_sorted_truth_files(), user_rows are the
+               rows from load_user_entries and loaded flags the truth files
+               that could be read
+    """
+    truth_files = get_sorted_truth_files()
+    signature = (
+        tuple((f, os.path.getmtime(f)) for f in truth_files),
+        tuple(sorted((f, os.path.getmtime(os.path.join('saved_brackets', f)))
+                     for f in os.listdir('saved_brackets') if f.endswith('.json'))),
+    )
+    if _score_timeline_cache["signature"] == signature:
+        return _score_timeline_cache["timeline"], _score_timeline_cache["user_rows"], _score_timeline_cache["loaded"]
+    
+    start_time = time.time()
+    truth_brackets = []
+    loaded = []
+    for truth_file in truth_files:
+        try:
+            with open(truth_file, 'r') as f:
+                truth_brackets.append(json.load(f))
+            loaded.append(True)
+        except Exception as e:
+            print(f"Error loading truth file {truth_file}: {str(e)}")
+            truth_brackets.append(None)
+            loaded.append(False)
+    
+    user_rows, brackets = load_user_entries()
+    usernames = [row["username"] for row in user_rows]
+    timeline = ScoreTimeline(usernames, encode_brackets(brackets), truth_brackets)
+    print(f"Built score timeline for {len(usernames)} users and {len(truth_files)} truth files "
+          f"({timeline.incremental_steps} incremental steps, {time.time() - start_time:.3f} seconds)")
+    
+    _score_timeline_cache.update(signature=signature, timeline=timeline, user_rows=user_rows, loaded=loaded)
+    return timeline, user_rows, loaded
+
+def get_users_list(truth_bracket, truth_index=None):
+    """
+    Process and return user data with scores based on the provided truth bracket.
+    
+    Args:
+        truth_bracket: The truth bracket to compare user brackets against
+        truth_index (int, optional): Index of truth_bracket in get_sorted_truth_files().
+                                     If given, scores are read from the score timeline.
+        
+    Returns:
+        list: List of user data dictionaries with scores and rankings
+    """
+    user_data = []
+
+    # Alive teams and still-possible picks, computed once for every user
+    truth_state = TruthState(truth_bracket) if truth_bracket else None
+    truth_picks = encode_bracket(truth_bracket)
+
+    # Create "PERFECT" entry - get the truth bracket first
+    if truth_bracket:
+        # Count completed picks and extract champion
+        completed_picks = sum(1 for slot in range(NUM_SLOTS) if get_slot(truth_bracket, slot))
+        champion = None
+        if truth_bracket.get("champion"):
+            champion = truth_bracket["champion"]["name"]
+        
+        # Score the truth bracket against itself like any other bracket
+        perfect_score = comparison_cache.score(truth_bracket, truth_bracket)
+        
+        # Calculate remaining picks
+        picks_remaining = 63 - completed_picks
+        
+        # Most points a perfect bracket can still add: every undecided game's
+        # base points plus the largest upset bonus any completion can earn
+        perfect_remaining_base, perfect_remaining_bonus = truth_state.best_remaining()
+        perfect_max_base = perfect_score["total_score"] + perfect_remaining_base
+        perfect_max_bonus = perfect_score["total_bonus"] + perfect_remaining_bonus
+        perfect_max_total = perfect_max_base + perfect_max_bonus
+        
+        # Create the perfect entry with maximum possible points
+        perfect_entry = {
+            "username": "PERFECT",
+            "last_updated": "Current truth bracket",
+            "bracket_count": 1,
+            "picks_remaining": picks_remaining,
+            "champion": champion,
+            "correct_picks": perfect_score,
+            "max_possible_base": perfect_max_base,
+            "max_possible_bonus": perfect_max_bonus,
+            "max_possible_total": perfect_max_total,
+            "max_possible_base_remaining": perfect_remaining_base,
+            "max_possible_bonus_remaining": perfect_remaining_bonus,
+            "max_possible_total_remaining": perfect_remaining_base + perfect_remaining_bonus,
+            "monte_carlo_pct_first_place": 0,
+            "monte_carlo_min_rank": 0,
+            "monte_carlo_max_rank": 0,
+            "monte_carlo_min_score": 0,
+            "monte_carlo_max_score": 0,
+        }
+        
+        # Add the perfect entry to the user data
+        user_data.append(perfect_entry)
+    
+    if truth_index is not None:
+        # Look the scores up in the precomputed timeline
+        timeline, timeline_rows, _ = get_score_timeline()
+        user_rows = [dict(row) for row in timeline_rows]
+        picks = timeline.picks
+        scores = timeline.scores[:, truth_index]
+    else:
+        user_rows, brackets = load_user_entries()
+        picks = encode_brackets(brackets)
+        scores = score_many(picks, truth_picks)[:, 0]
+    user_data.extend(user_rows)
+    
+    # Fill in every user's scores and remaining points
+    if user_rows:
+        if truth_state is not None:
+            remaining_base, remaining_bonus = truth_state.potential(picks)
+            champion_eliminated = truth_state.eliminated(picks)[:, NUM_SLOTS - 1]
+        else:
+            remaining_base = remaining_bonus = np.zeros(len(picks), dtype=np.int32)
+            champion_eliminated = np.zeros(len(picks), dtype=bool)
+        
+        for user_idx, user in enumerate(user_rows):
+            correct_picks = score_record(scores[user_idx])
+            
+            # Calculate maximum possible points (current + still available)
+            max_possible_base = correct_picks["total_score"] + int(remaining_base[user_idx])
+            max_possible_bonus = correct_picks["total_bonus"] + int(remaining_bonus[user_idx])
+            max_possible_total = max_possible_base + max_possible_bonus
+            
+            user.update({
+                "champion_eliminated": bool(champion_eliminated[user_idx]),
+                "correct_picks": correct_picks,
+                "max_possible_base": max_possible_base,
+                "max_possible_bonus": max_possible_bonus,
+                "max_possible_total": max_possible_total,
+                "max_possible_base_remaining": max_possible_base - correct_picks["total_score"],
+                "max_possible_bonus_remaining": max_possible_bonus - correct_picks["total_bonus"],
+                "max_possible_total_remaining": max_possible_total - correct_picks["total_with_bonus"],
+            })
+    
     # Sort user data to put PERFECT at the top, then by score
     user_data.sort(key=lambda x: (0 if x["username"] == "PERFECT" else 1, -x["correct_picks"]["total_with_bonus"]))
     
@@ -1393,8 +1299,8 @@ def users_list():
             filename = os.path.basename(file_path)
             truth_file_names.append(filename)
         
-        # Process user data with the extracted function
-        user_data = get_users_list(truth_bracket)
+        # Process user data with the extracted function, reading scores from the timeline
+        user_data = get_users_list(truth_bracket, truth_index=selected_index if all_truth_files else None)
         user_data, mc_data_found = add_mc_data(truth_file, user_data)
         
         return render_template('users_list.html', 
@@ -1491,166 +1397,126 @@ def find_monte_carlo_analysis(truth_file):
         traceback.print_exc()  # Print traceback for easier debugging
         return None
 
-# Add this function after compare_with_truth and before users_list
-def generate_optimal_future_bracket(truth_bracket):
+@app.route('/api/head-to-head', methods=['GET'])
+def api_head_to_head():
     """
-    Generate a bracket that maximizes potential upset bonuses for future games.
-    For games already played (in truth bracket), keep those results.
-    For future games, pick teams with the highest seed number to maximize upset potential.
-    Only picks from teams that are not eliminated.
+    API endpoint that returns the chance of each user finishing ahead of each other user.
+    
+    Query parameters:
+        truth_index (int): Timeline position of the truth bracket (default: 0, the latest)
+        user (str, optional): Only return this user's row, keyed by opponent
+    """
+    try:
+        truth_index = request.args.get('truth_index', type=int, default=0)
+        username = request.args.get('user')
+        
+        all_truth_files = get_sorted_truth_files()
+        if not all_truth_files:
+            return jsonify({'error': 'No truth bracket files found'}), 404
+        if truth_index < 0 or truth_index >= len(all_truth_files):
+            return jsonify({'error': f'Invalid truth index: {truth_index}. Valid range is 0-{len(all_truth_files)-1}'}), 400
+        
+        head_to_head = load_monte_carlo_analysis(all_truth_files[truth_index]).get('head_to_head')
+        if not head_to_head:
+            return jsonify({'error': 'No head-to-head data in the Monte Carlo analysis for this truth bracket'}), 404
+        
+        if username is None:
+            return jsonify(dict(head_to_head, success=True))
+        
+        usernames = head_to_head['usernames']
+        if username not in usernames:
+            return jsonify({'error': f'Unknown user: {username}'}), 404
+        
+        # P(ahead of j), P(tied with j) and P(behind j) for every opponent j
+        i = usernames.index(username)
+        opponents = {}
+        for j, opponent in enumerate(usernames):
+            if j != i:
+                opponents[opponent] = {
+                    'pct_ahead': head_to_head['pct_ahead'][i][j],
+                    'pct_tied': head_to_head['pct_tied'][i][j],
+                    'pct_behind': head_to_head['pct_ahead'][j][i]
+                }
+        return jsonify({'success': True, 'user': username, 'opponents': opponents})
+    
+    except Exception as e:
+        app.logger.error(f"Error in api_head_to_head: {str(e)}")
+        return jsonify({'error': f'Server error: {str(e)}'}), 500
+
+def get_rooting_guide(analysis_file):
+    """
+    Get the rooting guide of an analysis file, building it once per file version.
     
     Args:
-        truth_bracket: The current truth bracket with actual results
+        analysis_file (str): Path to the analysis JSON
         
     Returns:
-        A bracket with optimal future picks to maximize bonus potential
+        dict: The rooting guide, or None if the analysis has no first-place data
     """
-    # Create a deep copy to avoid modifying the original
-    optimal_bracket = copy.deepcopy(truth_bracket)
-    
-    # Process each region
-    for region in ["midwest", "west", "south", "east"]:
-        # Track teams that have been eliminated in this region
-        eliminated_teams = set()
-        
-        # First, identify teams that have already been eliminated based on truth bracket
-        for round_idx in range(4):  # Process rounds 0-3
-            games_in_round = 2 ** (3 - round_idx)
-            for game_idx in range(games_in_round):
-                team1_idx = game_idx * 2
-                team2_idx = game_idx * 2 + 1
-                
-                # If we have teams in this round of the truth bracket
-                if round_idx < len(truth_bracket[region]) and team1_idx < len(truth_bracket[region][round_idx]) and team2_idx < len(truth_bracket[region][round_idx]):
-                    team1 = truth_bracket[region][round_idx][team1_idx]
-                    team2 = truth_bracket[region][round_idx][team2_idx]
-                    
-                    # If we have a result in the next round, one team must have been eliminated
-                    if round_idx < 3:  # Not Elite Eight yet
-                        next_round_idx = round_idx + 1
-                        next_game_idx = game_idx // 2
-                        next_team_idx = game_idx % 2
-                        next_slot = next_game_idx * 2 + next_team_idx
-                        
-                        if (next_round_idx < len(truth_bracket[region]) and 
-                            next_slot < len(truth_bracket[region][next_round_idx]) and 
-                            truth_bracket[region][next_round_idx][next_slot] is not None):
-                            
-                            advancing_team = truth_bracket[region][next_round_idx][next_slot]
-                            
-                            # The other team must have been eliminated
-                            if team1 and team2:
-                                if team1["name"] == advancing_team["name"]:
-                                    eliminated_teams.add(team2["name"])
-                                elif team2["name"] == advancing_team["name"]:
-                                    eliminated_teams.add(team1["name"])
-        
-        # Now fill in future games, starting from the earliest incomplete round
-        for round_idx in range(4):
-            games_in_round = 2 ** (3 - round_idx)
-            
-            for game_idx in range(games_in_round):
-                # For each game position
-                next_round_idx = round_idx + 1
-                next_game_idx = game_idx // 2
-                next_team_idx = game_idx % 2
-                next_slot = next_game_idx * 2 + next_team_idx
-                
-                # Check if this position feeds into a position that's not yet decided in the truth bracket
-                if (round_idx < 3 and  # Not Elite Eight
-                    next_round_idx < len(truth_bracket[region]) and
-                    next_slot < len(truth_bracket[region][next_round_idx]) and
-                    truth_bracket[region][next_round_idx][next_slot] is None):
-                    
-                    # This is a future game - get the two teams in the current matchup
-                    team1_idx = game_idx * 2
-                    team2_idx = game_idx * 2 + 1
-                    
-                    if team1_idx < len(optimal_bracket[region][round_idx]) and team2_idx < len(optimal_bracket[region][round_idx]):
-                        team1 = optimal_bracket[region][round_idx][team1_idx]
-                        team2 = optimal_bracket[region][round_idx][team2_idx]
-                        
-                        # Skip if either team is missing
-                        if not team1 or not team2:
-                            continue
-                            
-                        # Skip if both teams are eliminated
-                        if team1["name"] in eliminated_teams and team2["name"] in eliminated_teams:
-                            continue
-                            
-                        # If only one team is not eliminated, that team advances
-                        if team1["name"] in eliminated_teams:
-                            optimal_bracket[region][next_round_idx][next_slot] = team2
-                            continue
-                        if team2["name"] in eliminated_teams:
-                            optimal_bracket[region][next_round_idx][next_slot] = team1
-                            continue
-                        
-                        # Both teams are available - choose the one with higher seed number (bigger upset potential)
-                        if int(team1["seed"]) > int(team2["seed"]):
-                            optimal_bracket[region][next_round_idx][next_slot] = team1
-                        else:
-                            optimal_bracket[region][next_round_idx][next_slot] = team2
+    path = first_place_file(analysis_file)
+    if not os.path.exists(path):
+        return None
+    key = (analysis_file, os.path.getmtime(path))
+    if key not in rooting_guides:
+        start_time = time.time()
+        rooting_guides.clear()
+        rooting_guides[key] = load_rooting_guide(analysis_file)
+        print(f"Built rooting guide for {analysis_file} in {time.time() - start_time:.3f} seconds")
+    return rooting_guides[key]
+
+@app.route('/api/rooting-guide', methods=['GET'])
+def api_rooting_guide():
+    """
+    API endpoint that returns every user's win probability under each outcome of every remaining game.
     
-    # Process Elite Eight to Final Four
-    for region in ["midwest", "west", "south", "east"]:
-        # Find which Final Four slot this region feeds into
-        ff_idx = 0 if region == "midwest" else 1 if region == "west" else 2 if region == "south" else 3
+    Query parameters:
+        truth_index (int): Timeline position of the truth bracket (default: 0, the latest)
+        user (str, optional): Only return this user's chances, with the team to root for in each game
+    """
+    try:
+        truth_index = request.args.get('truth_index', type=int, default=0)
+        username = request.args.get('user')
         
-        # Skip if this Final Four position is already filled in truth bracket
-        if truth_bracket["finalFour"][ff_idx] is not None:
-            continue
-            
-        # Get the Elite Eight teams for this region
-        elite_eight_teams = []
-        if optimal_bracket[region][3][0] is not None:
-            elite_eight_teams.append(optimal_bracket[region][3][0])
-        if optimal_bracket[region][3][1] is not None:
-            elite_eight_teams.append(optimal_bracket[region][3][1])
-            
-        # Pick the team with highest seed number that advances
-        if elite_eight_teams:
-            best_upset_team = max(elite_eight_teams, key=lambda team: int(team["seed"]))
-            optimal_bracket["finalFour"][ff_idx] = best_upset_team
-    
-    # Process Final Four to Championship
-    # First semifinal: slots 0 and 1 of finalFour feed into championship[0]
-    if truth_bracket["championship"][0] is None:
-        semifinal1_teams = []
-        if optimal_bracket["finalFour"][0] is not None:
-            semifinal1_teams.append(optimal_bracket["finalFour"][0])
-        if optimal_bracket["finalFour"][1] is not None:
-            semifinal1_teams.append(optimal_bracket["finalFour"][1])
-            
-        if semifinal1_teams:
-            best_upset_team = max(semifinal1_teams, key=lambda team: int(team["seed"]))
-            optimal_bracket["championship"][0] = best_upset_team
-    
-    # Second semifinal: slots 2 and 3 of finalFour feed into championship[1]
-    if truth_bracket["championship"][1] is None:
-        semifinal2_teams = []
-        if optimal_bracket["finalFour"][2] is not None:
-            semifinal2_teams.append(optimal_bracket["finalFour"][2])
-        if optimal_bracket["finalFour"][3] is not None:
-            semifinal2_teams.append(optimal_bracket["finalFour"][3])
-            
-        if semifinal2_teams:
-            best_upset_team = max(semifinal2_teams, key=lambda team: int(team["seed"]))
-            optimal_bracket["championship"][1] = best_upset_team
-    
-    # Process Championship to Champion
-    if truth_bracket["champion"] is None:
-        championship_teams = []
-        if optimal_bracket["championship"][0] is not None:
-            championship_teams.append(optimal_bracket["championship"][0])
-        if optimal_bracket["championship"][1] is not None:
-            championship_teams.append(optimal_bracket["championship"][1])
-            
-        if championship_teams:
-            best_upset_team = max(championship_teams, key=lambda team: int(team["seed"]))
-            optimal_bracket["champion"] = best_upset_team
+        all_truth_files = get_sorted_truth_files()
+        if not all_truth_files:
+            return jsonify({'error': 'No truth bracket files found'}), 404
+        if truth_index < 0 or truth_index >= len(all_truth_files):
+            return jsonify({'error': f'Invalid truth index: {truth_index}. Valid range is 0-{len(all_truth_files)-1}'}), 400
+        
+        analysis_file = find_monte_carlo_analysis(all_truth_files[truth_index])
+        guide = get_rooting_guide(analysis_file) if analysis_file else None
+        if guide is None:
+            return jsonify({'error': 'No rooting guide data in the Monte Carlo analysis for this truth bracket'}), 404
+        
+        if username is None:
+            return jsonify(dict(guide, success=True))
+        
+        if username not in guide['win_pct']:
+            return jsonify({'error': f'Unknown user: {username}'}), 404
+        
+        # Keep only this user's chances and pick the outcome that helps them most
+        games = []
+        for game in guide['games']:
+            outcomes = [{'team': outcome['team'],
+                         'pct_simulations': outcome['pct_simulations'],
+                         'win_pct': outcome['win_pct'][username]}
+                        for outcome in game['outcomes']]
+            best = max(outcomes, key=lambda outcome: outcome['win_pct'])
+            worst = min(outcomes, key=lambda outcome: outcome['win_pct'])
+            games.append(dict(game, outcomes=outcomes, root_for=best['team'],
+                              swing=round(best['win_pct'] - worst['win_pct'], 4)))
+        
+        return jsonify({
+            'success': True,
+            'user': username,
+            'num_simulations': guide['num_simulations'],
+            'win_pct': guide['win_pct'][username],
+            'games': games
+        })
     
-    return optimal_bracket
+    except Exception as e:
+        app.logger.error(f"Error in api_rooting_guide: {str(e)}")
+        return jsonify({'error': f'Server error: {str(e)}'}), 500
 
 # Import for scores service
 from services.scores_service import ScoresService
@@ -1707,8 +1573,8 @@ def api_user_scores():
         if not truth_bracket:
             return jsonify({'error': f'Could not load truth bracket for index {truth_index}'}), 500
         
-        # Get users list with scores
-        users_list = get_users_list(truth_bracket)
+        # Get users list with scores from the timeline
+        users_list = get_users_list(truth_bracket, truth_index=truth_index)
         truth_file = all_truth_files[truth_index] if all_truth_files else None
         users_list, _ = add_mc_data(truth_file, users_list)
 
@@ -1758,37 +1624,35 @@ def api_user_scores_all_truth():
         
         print(f"Generating timeline data for {len(all_truth_files)} truth files")
         
+        # Scores and ranks of every user at every truth file, precomputed once
+        timeline, _, loaded = get_score_timeline()
+        
         # Create timeline data array 
         timeline_data = []
         
         # Process each truth file
         for index, truth_file in enumerate(all_truth_files):
-            # Get truth bracket
-            truth_bracket = get_most_recent_truth_bracket(index)
-            if not truth_bracket:
+            if not loaded[index]:
                 print(f"Warning: Could not load truth bracket for index {index}, skipping")
                 continue
             
-            # Get users list with scores
-            users_list = get_users_list(truth_bracket)
+            # Users in leaderboard order: PERFECT first, then by rank
+            users_list = [{'username': username} for username in ['PERFECT'] + timeline.leaderboard(index)]
             users_list, _ = add_mc_data(truth_file, users_list)
             
-            if users_list:
-                # Extract just the win probability data for efficiency
-                win_prob_data = {
-                    'index': index,
-                    'users': [
-                        {
-                            'username': user['username'],
-                            'win_probability': user.get('monte_carlo_pct_first_place', 0)
-                        }
-                        for user in users_list
-                    ]
-                }
-                timeline_data.append(win_prob_data)
-                print(f"Processed timeline index {index} with {len(win_prob_data['users'])} users")
-            else:
-                print(f"Warning: No user list data for index {index}, skipping")
+            # Extract just the win probability data for efficiency
+            win_prob_data = {
+                'index': index,
+                'users': [
+                    {
+                        'username': user['username'],
+                        'win_probability': user.get('monte_carlo_pct_first_place', 0)
+                    }
+                    for user in users_list
+                ]
+            }
+            timeline_data.append(win_prob_data)
+            print(f"Processed timeline index {index} with {len(win_prob_data['users'])} users")
         
         # Create response data
         response_data = {
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Check Kernel Backends
+
+This script generates, scores and ranks the same seeded simulations with the
+NumPy backend and with the loop backend from utils.kernels (compiled with
+numba when it is installed), and reports whether every result is identical
+and how long each step took with each backend.
+"""
+
+import argparse
+import json
+
+from simulation.backend_check import check_backends, print_backend_check
+from simulation.batch_generator import SAMPLERS
+from simulation.simulation_analyzer import BracketAnalyzer
+from utils.bracket_utils import get_most_recent_truth_bracket
+
+def parse_arguments():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(
+        description='Check that the numpy and numba kernel backends give identical results'
+    )
+    parser.add_argument(
+        '--truth-file',
+        type=str,
+        help='Path to truth bracket file (default: most recent truth file)'
+    )
+    parser.add_argument(
+        '--user-brackets-dir',
+        type=str,
+        default='saved_brackets',
+        help='Directory containing user brackets (default: saved_brackets)'
+    )
+    parser.add_argument(
+        '--count',
+        type=int,
+        default=2000,
+        help='Number of simulations (default: 2000)'
+    )
+    parser.add_argument(
+        '--seed',
+        type=int,
+        default=0,
+        help='Random seed shared by both backends (default: 0)'
+    )
+    parser.add_argument(
+        '--sampler',
+        choices=SAMPLERS,
+        default='random',
+        help='Sampler to generate the simulations with (default: random)'
+    )
+    parser.add_argument(
+        '--backend',
+        choices=['numba', 'python'],
+        help='Loop backend to check against numpy (default: numba if installed, else python)'
+    )
+
+    return parser.parse_args()
+
+def main():
+    """Main function to run the backend check."""
+    args = parse_arguments()
+
+    truth_file = args.truth_file or get_most_recent_truth_bracket()
+    if not truth_file:
+        print("Error: No truth bracket file found")
+        return 1
+    with open(truth_file, 'r') as f:
+        truth_bracket = json.load(f)
+
+    user_brackets = BracketAnalyzer().load_user_brackets(args.user_brackets_dir)
+    if not user_brackets:
+        print(f"Error: No user brackets found in {args.user_brackets_dir}")
+        return 1
+
+    print(f"Checking backends on {args.count} simulations for {len(user_brackets)} users "
+          f"using truth file: {truth_file}")
+    report = check_backends(truth_bracket, user_brackets, count=args.count, seed=args.seed,
+                            sampler=args.sampler, backend=args.backend)
+    print_backend_check(report)
+    return 0 if all(report["matches"].values()) else 1
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Compare Monte Carlo Samplers
+
+This script reports how much each variance-reduced sampler (antithetic,
+stratified, sobol) reduces the error of the first place percentages against
+naive random sampling, for the current pool of user brackets and truth
+bracket. Use it to pick a --sampler for generate_simulations.py and
+run_monte_carlo_pipeline.py.
+"""
+
+import argparse
+import json
+
+from simulation.batch_generator import SAMPLERS
+from simulation.sampler_comparison import compare_samplers, print_comparison
+from simulation.simulation_analyzer import BracketAnalyzer
+from utils.bracket_utils import get_most_recent_truth_bracket
+
+def parse_arguments():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(
+        description='Compare the variance of the Monte Carlo samplers on the current pool'
+    )
+    parser.add_argument(
+        '--truth-file',
+        type=str,
+        help='Path to truth bracket file (default: most recent truth file)'
+    )
+    parser.add_argument(
+        '--user-brackets-dir',
+        type=str,
+        default='saved_brackets',
+        help='Directory containing user brackets (default: saved_brackets)'
+    )
+    parser.add_argument(
+        '--count',
+        type=int,
+        default=4096,
+        help='Simulations per replicate (default: 4096)'
+    )
+    parser.add_argument(
+        '--replicates',
+        type=int,
+        default=20,
+        help='Independent replicates per sampler (default: 20)'
+    )
+    parser.add_argument(
+        '--samplers',
+        nargs='+',
+        choices=SAMPLERS,
+        default=list(SAMPLERS),
+        help='Samplers to compare against random (default: all)'
+    )
+    parser.add_argument(
+        '--seed',
+        type=int,
+        default=None,
+        help='Root random seed for the replicates'
+    )
+
+    return parser.parse_args()
+
+def main():
+    """Main function to run the sampler comparison."""
+    args = parse_arguments()
+
+    truth_file = args.truth_file or get_most_recent_truth_bracket()
+    if not truth_file:
+        print("Error: No truth bracket file found")
+        return 1
+    with open(truth_file, 'r') as f:
+        truth_bracket = json.load(f)
+
+    user_brackets = BracketAnalyzer().load_user_brackets(args.user_brackets_dir)
+    if not user_brackets:
+        print(f"Error: No user brackets found in {args.user_brackets_dir}")
+        return 1
+
+    print(f"Comparing samplers for {len(user_brackets)} users using truth file: {truth_file}")
+    report = compare_samplers(truth_bracket, user_brackets, samplers=args.samplers,
+                              count=args.count, replicates=args.replicates, seed=args.seed)
+    print_comparison(report, args.count, args.replicates)
+    return 0
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Convert Legacy Simulation Files
+
+This script converts pickled simulation files (data/simulations/brackets_*.bin)
+into the compact memory-mappable format written by simulation.simulation_store.
+The truth bracket hash is recorded in the new header whenever the matching
+truth file can be found from the simulation file name.
+"""
+
+import os
+import argparse
+import glob
+import json
+
+from simulation.simulation_store import convert_legacy_file, SIMULATION_EXTENSION
+
+def parse_arguments():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(
+        description='Convert pickled simulation files to the compact simulation format'
+    )
+    parser.add_argument(
+        'files',
+        nargs='*',
+        help='Legacy simulation files to convert (default: all brackets_*.bin in --input-dir)'
+    )
+    parser.add_argument(
+        '--input-dir',
+        type=str,
+        default='data/simulations',
+        help='Directory to search for legacy files (default: data/simulations)'
+    )
+    parser.add_argument(
+        '--truth-dir',
+        type=str,
+        default='truth_brackets',
+        help='Directory containing truth bracket files (default: truth_brackets)'
+    )
+    parser.add_argument(
+        '--remove',
+        action='store_true',
+        help='Delete each legacy file after it has been converted'
+    )
+    parser.add_argument(
+        '--force',
+        action='store_true',
+        help='Convert even if the converted file already exists'
+    )
+
+    return parser.parse_args()
+
+def find_truth_bracket(simulation_file, truth_dir):
+    """
+    Find and load the truth bracket a legacy simulation file was built from.
+
+    Legacy files are named brackets_{truth_id}_{count}.bin, where truth_id is
+    the truth file name without its extension.
+
+    Returns:
+        dict: The truth bracket, or None if it cannot be found
+    """
+    basename = os.path.splitext(os.path.basename(simulation_file))[0]
+    if not basename.startswith('brackets_'):
+        return None
+
+    truth_id = basename[len('brackets_'):].rsplit('_', 1)[0]
+    truth_file = os.path.join(truth_dir, f"{truth_id}.json")
+    if not os.path.exists(truth_file):
+        return None
+
+    with open(truth_file, 'r') as f:
+        return json.load(f)
+
+def main():
+    """Main function to convert legacy simulation files."""
+    args = parse_arguments()
+
+    files = args.files or sorted(glob.glob(os.path.join(args.input_dir, 'brackets_*.bin')))
+    if not files:
+        print("No legacy simulation files found")
+        return 0
+
+    converted = 0
+    for input_file in files:
+        output_file = os.path.splitext(input_file)[0] + SIMULATION_EXTENSION
+        if os.path.exists(output_file) and not args.force:
+            print(f"Skipping {input_file}: {output_file} already exists")
+            continue
+
+        truth_bracket = find_truth_bracket(input_file, args.truth_dir)
+        if truth_bracket is None:
+            print(f"Warning: no truth bracket found for {input_file}, truth hash will be empty")
+
+        try:
+            convert_legacy_file(input_file, output_file, truth_bracket=truth_bracket)
+        except Exception as e:
+            print(f"Error converting {input_file}: {str(e)}")
+            continue
+
+        converted += 1
+        if args.remove:
+            os.remove(input_file)
+            print(f"Removed {input_file}")
+
+    print(f"\nConverted {converted} of {len(files)} files")
+    return 0
+
+if __name__ == "__main__":
+    exit(main())
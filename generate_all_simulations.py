@@ -38,9 +38,45 @@ def parse_arguments():
         default=None,
         help='Number of processes to use (default: CPU count - 1)'
     )
+    parser.add_argument(
+        '--adaptive',
+        action='store_true',
+        help='Run each truth bracket only until win percentages reach --target-se, '
+             'treating --count as the per-file simulation budget'
+    )
+    parser.add_argument(
+        '--target-se',
+        type=float,
+        default=None,
+        help='Target standard error of win percentages in adaptive mode (percentage points)'
+    )
+    parser.add_argument(
+        '--user-brackets-dir',
+        type=str,
+        default='saved_brackets',
+        help='Directory containing user brackets (default: saved_brackets)'
+    )
     
     return parser.parse_args()
 
+def run_adaptive(args, truth_file):
+    """Run the adaptive streaming pipeline for one truth file."""
+    cmd = ["python", "run_monte_carlo_pipeline.py", "--adaptive",
+           "--count", str(args.count),
+           "--truth-file", truth_file,
+           "--output-dir", args.output_dir,
+           "--user-brackets-dir", args.user_brackets_dir]
+    if args.target_se is not None:
+        cmd.extend(["--target-se", str(args.target_se)])
+    if args.processes:
+        cmd.extend(["--processes", str(args.processes)])
+    
+    print(f"Running command: {' '.join(cmd)}")
+    start_time = time.time()
+    subprocess.run(cmd, check=True)
+    elapsed = time.time() - start_time
+    print(f"Adaptive analysis for {os.path.basename(truth_file)} completed in {elapsed:.2f} seconds")
+
 def main():
     """Main function to run the simulation generation for all truth brackets."""
     args = parse_arguments()
@@ -56,11 +92,21 @@ def main():
     os.makedirs(args.output_dir, exist_ok=True)
     
     print(f"Found {len(truth_files)} truth bracket files")
-    print(f"Generating {args.count} simulations for each file...")
+    if args.adaptive:
+        print(f"Running adaptive simulations (budget {args.count}) for each file...")
+    else:
+        print(f"Generating {args.count} simulations for each file...")
     
     for i, truth_file in enumerate(truth_files):
         print(f"\nProcessing truth file {i+1}/{len(truth_files)}: {truth_file}")
         
+        if args.adaptive:
+            try:
+                run_adaptive(args, truth_file)
+            except subprocess.CalledProcessError as e:
+                print(f"Error running adaptive simulation for {truth_file}: {str(e)}")
+            continue
+        
         # Run the simulation for this truth file
         try:
             cmd = f"python generate_simulations.py --count {args.count} --truth-file {truth_file} --output-dir {args.output_dir}"
@@ -75,7 +121,7 @@ def main():
             
             # Run the analysis for this simulation
             # Get the most recent simulation file
-            simulation_files = [f for f in os.listdir(args.output_dir) if f.endswith('.bin')]
+            simulation_files = [f for f in os.listdir(args.output_dir) if f.endswith(('.sim', '.bin'))]
             if simulation_files:
                 simulation_files.sort(key=lambda x: os.path.getmtime(os.path.join(args.output_dir, x)), reverse=True)
                 latest_sim_file = os.path.join(args.output_dir, simulation_files[0])
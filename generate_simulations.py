@@ -12,8 +12,11 @@ import argparse
 import json
 from datetime import datetime
 
-from simulation.monte_carlo import run_monte_carlo
+from simulation.monte_carlo import run_monte_carlo, EXACT_ENUMERATION_THRESHOLD
+from simulation.batch_generator import SAMPLERS
+from simulation.win_models import WIN_MODELS, DEFAULT_RATINGS_SCALE, build_win_model
 from utils.bracket_utils import get_most_recent_truth_bracket, get_sorted_truth_files
+from utils.kernels import BACKENDS, BACKEND_ENV_VAR, set_backend
 
 def parse_arguments():
     """Parse command line arguments."""
@@ -49,12 +52,59 @@ def parse_arguments():
         default=1000,
         help='Batch size for parallel processing (default: 1000)'
     )
+    parser.add_argument(
+        '--exact-threshold',
+        type=int,
+        default=EXACT_ENUMERATION_THRESHOLD,
+        help=f'Enumerate all outcomes exactly when this many games or fewer remain, '
+             f'ignoring the simulation count, seed and sampler '
+             f'(default: {EXACT_ENUMERATION_THRESHOLD}, -1 to always sample)'
+    )
+    parser.add_argument(
+        '--seed',
+        type=int,
+        default=None,
+        help='Root random seed; runs with the same seed and batch size are identical'
+    )
+    parser.add_argument(
+        '--sampler',
+        choices=SAMPLERS,
+        default='random',
+        help='How random draws are generated; see compare_samplers.py for the variance '
+             'reduction each gives on the current pool (default: random)'
+    )
+    parser.add_argument(
+        '--model',
+        choices=sorted(WIN_MODELS),
+        default='seed_linear',
+        help='Win probability model (default: seed_linear)'
+    )
+    parser.add_argument(
+        '--ratings-file',
+        type=str,
+        help='CSV of team,rating (optional seed column) for --model ratings'
+    )
+    parser.add_argument(
+        '--ratings-scale',
+        type=float,
+        default=DEFAULT_RATINGS_SCALE,
+        help=f'Rating gap that gives the stronger team a 73%% chance with --model ratings '
+             f'(default: {DEFAULT_RATINGS_SCALE})'
+    )
+    parser.add_argument(
+        '--backend',
+        choices=BACKENDS,
+        help=f'Kernel backend; numba compiles the simulation, scoring and ranking loops '
+             f'(default: ${BACKEND_ENV_VAR} or auto, which uses numba when installed)'
+    )
     
     return parser.parse_args()
 
 def main():
     """Main function to run the simulation generation."""
     args = parse_arguments()
+    if args.backend:
+        set_backend(args.backend)
     
     # Get the truth bracket file
     truth_file = args.truth_file
@@ -75,19 +125,18 @@ def main():
         # Load the truth bracket
         with open(truth_file, 'r') as f:
             truth_bracket = json.load(f)
+        model = build_win_model(args.model, args.ratings_file, args.ratings_scale)
             
         # Special case for very small simulation counts
         # When we only need 1-3 simulations, use a direct approach without multiprocessing
         if args.count <= 3:
             # Import directly to avoid circular imports
-            from simulation.bracket_generator import generate_random_completion, save_simulations
+            from simulation.batch_generator import generate_outcomes
+            from simulation.simulation_store import save_outcomes, SIMULATION_EXTENSION
             
             print(f"Generating {args.count} simulations directly (no multiprocessing)")
-            simulations = generate_random_completion(truth_bracket, count=args.count)
-            
-            # Make sure simulations is a list
-            if args.count == 1:
-                simulations = [simulations]
+            outcomes = generate_outcomes(truth_bracket, count=args.count, seed=args.seed,
+                                         sampler=args.sampler, model=model)
                 
             # Generate filename without timestamp
             basename = os.path.basename(truth_file)
@@ -96,18 +145,26 @@ def main():
             else:
                 truth_id = "custom"
                 
-            output_file = f"{args.output_dir}/brackets_{truth_id}_{args.count}.bin"
+            output_file = f"{args.output_dir}/brackets_{truth_id}_{args.count}{SIMULATION_EXTENSION}"
             
             # Save the simulations
-            save_simulations(simulations, output_file)
+            save_outcomes(outcomes, output_file, truth_bracket=truth_bracket, seed=args.seed,
+                          truth_id=truth_id, sampler=args.sampler, model=model.describe())
             print(f"Saved {args.count} simulations to: {output_file}")
         else:
             # For larger counts, use the regular multiprocessing approach
-            from simulation.monte_carlo import run_monte_carlo
+            from simulation.monte_carlo import run_monte_carlo, EXACT_ENUMERATION_THRESHOLD
             
             output_file = run_monte_carlo(
                 truth_bracket_file=truth_file,
-                num_simulations=args.count
+                num_simulations=args.count,
+                num_processes=args.processes,
+                batch_size=args.batch_size,
+                exact_threshold=args.exact_threshold,
+                seed=args.seed,
+                output_dir=args.output_dir,
+                sampler=args.sampler,
+                model=model
             )
         
         print("\nSimulation generation completed successfully!")
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Merge Sharded Monte Carlo Runs
+
+This script combines the partial analysis files written by
+`run_monte_carlo_pipeline.py --shard i/N --seed S` into a single analysis
+JSON, in the same format that BracketAnalyzer.save_analysis produces. Shards
+can come from different machines or different days, as long as they share
+the truth bracket, root seed, simulation count and batch size.
+"""
+
+import os
+import argparse
+import glob
+
+from simulation.streaming import merge_partial_files, save_analysis_results, PARTIAL_EXTENSION
+
+def parse_arguments():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(
+        description='Merge partial analysis files from sharded Monte Carlo runs'
+    )
+    parser.add_argument(
+        'files',
+        nargs='+',
+        help='Partial analysis files (or glob patterns) to merge'
+    )
+    parser.add_argument(
+        '--output-file',
+        type=str,
+        help='Path for the merged analysis JSON (default: derived from the first shard file)'
+    )
+    parser.add_argument(
+        '--allow-partial',
+        action='store_true',
+        help='Write the analysis even if some batches of the run are missing'
+    )
+
+    return parser.parse_args()
+
+def default_output_file(shard_file):
+    """Strip the _shardIofN suffix from a partial analysis file name."""
+    base = os.path.splitext(shard_file)[0]
+    if '_shard' in base:
+        base = base[:base.rindex('_shard')]
+    return base + '.json'
+
+def main():
+    """Main function to merge shard results."""
+    args = parse_arguments()
+
+    files = []
+    for pattern in args.files:
+        files.extend(sorted(glob.glob(pattern)) or [pattern])
+    files = [f for f in files if f.endswith(PARTIAL_EXTENSION)]
+    if not files:
+        print("Error: No partial analysis files found")
+        return 1
+
+    try:
+        merged = merge_partial_files(files)
+    except (ValueError, OSError) as e:
+        print(f"Error merging shards: {str(e)}")
+        return 1
+
+    missing = merged.metadata["missing_batches"]
+    if missing:
+        print(f"Warning: {len(missing)} batches of the run are missing from the shards given")
+        if not args.allow_partial:
+            print("Use --allow-partial to write the analysis anyway")
+            return 1
+
+    output_file = args.output_file or default_output_file(files[0])
+    save_analysis_results(merged.results(), output_file, head_to_head=merged.head_to_head())
+    print(f"Merged {len(files)} shards ({merged.count} simulations)")
+    return 0
+
+if __name__ == "__main__":
+    exit(main())
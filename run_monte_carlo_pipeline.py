@@ -8,6 +8,18 @@ This script runs the entire Monte Carlo simulation pipeline, including:
 3. Integrating results with the main application
 
 This is designed to be a one-stop solution for running the entire Monte Carlo analysis.
+
+With --streaming, generation and analysis are fused: simulations are scored
+in chunks as they are generated and never written to disk unless
+--save-simulations is given.
+
+With --adaptive, streaming runs continue in rounds until every user's win
+percentage has a standard error of at most --target-se (or --count is
+reached), and the confidence intervals are written to the analysis JSON.
+
+Large streaming runs can be split with --shard i/N --seed S. Each shard writes
+a partial analysis file, and merge_shards.py combines any set of them into
+the usual analysis JSON.
 """
 
 import os
@@ -18,6 +30,11 @@ import time
 import shutil
 from datetime import datetime
 
+from simulation.monte_carlo import DEFAULT_TARGET_SE
+from simulation.batch_generator import SAMPLERS
+from simulation.win_models import WIN_MODELS, DEFAULT_RATINGS_SCALE
+from utils.kernels import BACKENDS, BACKEND_ENV_VAR, set_backend
+
 def parse_arguments():
     """Parse command line arguments."""
     parser = argparse.ArgumentParser(
@@ -67,8 +84,112 @@ def parse_arguments():
         default=None,
         help='Number of processes to use for simulation generation'
     )
+    parser.add_argument(
+        '--streaming',
+        action='store_true',
+        help='Generate and score simulations in chunks without an intermediate simulation file. '
+             'Only the standard scoring rules are analyzed; for rule sets, add --save-simulations '
+             'and run analyze_simulations.py --rule-sets on the file'
+    )
+    parser.add_argument(
+        '--batch-size',
+        type=int,
+        default=10000,
+        help='Number of simulations per chunk in streaming mode (default: 10000)'
+    )
+    parser.add_argument(
+        '--save-simulations',
+        action='store_true',
+        help='In streaming mode, also write the simulations to a file'
+    )
+    parser.add_argument(
+        '--seed',
+        type=int,
+        default=None,
+        help='Root random seed; runs with the same seed and batch size are identical'
+    )
+    parser.add_argument(
+        '--sampler',
+        choices=SAMPLERS,
+        default='random',
+        help='How random draws are generated (default: random)'
+    )
+    parser.add_argument(
+        '--model',
+        choices=sorted(WIN_MODELS),
+        default='seed_linear',
+        help='Win probability model (default: seed_linear)'
+    )
+    parser.add_argument(
+        '--ratings-file',
+        type=str,
+        help='CSV of team,rating (optional seed column) for --model ratings'
+    )
+    parser.add_argument(
+        '--ratings-scale',
+        type=float,
+        default=DEFAULT_RATINGS_SCALE,
+        help=f'Logistic scale of the ratings with --model ratings (default: {DEFAULT_RATINGS_SCALE})'
+    )
+    parser.add_argument(
+        '--shard',
+        type=parse_shard,
+        default=None,
+        help='Run only shard i of N (written as i/N, 1-based) of a streaming run and save '
+             'a partial analysis file for merge_shards.py. Requires --seed.'
+    )
     
-    return parser.parse_args()
+    parser.add_argument(
+        '--adaptive',
+        action='store_true',
+        help='Stream simulations in rounds until win percentages reach --target-se; '
+             '--count becomes the simulation budget'
+    )
+    parser.add_argument(
+        '--target-se',
+        type=float,
+        default=DEFAULT_TARGET_SE,
+        help=f'Target standard error of every win percentage in adaptive mode, '
+             f'in percentage points (default: {DEFAULT_TARGET_SE})'
+    )
+    parser.add_argument(
+        '--round-size',
+        type=int,
+        default=20000,
+        help='Minimum number of simulations per adaptive round (default: 20000)'
+    )
+    parser.add_argument(
+        '--no-head-to-head',
+        action='store_true',
+        help='Skip the head-to-head matrix of how often each user finishes ahead of each other user'
+    )
+    parser.add_argument(
+        '--backend',
+        choices=BACKENDS,
+        help=f'Kernel backend; numba compiles the simulation, scoring and ranking loops '
+             f'(default: ${BACKEND_ENV_VAR} or auto, which uses numba when installed)'
+    )
+    
+    args = parser.parse_args()
+    if args.adaptive and args.shard:
+        parser.error('--adaptive cannot be combined with --shard')
+    if args.adaptive:
+        args.streaming = True
+    if args.shard:
+        if args.seed is None:
+            parser.error('--shard requires --seed so that all shards share the same root seed')
+        args.streaming = True
+    return args
+
+def parse_shard(value):
+    """Parse a shard argument like '2/8' into a (shard, num_shards) pair."""
+    try:
+        shard, num_shards = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid shard '{value}', expected i/N")
+    if not 1 <= shard <= num_shards:
+        raise argparse.ArgumentTypeError(f"Shard {shard} is out of range for {num_shards} shards")
+    return shard, num_shards
 
 def run_generation(args):
     """Run the simulation generation step."""
@@ -89,6 +210,17 @@ def run_generation(args):
     if args.processes:
         cmd.extend(["--processes", str(args.processes)])
     
+    if args.seed is not None:
+        cmd.extend(["--seed", str(args.seed)])
+    
+    if args.sampler != 'random':
+        cmd.extend(["--sampler", args.sampler])
+    
+    if args.model != 'seed_linear':
+        cmd.extend(["--model", args.model])
+        if args.ratings_file:
+            cmd.extend(["--ratings-file", args.ratings_file, "--ratings-scale", str(args.ratings_scale)])
+    
     # Run the generation script
     start_time = time.time()
     print(f"Running command: {' '.join(cmd)}")
@@ -114,27 +246,36 @@ def run_generation(args):
         print(e.stderr)
         return None
 
-def run_analysis(args, simulation_file):
-    """Run the simulation analysis step."""
-    print("\n===== Step 2: Analyzing Simulation Results =====\n")
+def get_analysis_file_name(args, count=None):
+    """Get a descriptive filename for the analysis results."""
+    if count is None:
+        count = args.count
     
-    # Generate a descriptive filename for the analysis results
     if args.truth_file:
         # Extract a descriptive part from the truth file name
         basename = os.path.basename(args.truth_file)
         if basename.startswith("round_") and "_game_" in basename:
             # If it's using the round_X_game_Y format
             desc_part = basename.split(" ")[0]
-            file_name = f"analysis_{desc_part}_{args.count}_brackets.json"
+            file_name = f"analysis_{desc_part}_{count}_brackets.json"
         else:
             # For non-standard truth files, use the timestamp
             timestamp = datetime.now().strftime("%Y%m%d")
-            file_name = f"monte_carlo_{timestamp}_{args.count}_brackets.json"
+            file_name = f"monte_carlo_{timestamp}_{count}_brackets.json"
     else:
         # Fallback to a generic filename if no truth file provided
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         file_name = f"analysis_{timestamp}.json"
     
+    return file_name
+
+def run_analysis(args, simulation_file):
+    """Run the simulation analysis step."""
+    print("\n===== Step 2: Analyzing Simulation Results =====\n")
+    
+    # Generate a descriptive filename for the analysis results
+    file_name = get_analysis_file_name(args)
+    
     # Set the specific output file
     output_file = os.path.join(args.output_dir, file_name)
     
@@ -152,6 +293,9 @@ def run_analysis(args, simulation_file):
     if args.visualize:
         cmd.append("--visualize")
     
+    if args.no_head_to_head:
+        cmd.append("--no-head-to-head")
+    
     # Run the analysis script
     start_time = time.time()
     print(f"Running command: {' '.join(cmd)}")
@@ -170,6 +314,86 @@ def run_analysis(args, simulation_file):
         print(e.stderr)
         return None
 
+def run_streaming(args):
+    """Run generation and analysis as a single streaming step."""
+    print("\n===== Generating and Analyzing Simulations (streaming) =====\n")
+    
+    from simulation.monte_carlo import MonteCarloSimulation
+    from simulation.simulation_analyzer import BracketAnalyzer
+    from simulation.streaming import save_analysis_results, PARTIAL_EXTENSION
+    from simulation.win_models import build_win_model
+    
+    truth_bracket = None
+    if args.truth_file:
+        with open(args.truth_file, 'r') as f:
+            truth_bracket = json.load(f)
+    
+    user_brackets = BracketAnalyzer().load_user_brackets(args.user_brackets_dir)
+    if not user_brackets:
+        print("Error: No user brackets found")
+        return None
+    
+    # Shards are numbered from 1 on the command line
+    shard, num_shards = args.shard if args.shard else (1, 1)
+    
+    start_time = time.time()
+    try:
+        model = build_win_model(args.model, args.ratings_file, args.ratings_scale)
+    except (ValueError, OSError) as e:
+        print(f"Error building the win probability model: {str(e)}")
+        return None
+    simulator = MonteCarloSimulation(truth_bracket, truth_file=args.truth_file, output_dir=args.output_dir,
+                                     model=model)
+    
+    if args.adaptive:
+        accumulator = simulator.run_adaptive(
+            user_brackets,
+            target_se=args.target_se,
+            max_simulations=args.count,
+            round_size=args.round_size,
+            batch_size=args.batch_size,
+            num_processes=args.processes,
+            seed=args.seed,
+            sampler=args.sampler,
+            head_to_head=not args.no_head_to_head
+        )
+        # Name the file after the number of simulations actually run
+        file_name = get_analysis_file_name(args, count=accumulator.count)
+        output_file = save_analysis_results(accumulator.results(intervals=True),
+                                            os.path.join(args.output_dir, file_name),
+                                            head_to_head=accumulator.head_to_head())
+        
+        elapsed = time.time() - start_time
+        print(f"Adaptive pipeline completed in {elapsed:.2f} seconds")
+        return output_file
+    
+    accumulator = simulator.run_streaming(
+        user_brackets,
+        num_simulations=args.count,
+        batch_size=args.batch_size,
+        num_processes=args.processes,
+        save_simulations=args.save_simulations,
+        seed=args.seed,
+        shard=shard - 1,
+        num_shards=num_shards,
+        sampler=args.sampler,
+        head_to_head=not args.no_head_to_head
+    )
+    
+    file_name = get_analysis_file_name(args)
+    if args.shard:
+        # Partial results are merged later with merge_shards.py
+        file_name = os.path.splitext(file_name)[0] + f"_shard{shard}of{num_shards}{PARTIAL_EXTENSION}"
+        output_file = accumulator.save(os.path.join(args.output_dir, file_name))
+    else:
+        output_file = save_analysis_results(accumulator.results(), os.path.join(args.output_dir, file_name),
+                                            head_to_head=accumulator.head_to_head())
+    
+    elapsed = time.time() - start_time
+    print(f"Streaming pipeline completed in {elapsed:.2f} seconds")
+    
+    return output_file
+
 def find_most_recent_simulation_file(output_dir):
     """Find the most recent simulation file in the output directory."""
     if not os.path.exists(output_dir):
@@ -177,7 +401,7 @@ def find_most_recent_simulation_file(output_dir):
         
     sim_files = []
     for filename in os.listdir(output_dir):
-        if filename.startswith("brackets_") and filename.endswith(".bin"):
+        if filename.startswith("brackets_") and filename.endswith((".sim", ".bin")):
             file_path = os.path.join(output_dir, filename)
             sim_files.append((file_path, os.path.getmtime(file_path)))
     
@@ -192,10 +416,19 @@ def find_most_recent_simulation_file(output_dir):
 def main():
     """Main function to run the Monte Carlo pipeline."""
     args = parse_arguments()
+    if args.backend:
+        set_backend(args.backend)
     
     # Create output directory if it doesn't exist
     os.makedirs(args.output_dir, exist_ok=True)
     
+    if args.streaming:
+        if not run_streaming(args):
+            print("Streaming pipeline failed")
+            return 1
+        print("\n===== Monte Carlo Pipeline Completed Successfully =====")
+        return 0
+    
     # Step 1: Generate simulations
     simulation_file = None
     
@@ -4,10 +4,16 @@ Run Monte Carlo Simulations for All Truth Files
 
 This script runs Monte Carlo simulations for all truth bracket files, 
 skipping any that already have existing simulation and analysis files.
+
+With --incremental the whole timeline is done in a single pass instead: one
+set of simulations is carried from each truth file to the next, keeping the
+simulations that agree with the new result and topping up the rest (see
+simulation/incremental.py). Every analysis file is rewritten in this mode.
 """
 
 import os
 import argparse
+import json
 import subprocess
 import time
 from datetime import datetime
@@ -47,6 +53,30 @@ def parse_arguments():
         default=0,
         help='Start from this index in the truth files list (0-based)'
     )
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help='Carry one simulation set through the timeline in a single pass, '
+             'topping up only the simulations each new result rules out'
+    )
+    parser.add_argument(
+        '--user-brackets-dir',
+        type=str,
+        default='saved_brackets',
+        help='Directory containing user brackets, for --incremental (default: saved_brackets)'
+    )
+    parser.add_argument(
+        '--seed',
+        type=int,
+        default=None,
+        help='Root random seed for --incremental'
+    )
+    parser.add_argument(
+        '--no-head-to-head',
+        action='store_true',
+        help='With --incremental, skip the head-to-head matrix of how often each user '
+             'finishes ahead of each other user'
+    )
     
     return parser.parse_args()
 
@@ -60,7 +90,7 @@ def get_expected_filenames(truth_file, count, output_dir):
         truth_id = "custom"
     
     # Expected filenames
-    sim_file = f"{output_dir}/brackets_{truth_id}_{count}.bin"
+    sim_file = f"{output_dir}/brackets_{truth_id}_{count}.sim"
     analysis_file = f"{output_dir}/round_{truth_id}_{count}_brackets.json"
     
     # Handle 'custom' case for analysis file
@@ -70,6 +100,50 @@ def get_expected_filenames(truth_file, count, output_dir):
     
     return sim_file, analysis_file
 
+def get_analysis_file(truth_file, count, output_dir):
+    """Get the analysis file name the app looks up for a truth file."""
+    basename = os.path.splitext(os.path.basename(truth_file))[0]
+    if basename.startswith("round_") and "_game_" in basename:
+        # Keep just the round_X_game_Y part of "round_X_game_Y - ... defeats ..."
+        return f"{output_dir}/analysis_{basename.split(' ')[0]}_{count}_brackets.json"
+    timestamp = datetime.now().strftime("%Y%m%d")
+    return f"{output_dir}/monte_carlo_{timestamp}_{count}_brackets.json"
+
+def run_incremental(args, truth_files):
+    """Run the whole timeline in one pass, carrying simulations forward."""
+    from simulation.incremental import IncrementalSimulation
+    from simulation.simulation_analyzer import BracketAnalyzer
+    from simulation.streaming import save_analysis_results
+    
+    user_brackets = BracketAnalyzer().load_user_brackets(args.user_brackets_dir)
+    if not user_brackets:
+        print(f"Error: No user brackets found in {args.user_brackets_dir}")
+        return 1
+    
+    start_time = time.time()
+    simulation = IncrementalSimulation(user_brackets, num_simulations=args.count, seed=args.seed,
+                                       head_to_head=not args.no_head_to_head)
+    total_drawn = 0
+    
+    # The truth files are listed newest first; the timeline runs oldest first
+    timeline = list(reversed(truth_files))
+    for i, truth_file in enumerate(timeline):
+        print(f"\n[{i + 1}/{len(timeline)}] Processing: {truth_file}")
+        with open(truth_file, 'r') as f:
+            truth_bracket = json.load(f)
+        
+        accumulator = simulation.advance(truth_bracket)
+        total_drawn += accumulator.metadata["drawn"]
+        save_analysis_results(accumulator.results(),
+                              get_analysis_file(truth_file, args.count, args.output_dir),
+                              head_to_head=accumulator.head_to_head())
+    
+    elapsed = time.time() - start_time
+    print(f"\nIncremental pass completed in {elapsed:.2f} seconds")
+    print(f"  Truth files: {len(timeline)}")
+    print(f"  Simulations drawn: {total_drawn} (vs {len(timeline) * args.count} from scratch)")
+    return 0
+
 def run_simulation(truth_file, count, output_dir, verbose=False):
     """Run Monte Carlo simulation for a single truth file."""
     # Build the command
@@ -123,6 +197,9 @@ def main():
         truth_files = truth_files[args.start_from:]
         print(f"Skipped {args.start_from} files, {len(truth_files)} files remaining")
     
+    if args.incremental:
+        return run_incremental(args, truth_files)
+    
     # Count for statistics
     total_files = len(truth_files)
     files_processed = 0
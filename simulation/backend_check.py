@@ -0,0 +1,109 @@
+"""
+Backend Check Module
+
+This module checks that the kernel backends in utils.kernels agree. The
+same seeded simulations are generated, scored and ranked with the NumPy
+backend and with the loop backend, and every intermediate array has to be
+identical.
+"""
+
+import time
+
+import numpy as np
+
+from simulation.batch_generator import BatchBracketGenerator
+from simulation.simulation_analyzer import BracketAnalyzer
+from simulation.streaming import (
+    build_points_table, encode_user_picks, score_outcomes, rank_scores, head_to_head_counts
+)
+from utils.bracket_encoding import encode_bracket
+from utils.kernels import NUMBA_AVAILABLE, use_backend
+
+def run_backend(backend, truth_bracket, user_brackets, count, seed, sampler="random"):
+    """
+    Simulate, score and rank with one backend.
+
+    Args:
+        backend (str): Backend name from utils.kernels.BACKENDS
+        truth_bracket (dict): The truth bracket to complete
+        user_brackets (dict): Dictionary mapping usernames to brackets
+        count (int): Number of simulations
+        seed (int): Random seed
+        sampler (str): Sampler name
+
+    Returns:
+        dict: The outcomes, scores, streaming ranks, analyzer rankings and
+              head-to-head counts, and the time each step took
+    """
+    _, picks = encode_user_picks(user_brackets)
+    points = build_points_table()
+    fixed = encode_bracket(truth_bracket)
+    results = {"times": {}}
+
+    with use_backend(backend):
+        start = time.time()
+        results["outcomes"] = BatchBracketGenerator(truth_bracket, seed=seed, sampler=sampler).generate(count)
+        results["times"]["simulate"] = time.time() - start
+
+        start = time.time()
+        results["scores"] = score_outcomes(picks, results["outcomes"], points, fixed=fixed)
+        results["times"]["score"] = time.time() - start
+
+        start = time.time()
+        results["ranks"] = rank_scores(results["scores"])
+        analyzer = BracketAnalyzer(user_brackets=user_brackets)
+        analyzer.scores = results["scores"]
+        analyzer.usernames = list(user_brackets)
+        results["rankings"] = analyzer.calculate_rankings()
+        results["times"]["rank"] = time.time() - start
+
+        start = time.time()
+        results["head_to_head"] = head_to_head_counts(results["scores"])
+        results["times"]["h2h"] = time.time() - start
+
+    return results
+
+def check_backends(truth_bracket, user_brackets, count=2000, seed=0, sampler="random", backend=None):
+    """
+    Compare the loop backend with the NumPy backend for the same seed.
+
+    Args:
+        truth_bracket (dict): The truth bracket to complete
+        user_brackets (dict): Dictionary mapping usernames to brackets
+        count (int): Number of simulations
+        seed (int): Random seed shared by both runs
+        sampler (str): Sampler name
+        backend (str, optional): Loop backend to check; default "numba" if it
+                                 is installed, otherwise the uncompiled "python" loops
+
+    Returns:
+        dict: The backend checked, whether each array matches and the time
+              each step took with each backend
+    """
+    if backend is None:
+        backend = "numba" if NUMBA_AVAILABLE else "python"
+
+    reference = run_backend("numpy", truth_bracket, user_brackets, count, seed, sampler)
+    checked = run_backend(backend, truth_bracket, user_brackets, count, seed, sampler)
+
+    return {
+        "backend": backend,
+        "matches": {key: bool(np.array_equal(reference[key], checked[key]))
+                    for key in ("outcomes", "scores", "ranks", "rankings", "head_to_head")},
+        "times": {"numpy": reference["times"], backend: checked["times"]},
+    }
+
+def print_backend_check(report):
+    """
+    Print the result of check_backends.
+
+    Args:
+        report (dict): Report from check_backends
+    """
+    print(f"\nnumpy vs {report['backend']} backend:")
+    for key, match in report["matches"].items():
+        print(f"  {key:<12} {'identical' if match else 'DIFFERENT'}")
+
+    print(f"\n  {'step':<10} " + " ".join(f"{name:>10}" for name in report["times"]))
+    for step in report["times"]["numpy"]:
+        print(f"  {step:<10} " + " ".join(f"{times[step]:>9.3f}s" for times in report["times"].values()))
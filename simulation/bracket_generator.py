@@ -15,18 +15,21 @@ from pprint import pprint
 import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from utils.bracket_utils import get_most_recent_truth_bracket
+from utils.bracket_encoding import TEAM_INDEX
 from bracket_logic import initialize_bracket, update_winners
+from simulation.win_models import SeedLinearModel
 
 class BracketGenerator:
     """Class that handles random bracket generation for Monte Carlo simulations."""
     
-    def __init__(self, truth_bracket=None):
+    def __init__(self, truth_bracket=None, model=None):
         """
         Initialize the bracket generator.
         
         Args:
             truth_bracket (dict, optional): A truth bracket to use as a base. 
                                            If None, the most recent truth bracket will be used.
+            model (WinModel, optional): Win probability model (default: SeedLinearModel)
         """
         self.truth_bracket = truth_bracket
         if self.truth_bracket is None:
@@ -38,6 +41,10 @@ class BracketGenerator:
             else:
                 # If no truth bracket is available, initialize an empty one
                 self.truth_bracket = initialize_bracket()
+        
+        # Probability that team i beats team j, compiled once by the model
+        self.model = model if model is not None else SeedLinearModel()
+        self.win_prob = self.model.matrix()
     
     def generate_random_bracket(self):
         """
@@ -61,45 +68,26 @@ class BracketGenerator:
     
     def _calculate_win_probability(self, team1, team2):
         """
-        Calculate the probability of team1 winning based on seed difference.
+        Look up the probability of team1 winning in the model's matrix.
         
         Args:
             team1 (dict): First team
             team2 (dict): Second team
             
         Returns:
-            float: Probability of team1 winning (between 0.01 and 0.99)
+            float: Probability of team1 winning
         """
         # Default to 50/50 if either team is missing or doesn't have seed
         if not team1 or not team2 or 'seed' not in team1 or 'seed' not in team2:
             return 0.5
-            
-        # Extract seeds
-        seed1 = team1['seed']
-        seed2 = team2['seed']
-        
-        # Calculate seed difference (absolute value)
-        seed_diff = abs(seed1 - seed2)
-            
-        # Determine which team has the lower seed (lower is better)
-        lower_seed_is_team1 = seed1 < seed2
-        
-        # Maximum seed difference is 15 (1 vs 16)
-        # At max difference, the better team has 99% chance of winning
-        # Linear interpolation between 50% and 99%
-        max_diff = 15.0
-        min_prob = 0.50  # Minimum probability of better seed (equal seed)
-        max_prob = 0.99  # Maximum probability of better seed (for much better seed)
-        
-        # Calculate probability for the better seeded team
-        # Linear interpolation: prob = min_prob + (seed_diff / max_diff) * (max_prob - min_prob)
-        better_team_prob = min_prob + (seed_diff / max_diff) * (max_prob - min_prob)
         
-        # Cap probability between min_prob and max_prob
-        assert better_team_prob >= min_prob and better_team_prob <= max_prob, f"Better team probability {better_team_prob} is out of range"
+        idx1 = TEAM_INDEX.get((team1.get('name'), team1['seed']))
+        idx2 = TEAM_INDEX.get((team2.get('name'), team2['seed']))
+        if idx1 is not None and idx2 is not None:
+            return float(self.win_prob[idx1, idx2])
         
-        # Return probability for team1
-        return better_team_prob if lower_seed_is_team1 else 1.0 - better_team_prob
+        # Teams outside the field only have a seed to go on
+        return self.model.seed_probability(team1['seed'], team2['seed'])
     
     def _weighted_choice(self, team1, team2):
         """
@@ -112,6 +100,10 @@ class BracketGenerator:
         Returns:
             dict: The selected team
         """
+        # A missing opponent means the other team advances
+        if not team1 or not team2:
+            return team1 or team2
+
         # Calculate probability of team1 winning
         team1_prob = self._calculate_win_probability(team1, team2)
         
@@ -211,18 +203,19 @@ class BracketGenerator:
                 champion = self._weighted_choice(team1, team2)
                 bracket['champion'] = champion
 
-def generate_random_completion(truth_bracket=None, count=1):
+def generate_random_completion(truth_bracket=None, count=1, model=None):
     """
     Generate one or more random bracket completions.
     
     Args:
         truth_bracket (dict, optional): The truth bracket to use as a base
         count (int, optional): Number of brackets to generate
+        model (WinModel, optional): Win probability model
         
     Returns:
         list: A list of randomly completed brackets
     """
-    generator = BracketGenerator(truth_bracket)
+    generator = BracketGenerator(truth_bracket, model=model)
     brackets = []
     
     for _ in range(count):
@@ -230,18 +223,23 @@ def generate_random_completion(truth_bracket=None, count=1):
     
     return brackets if count > 1 else brackets[0]
 
-def save_simulations(simulations, output_file=None):
+def save_simulations(simulations, output_file=None, truth_bracket=None):
     """
     Save a list of simulated brackets to a file.
     
+    The brackets are encoded as team id rows and written in the compact
+    simulation format (see simulation.simulation_store).
+    
     Args:
         simulations (list): List of simulated brackets
         output_file (str, optional): Path to save the file. If None, a default path will be used.
+        truth_bracket (dict, optional): Truth bracket the simulations complete
         
     Returns:
         str: Path to the saved file
     """
-    import pickle
+    from simulation.simulation_store import save_outcomes, SIMULATION_EXTENSION
+    from utils.bracket_encoding import encode_brackets
     
     if output_file is None:
         # Create the simulations directory if it doesn't exist
@@ -250,32 +248,33 @@ def save_simulations(simulations, output_file=None):
         # Generate a default filename based on the current time
         from datetime import datetime
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        output_file = f"data/simulations/brackets_{timestamp}.bin"
-    
-    # Ensure the directory exists
-    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+        output_file = f"data/simulations/brackets_{timestamp}{SIMULATION_EXTENSION}"
     
-    # Save the simulations to a compressed pickle file
-    with open(output_file, 'wb') as f:
-        pickle.dump(simulations, f, protocol=pickle.HIGHEST_PROTOCOL)
-    
-    print(f"Saved {len(simulations)} simulations to {output_file}")
-    return output_file
+    return save_outcomes(encode_brackets(simulations), output_file, truth_bracket=truth_bracket)
 
 def load_simulations(input_file):
     """
     Load simulated brackets from a file.
     
+    Files in the compact simulation format are memory-mapped and returned as
+    a SimulationSet, which decodes brackets on access. Legacy pickled files
+    are loaded into a list.
+    
     Args:
         input_file (str): Path to the file containing simulated brackets
         
     Returns:
-        list: List of simulated brackets
+        SimulationSet or list: The simulated brackets
     """
-    import pickle
+    from simulation.simulation_store import is_simulation_file, open_simulations
     
-    with open(input_file, 'rb') as f:
-        simulations = pickle.load(f)
+    if is_simulation_file(input_file):
+        simulations = open_simulations(input_file)
+    else:
+        import pickle
+        
+        with open(input_file, 'rb') as f:
+            simulations = pickle.load(f)
     
     print(f"Loaded {len(simulations)} simulations from {input_file}")
     return simulations
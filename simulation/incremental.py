@@ -0,0 +1,123 @@
+"""
+Incremental Simulation Module
+
+This module carries one set of simulations forward along the truth
+timeline instead of regenerating it for every truth file. Consecutive truth
+files differ by a single result, so when the next truth file arrives the
+simulations that already agree with it are kept and only the ones that
+contradict it are replaced with fresh draws.
+
+Under the independent-game model this is exact: the kept simulations are a
+sample of completions conditioned on the new result, which is the same
+distribution the next truth file would be simulated from. User scores of the
+kept simulations do not change either (a score only depends on the
+completed outcome), so only the fresh draws are scored at each step.
+"""
+
+import time
+
+import numpy as np
+
+from simulation.batch_generator import BatchBracketGenerator, batch_seed_sequence, new_root_seed
+from simulation.simulation_store import truth_bracket_hash
+from simulation.streaming import AnalysisAccumulator, build_points_table, encode_user_picks, score_outcomes
+from simulation.win_models import SeedLinearModel
+from utils.bracket_encoding import NUM_SLOTS, EMPTY, encode_bracket
+
+def consistent_rows(outcomes, truth_bracket):
+    """
+    Find the simulations that agree with every decided result of a truth bracket.
+
+    Args:
+        outcomes (numpy.ndarray): int8 array of shape (count, 63)
+        truth_bracket (dict): The truth bracket
+
+    Returns:
+        numpy.ndarray: Boolean mask of shape (count,)
+    """
+    fixed = encode_bracket(truth_bracket)
+    decided = fixed != EMPTY
+    return (outcomes[:, decided] == fixed[decided]).all(axis=1)
+
+class IncrementalSimulation:
+    """A simulation set and its user scores, advanced one truth file at a time."""
+
+    def __init__(self, user_brackets, num_simulations=100000, model=None, seed=None, head_to_head=False):
+        """
+        Initialize the incremental simulation.
+
+        Args:
+            user_brackets (dict): Dictionary of user brackets {username: bracket}
+            num_simulations (int): Number of simulations kept at every step
+            model (WinModel, optional): Win probability model (default: SeedLinearModel)
+            seed (int, optional): Root seed; step i draws from its own seed sequence
+            head_to_head (bool): Also count the head-to-head results between
+                                 users at every step
+        """
+        self.usernames, self.picks = encode_user_picks(user_brackets)
+        self.points = build_points_table()
+        self.num_simulations = num_simulations
+        self.model = model if model is not None else SeedLinearModel()
+        self.seed = seed if seed is not None else new_root_seed()
+        self.head_to_head = head_to_head
+
+        self.step = 0
+        self.fixed = None
+        self.outcomes = np.empty((0, NUM_SLOTS), dtype=np.int8)
+        self.scores = np.empty((len(self.usernames), 0), dtype=np.int32)
+
+    def advance(self, truth_bracket):
+        """
+        Move the simulations on to the next truth bracket.
+
+        Simulations that contradict the new results are dropped and the
+        deficit is filled with fresh draws from the new truth bracket. If the
+        new truth bracket changes a result that was already decided (a
+        correction rather than a new game), the set is regenerated.
+
+        Args:
+            truth_bracket (dict): The next truth bracket in the timeline
+
+        Returns:
+            AnalysisAccumulator: Statistics of the simulations for this truth
+                                 bracket, with the step counts in its metadata
+        """
+        start_time = time.time()
+        fixed = encode_bracket(truth_bracket)
+
+        if self.fixed is not None and _only_adds_results(self.fixed, fixed):
+            keep = consistent_rows(self.outcomes, truth_bracket)
+        else:
+            keep = np.zeros(len(self.outcomes), dtype=bool)
+        kept = int(keep.sum())
+        deficit = self.num_simulations - kept
+
+        rng = np.random.default_rng(batch_seed_sequence(self.seed, self.step))
+        generator = BatchBracketGenerator(truth_bracket, rng=rng, model=self.model)
+        new_outcomes = generator.generate(deficit)
+        new_scores = score_outcomes(self.picks, new_outcomes, self.points, fixed=fixed)
+
+        self.outcomes = np.concatenate([self.outcomes[keep], new_outcomes])
+        self.scores = np.concatenate([self.scores[:, keep], new_scores], axis=1)
+        self.fixed = fixed
+        self.step += 1
+
+        metadata = {
+            "truth_hash": truth_bracket_hash(truth_bracket),
+            "root_seed": self.seed,
+            "model": self.model.describe(),
+            "incremental_step": self.step - 1,
+            "kept": kept,
+            "drawn": deficit,
+        }
+        accumulator = AnalysisAccumulator(self.usernames, metadata, head_to_head=self.head_to_head)
+        accumulator.update(self.scores)
+
+        elapsed = time.time() - start_time
+        print(f"Kept {kept} simulations, drew {deficit} new ones ({elapsed:.2f} seconds)")
+        return accumulator
+
+def _only_adds_results(old_fixed, new_fixed):
+    """Check that a truth bracket keeps every result of the previous one."""
+    decided = old_fixed != EMPTY
+    return bool((new_fixed[decided] == old_fixed[decided]).all())
@@ -11,35 +11,104 @@ import json
 import time
 from datetime import datetime
 import multiprocessing
+from multiprocessing import shared_memory
+import numpy as np
 from tqdm import tqdm
 
 # Import local modules
-from simulation.bracket_generator import generate_random_completion, save_simulations, load_simulations
+from simulation.bracket_generator import BracketGenerator
+from simulation.batch_generator import BatchBracketGenerator, batch_seed_sequence, new_root_seed
+from simulation.win_models import SeedLinearModel
+from simulation.simulation_store import save_outcomes, SIMULATION_EXTENSION
+from simulation.streaming import run_streaming_analysis
+from utils.bracket_encoding import NUM_SLOTS, encode_brackets
 
-# Define the batch generation function outside of class methods for pickling
+# Switch to exact enumeration when this many games or fewer are undecided
+EXACT_ENUMERATION_THRESHOLD = 15
+
+# Default precision target for adaptive runs: standard error of every
+# user's pct_first_place, in percentage points
+DEFAULT_TARGET_SE = 0.1
+
+# State of a worker process, set up once per run by init_worker
+_worker = {}
+
+def init_worker(truth_bracket, model, sampler, root_seed, vectorized, shm_name, num_simulations):
+    """
+    Set up a pool worker for a simulation run.
+    
+    The truth bracket and model are sent to each worker once, here, rather
+    than with every batch, and the worker attaches to the shared outcome
+    array that all batches are written into.
+    
+    Args:
+        truth_bracket (dict): The truth bracket to complete
+        model (WinModel): Win probability model
+        sampler (str): How the random draws are generated, one of SAMPLERS
+        root_seed (int): Root seed of the run
+        vectorized (bool): Use the NumPy batch generator rather than BracketGenerator
+        shm_name (str): Name of the shared memory block holding the outcomes
+        num_simulations (int): Number of rows in the shared outcome array
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    if vectorized:
+        generator = BatchBracketGenerator(truth_bracket, sampler=sampler, model=model)
+    else:
+        generator = BracketGenerator(truth_bracket, model=model)
+    
+    _worker.clear()
+    _worker.update(
+        generator=generator,
+        root_seed=root_seed,
+        shm=shm,
+        outcomes=np.ndarray((num_simulations, NUM_SLOTS), dtype=np.int8, buffer=shm.buf),
+    )
+
+# Define the batch generation functions outside of class methods for pickling
 def run_batch(args):
     """
-    Run a batch of simulations.
+    Run a batch of simulations with the vectorized batch generator.
+    
+    The outcomes are written straight into the shared outcome array at the
+    batch's offset, so nothing but the timing goes back to the parent.
     
     Args:
-        args (tuple): Tuple containing (batch_idx, truth_bracket, batch_size)
+        args (tuple): Tuple containing (batch_idx, start_row, batch_size)
         
     Returns:
-        tuple: (batch_brackets, batch_time)
+        float: Time taken by the batch in seconds
     """
-    batch_idx, truth_bracket, batch_size = args
+    batch_idx, start_row, batch_size = args
     batch_start = time.time()
-    batch_brackets = generate_random_completion(
-        truth_bracket=truth_bracket, 
-        count=batch_size
-    )
-    batch_time = time.time() - batch_start
-    return batch_brackets, batch_time
+    generator = _worker["generator"]
+    generator.rng = np.random.default_rng(batch_seed_sequence(_worker["root_seed"], batch_idx))
+    _worker["outcomes"][start_row:start_row + batch_size] = generator.generate(batch_size)
+    return time.time() - batch_start
+
+def run_legacy_batch(args):
+    """
+    Run a batch of simulations with the dict-based BracketGenerator.
+    
+    The legacy generator uses the global random module, so the run's root
+    seed is ignored. Brackets are encoded as team id rows in the worker.
+    
+    Args:
+        args (tuple): Tuple containing (batch_idx, start_row, batch_size)
+        
+    Returns:
+        float: Time taken by the batch in seconds
+    """
+    batch_idx, start_row, batch_size = args
+    batch_start = time.time()
+    generator = _worker["generator"]
+    batch_brackets = [generator.generate_random_bracket() for _ in range(batch_size)]
+    _worker["outcomes"][start_row:start_row + batch_size] = encode_brackets(batch_brackets)
+    return time.time() - batch_start
 
 class MonteCarloSimulation:
     """Class that manages running Monte Carlo simulations for bracket analysis."""
     
-    def __init__(self, truth_bracket=None, truth_file=None, output_dir='data/simulations'):
+    def __init__(self, truth_bracket=None, truth_file=None, output_dir='data/simulations', model=None):
         """
         Initialize the Monte Carlo simulation engine.
         
@@ -47,28 +116,71 @@ class MonteCarloSimulation:
             truth_bracket (dict, optional): The truth bracket to use as a base
             truth_file (str, optional): Path to the truth bracket file
             output_dir (str): Directory to save simulation results
+            model (WinModel, optional): Win probability model (default: SeedLinearModel)
         """
         self.truth_bracket = truth_bracket
         self.truth_file = truth_file
         self.output_dir = output_dir
+        self.model = model if model is not None else SeedLinearModel()
+        
+        # Compile the probability matrix once, before it is sent to the workers
+        self.model.matrix()
         
         # Create the output directory if it doesn't exist
         os.makedirs(output_dir, exist_ok=True)
     
-    def run_simulation(self, num_simulations=10000, batch_size=1000, num_processes=None):
+    def _truth_id(self):
+        """Get the truth file identifier (round_X_game_Y...) used in file names."""
+        truth_id = "custom"
+        if hasattr(self, 'truth_file') and self.truth_file:
+            # Extract the basename without extension
+            basename = os.path.basename(self.truth_file)
+            if basename.startswith("round_") and "_game_" in basename:
+                truth_id = os.path.splitext(basename)[0]  # Remove extension
+        return truth_id
+    
+    def run_simulation(self, num_simulations=10000, batch_size=1000, num_processes=None, vectorized=True,
+                       exact_threshold=EXACT_ENUMERATION_THRESHOLD, seed=None, sampler="random"):
         """
         Run a Monte Carlo simulation, generating num_simulations random brackets.
         
+        When exact_threshold or fewer games are left undecided, every possible
+        completion is enumerated instead (see run_exact), which gives exact
+        probabilities for less work than sampling. num_simulations, seed and
+        sampler are then ignored; pass exact_threshold=-1 to always sample.
+        
         Args:
             num_simulations (int): Total number of simulations to run
             batch_size (int): Number of simulations per batch/process
             num_processes (int, optional): Number of processes to use for parallelization.
                                           If None, will use available CPU cores.
+            vectorized (bool): Use the NumPy batch generator (default). If False,
+                               fall back to the dict-based BracketGenerator.
+            exact_threshold (int): Maximum number of undecided games for exact
+                                   enumeration. Use a negative value to always sample.
+            seed (int, optional): Root seed. Each batch draws from its own seed
+                                  sequence derived from it, so the same seed and
+                                  batch size always give the same simulations.
+                                  A fresh seed is drawn (and recorded) if None.
+            sampler (str): How the random draws are generated, one of SAMPLERS
+                           (random, antithetic, stratified, sobol)
                                           
         Returns:
             str: Path to the file containing the simulation results
         """
+        if sampler != "random" and not vectorized:
+            raise ValueError("Only the vectorized generator supports variance-reduced samplers")
+        if vectorized and exact_threshold >= 0:
+            undecided = BatchBracketGenerator(self.truth_bracket, model=self.model).undecided_games
+            if undecided <= exact_threshold:
+                print(f"Only {undecided} games left undecided (exact_threshold={exact_threshold}): "
+                      f"enumerating every outcome instead of sampling; ignoring "
+                      f"num_simulations={num_simulations}, seed={seed}, sampler={sampler}")
+                return self.run_exact()
+        
         start_time = time.time()
+        if seed is None:
+            seed = new_root_seed()
         
         # Determine number of processes to use
         if num_processes is None:
@@ -84,58 +196,236 @@ class MonteCarloSimulation:
         
         print(f"Running {actual_simulations} simulations ({num_batches} batches of {batch_size}) using {num_processes} processes")
         
-        # Prepare batch arguments
+        # Prepare batch arguments; batch b fills rows [b * batch_size, ...)
         batch_args = []
-        remaining = num_simulations
-        
         for batch_idx in range(num_batches):
-            # For the last batch, adjust size if needed
-            current_batch_size = min(batch_size, remaining)
-            batch_args.append((batch_idx, self.truth_bracket, current_batch_size))
-            remaining -= current_batch_size
-        
-        # Run the batches in parallel
-        all_brackets = []
-        total_batch_time = 0
-        
-        # Create a process pool
-        with multiprocessing.Pool(processes=num_processes) as pool:
-            # Map the run_batch function to the batch arguments with progress tracking
-            results = list(tqdm(
-                pool.imap(run_batch, batch_args),
-                total=num_batches,
-                desc="Generating simulations"
-            ))
-            
-            # Collect all the results
-            for batch_brackets, batch_time in results:
-                all_brackets.extend(batch_brackets)
-                total_batch_time += batch_time
-        
-        # Extract truth file identifier (round_X_game_Y) if available
-        truth_id = "custom"
-        if hasattr(self, 'truth_file') and self.truth_file:
-            # Extract the basename without extension
-            basename = os.path.basename(self.truth_file)
-            if basename.startswith("round_") and "_game_" in basename:
-                truth_id = os.path.splitext(basename)[0]  # Remove extension
-        
-        # Generate filename without timestamp
-        sim_count = len(all_brackets)
-        output_file = f"{self.output_dir}/brackets_{truth_id}_{sim_count}.bin"
+            start_row = batch_idx * batch_size
+            batch_args.append((batch_idx, start_row, min(batch_size, num_simulations - start_row)))
         
-        # Save the simulations
-        save_simulations(all_brackets, output_file)
+        # Workers write their rows into one shared array, so the parent never
+        # unpickles or concatenates per-batch results
+        shm = shared_memory.SharedMemory(create=True, size=max(1, num_simulations * NUM_SLOTS))
+        try:
+            outcomes = np.ndarray((num_simulations, NUM_SLOTS), dtype=np.int8, buffer=shm.buf)
+            total_batch_time = 0
+            batch_function = run_batch if vectorized else run_legacy_batch
+            worker_args = (self.truth_bracket, self.model, sampler, seed, vectorized,
+                           shm.name, num_simulations)
+            
+            # Create a process pool
+            with multiprocessing.Pool(processes=num_processes, initializer=init_worker,
+                                      initargs=worker_args) as pool:
+                for batch_time in tqdm(
+                        pool.imap_unordered(batch_function, batch_args),
+                        total=num_batches,
+                        desc="Generating simulations"):
+                    total_batch_time += batch_time
+            
+            # Extract truth file identifier (round_X_game_Y) if available
+            truth_id = self._truth_id()
+            
+            # Generate filename without timestamp
+            sim_count = len(outcomes)
+            output_file = f"{self.output_dir}/brackets_{truth_id}_{sim_count}{SIMULATION_EXTENSION}"
+            
+            # Save the simulations straight from shared memory
+            save_outcomes(outcomes, output_file, truth_bracket=self.truth_bracket, model=self.model.describe(),
+                          seed=seed if vectorized else None, truth_id=truth_id, batch_size=batch_size,
+                          sampler=sampler)
+        finally:
+            # The array must be released before the block can be closed
+            outcomes = None
+            shm.close()
+            shm.unlink()
         
         # Print summary
         elapsed = time.time() - start_time
         print(f"Simulation completed in {elapsed:.2f} seconds")
         print(f"Average batch processing time: {total_batch_time / num_batches:.2f} seconds")
-        print(f"Generated {len(all_brackets)} brackets")
+        print(f"Generated {sim_count} brackets")
         print(f"Saved to: {output_file}")
         
         return output_file
     
+    def run_exact(self):
+        """
+        Enumerate all 2^k completions of the k undecided games.
+        
+        Each scenario is saved together with its probability under the win
+        probability model, so analysis weights scenarios instead of counting
+        samples.
+        
+        Returns:
+            str: Path to the file containing the weighted scenarios
+        """
+        start_time = time.time()
+        generator = BatchBracketGenerator(self.truth_bracket, model=self.model)
+        undecided = generator.undecided_games
+        
+        print(f"Enumerating all {2 ** undecided} outcomes of the {undecided} remaining games")
+        outcomes, weights = generator.enumerate_outcomes()
+        
+        truth_id = self._truth_id()
+        output_file = f"{self.output_dir}/brackets_{truth_id}_{len(outcomes)}{SIMULATION_EXTENSION}"
+        save_outcomes(outcomes, output_file, truth_bracket=self.truth_bracket, model=self.model.describe(),
+                      weights=weights,
+                      truth_id=truth_id, method="exact", undecided_games=undecided)
+        
+        elapsed = time.time() - start_time
+        print(f"Enumeration completed in {elapsed:.2f} seconds")
+        print(f"Saved to: {output_file}")
+        
+        return output_file
+    
+    def run_streaming(self, user_brackets, num_simulations=10000, batch_size=10000, num_processes=None,
+                      save_simulations=False, seed=None, shard=0, num_shards=1, sampler="random",
+                      head_to_head=False):
+        """
+        Generate and score simulations chunk by chunk without keeping them.
+        
+        Workers score each chunk against every user bracket as soon as it is
+        generated and send back only per-user accumulators, so memory does not
+        grow with num_simulations. Only the standard rules are scored; save the
+        simulations to analyze them under other rule sets.
+        
+        Args:
+            user_brackets (dict): Dictionary of user brackets {username: bracket}
+            num_simulations (int): Total number of simulations to run
+            batch_size (int): Number of simulations per chunk
+            num_processes (int, optional): Number of processes to use.
+                                          If None, will use available CPU cores.
+            save_simulations (bool): Also write the simulated outcomes to a file
+            seed (int, optional): Root seed shared by all shards of the run
+            shard (int): Index of the shard to run (0-based)
+            num_shards (int): Number of shards the run is split into
+            sampler (str): How the random draws are generated, one of SAMPLERS
+            head_to_head (bool): Also count the head-to-head results between users
+            
+        Returns:
+            AnalysisAccumulator: Per-user accumulators for this shard. Call
+                                 results() for the statistics produced by
+                                 BracketAnalyzer.analyze_results, or save() to
+                                 write a partial analysis file for merging.
+        """
+        start_time = time.time()
+        
+        simulation_file = None
+        if save_simulations:
+            truth_id = self._truth_id()
+            shard_suffix = f"_shard{shard + 1}of{num_shards}" if num_shards > 1 else ""
+            simulation_file = f"{self.output_dir}/brackets_{truth_id}_{num_simulations}{shard_suffix}{SIMULATION_EXTENSION}"
+        
+        accumulator = run_streaming_analysis(
+            self.truth_bracket, user_brackets,
+            num_simulations=num_simulations,
+            batch_size=batch_size,
+            num_processes=num_processes,
+            simulation_file=simulation_file,
+            root_seed=seed,
+            shard=shard,
+            num_shards=num_shards,
+            sampler=sampler,
+            model=self.model,
+            head_to_head=head_to_head
+        )
+        
+        elapsed = time.time() - start_time
+        print(f"Streaming analysis of {accumulator.count} simulations completed in {elapsed:.2f} seconds")
+        return accumulator
+    
+    def run_adaptive(self, user_brackets, target_se=DEFAULT_TARGET_SE, max_simulations=1000000,
+                     round_size=20000, batch_size=10000, num_processes=None, seed=None, sampler="random",
+                     head_to_head=False):
+        """
+        Run streaming simulations in rounds until every user's win chance is precise.
+        
+        After each round the standard error of every user's pct_first_place is
+        checked. The run stops as soon as all of them are at most target_se, or
+        when max_simulations is reached. The size of the next round is projected
+        from the worst standard error so far (at most doubling the run each time).
+        
+        Rounds continue the same batch seed sequence, so an adaptive run that
+        stops after N simulations gives the same result as a streaming run of N
+        simulations with the same seed and batch size.
+        
+        Args:
+            user_brackets (dict): Dictionary of user brackets {username: bracket}
+            target_se (float): Target standard error of pct_first_place, in
+                               percentage points
+            max_simulations (int): Simulation budget
+            round_size (int): Minimum number of simulations per round
+            batch_size (int): Number of simulations per chunk
+            num_processes (int, optional): Number of processes to use.
+                                          If None, will use available CPU cores.
+            seed (int, optional): Root seed of the run
+            sampler (str): How the random draws are generated, one of SAMPLERS
+            head_to_head (bool): Also count the head-to-head results between users
+            
+        Returns:
+            AnalysisAccumulator: Accumulators for all rounds. The metadata records
+                                 the target, the achieved precision and whether
+                                 the run converged.
+        """
+        if max_simulations < 1:
+            raise ValueError("max_simulations must be at least 1")
+        
+        start_time = time.time()
+        if seed is None:
+            seed = new_root_seed()
+        
+        # Rounds are whole batches so that batch seeds line up across rounds
+        round_size = max(batch_size, round_size // batch_size * batch_size)
+        
+        total = None
+        next_round = round_size
+        rounds = 0
+        while True:
+            next_round = min(next_round, max_simulations - (total.count if total else 0))
+            if next_round <= 0:
+                break
+            
+            accumulator = run_streaming_analysis(
+                self.truth_bracket, user_brackets,
+                num_simulations=next_round,
+                batch_size=batch_size,
+                num_processes=num_processes,
+                root_seed=seed,
+                first_batch=total.count // batch_size if total else 0,
+                sampler=sampler,
+                model=self.model,
+                head_to_head=head_to_head
+            )
+            total = accumulator if total is None else total.merge(accumulator)
+            rounds += 1
+            
+            standard_error = total.first_place_interval()[0]
+            worst = float(standard_error.max()) if len(standard_error) else 0.0
+            print(f"Round {rounds}: {total.count} simulations, "
+                  f"largest win % standard error {worst:.3f} (target {target_se})")
+            if worst <= target_se:
+                break
+            
+            # Standard errors shrink with the square root of the count
+            needed = int(np.ceil(total.count * (worst / target_se) ** 2)) - total.count
+            next_round = min(max(needed, round_size), total.count)
+            next_round = -(-next_round // batch_size) * batch_size
+        
+        total.metadata.update({
+            "root_seed": seed,
+            "num_simulations": total.count,
+            "adaptive": True,
+            "target_se": target_se,
+            "achieved_se": worst,
+            "converged": worst <= target_se,
+            "rounds": rounds,
+        })
+        total.metadata.pop("batches", None)
+        
+        elapsed = time.time() - start_time
+        status = "converged" if worst <= target_se else "stopped at the simulation budget"
+        print(f"Adaptive run {status} after {total.count} simulations in {elapsed:.2f} seconds")
+        return total
+    
     @staticmethod
     def generate_simulation_file(truth_bracket=None, num_simulations=10000):
         """
@@ -151,7 +441,9 @@ class MonteCarloSimulation:
         simulator = MonteCarloSimulation(truth_bracket)
         return simulator.run_simulation(num_simulations)
 
-def run_monte_carlo(truth_bracket_file=None, num_simulations=10000):
+def run_monte_carlo(truth_bracket_file=None, num_simulations=10000, num_processes=None,
+                    batch_size=1000, exact_threshold=EXACT_ENUMERATION_THRESHOLD, seed=None,
+                    output_dir='data/simulations', sampler="random", model=None):
     """
     Run a Monte Carlo simulation from a truth bracket file.
     
@@ -159,6 +451,13 @@ def run_monte_carlo(truth_bracket_file=None, num_simulations=10000):
         truth_bracket_file (str, optional): Path to the truth bracket file.
                                            If None, the most recent truth bracket will be used.
         num_simulations (int): Number of simulations to generate
+        num_processes (int, optional): Number of worker processes
+        batch_size (int): Number of simulations per batch
+        exact_threshold (int): Maximum number of undecided games for exact enumeration
+        seed (int, optional): Root seed for reproducible runs
+        output_dir (str): Directory to save simulation results
+        sampler (str): How the random draws are generated, one of SAMPLERS
+        model (WinModel, optional): Win probability model
         
     Returns:
         str: Path to the generated simulation file
@@ -170,8 +469,10 @@ def run_monte_carlo(truth_bracket_file=None, num_simulations=10000):
             truth_bracket = json.load(f)
             
     # Run the simulation
-    simulator = MonteCarloSimulation(truth_bracket, truth_file=truth_bracket_file)
-    return simulator.run_simulation(num_simulations)
+    simulator = MonteCarloSimulation(truth_bracket, truth_file=truth_bracket_file, output_dir=output_dir,
+                                     model=model)
+    return simulator.run_simulation(num_simulations, batch_size=batch_size, num_processes=num_processes,
+                                    exact_threshold=exact_threshold, seed=seed, sampler=sampler)
 
 if __name__ == "__main__":
     # Example usage
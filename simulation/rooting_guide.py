@@ -0,0 +1,179 @@
+"""
+Rooting Guide Module
+
+This module answers "what are everyone's win chances if team X wins game G"
+for every remaining game at once, from stored data. The analysis saves each
+user's first-place finishes as a bitmap over the simulations, next to the
+analysis JSON. Intersecting those bitmaps with the outcome index of the
+simulation file (see simulation.simulation_store) gives every user's win
+probability conditional on every outcome, without simulating again.
+
+Only NumPy is needed, so the web app can build the guide.
+"""
+
+import json
+import os
+
+import numpy as np
+
+from simulation.simulation_store import count_bits, intersection_counts, open_outcome_index, open_simulations
+from utils.bracket_encoding import ROUNDS, SLOT_POSITIONS, SLOT_ROUND, TEAMS
+
+# Suffix of the first-place bitmap file saved next to an analysis JSON
+FIRST_PLACE_EXTENSION = ".first_place.npz"
+
+# Decimal places of the percentages in the rooting guide
+GUIDE_DECIMALS = 4
+
+def first_place_file(analysis_file):
+    """
+    Get the path of the first-place bitmaps that belong to an analysis file.
+
+    Args:
+        analysis_file (str): Path to the analysis JSON
+
+    Returns:
+        str: Path to the first-place file
+    """
+    return os.path.splitext(analysis_file)[0] + FIRST_PLACE_EXTENSION
+
+def save_first_place(output_file, usernames, bitmaps, count, simulation_file):
+    """
+    Save every user's first-place simulations.
+
+    Args:
+        output_file (str): Path to save the file
+        usernames (list): Usernames in the order of the bitmap rows
+        bitmaps (numpy.ndarray): Packed uint8 bitmaps of shape (users, ceil(count / 8));
+                                 bit i of row u is set if user u finished
+                                 first (ties included) in simulation i
+        count (int): Number of simulations
+        simulation_file (str): Simulation file the analysis read, recorded
+                               relative to the first-place file
+
+    Returns:
+        str: Path to the saved file
+    """
+    header = {
+        "usernames": list(usernames),
+        "count": int(count),
+        "simulation_file": os.path.relpath(simulation_file, os.path.dirname(os.path.abspath(output_file))),
+    }
+    with open(output_file, 'wb') as f:
+        np.savez_compressed(f, header=np.array(json.dumps(header)), bitmaps=bitmaps)
+    print(f"Saved first-place bitmaps of {len(header['usernames'])} users to {output_file}")
+    return output_file
+
+def load_first_place(input_file):
+    """
+    Load a file written by save_first_place().
+
+    Args:
+        input_file (str): Path to the file
+
+    Returns:
+        tuple: (usernames, bitmaps, count, simulation_file), with the path of
+               the simulation file resolved
+    """
+    with np.load(input_file, allow_pickle=False) as data:
+        header = json.loads(str(data['header']))
+        bitmaps = data['bitmaps']
+    simulation_file = os.path.join(os.path.dirname(os.path.abspath(input_file)), header["simulation_file"])
+    return header["usernames"], bitmaps, header["count"], simulation_file
+
+def conditional_win_probabilities(index, first_place, weights=None):
+    """
+    Compute every user's win probability given each indexed outcome.
+
+    Args:
+        index (OutcomeIndex): Outcome index of the simulations
+        first_place (numpy.ndarray): Packed first-place bitmaps of shape
+                                     (users, ceil(count / 8))
+        weights (numpy.ndarray, optional): Probability of each simulation, for
+                                           weighted scenarios
+
+    Returns:
+        tuple: (outcome_pct, win_pct), where outcome_pct[e] is the percentage of
+               simulations with outcome e and win_pct[e, u] the percentage of
+               those that user u wins (0 if the outcome has no weight)
+    """
+    totals = count_bits(index.bitmaps, weights).astype(np.float64)
+    total = index.count if weights is None else float(np.sum(weights))
+    # Shared bits of every outcome's bitmap and every user's bitmap
+    wins = intersection_counts(index.bitmaps, first_place, weights)
+
+    win_pct = np.divide(wins * 100, totals[:, None], out=np.zeros_like(wins), where=totals[:, None] > 0)
+    outcome_pct = totals / total * 100 if total else np.zeros(len(totals))
+    return outcome_pct, win_pct
+
+def rooting_guide(index, usernames, first_place, weights=None):
+    """
+    Build the rooting guide: everyone's win probability under each outcome
+    of every remaining game.
+
+    Args:
+        index (OutcomeIndex): Outcome index of the simulations
+        usernames (list): Usernames in the order of the first_place rows
+        first_place (numpy.ndarray): Packed first-place bitmaps
+        weights (numpy.ndarray, optional): Probability of each simulation
+
+    Returns:
+        dict: num_simulations, each user's overall win_pct, and for every
+              remaining game (in slot order) its round, region and outcomes.
+              Each outcome gives the winning team, the percentage of
+              simulations it happens in and every user's win_pct given it.
+    """
+    total = index.count if weights is None else float(np.sum(weights))
+    overall = count_bits(first_place, weights) / total * 100 if total else np.zeros(len(usernames))
+    outcome_pct, win_pct = conditional_win_probabilities(index, first_place, weights)
+
+    games = []
+    for entry, (slot, team) in enumerate(zip(index.slots, index.teams)):
+        slot = int(slot)
+        if not games or games[-1]['slot'] != slot:
+            position = SLOT_POSITIONS[slot]
+            games.append({
+                'slot': slot,
+                'round': ROUNDS[SLOT_ROUND[slot]][0],
+                'region': position[0] if len(position) == 3 else None,
+                'outcomes': [],
+            })
+        winner = TEAMS[team]
+        games[-1]['outcomes'].append({
+            'team': {'name': winner['name'], 'seed': winner['seed']},
+            'pct_simulations': round(float(outcome_pct[entry]), GUIDE_DECIMALS),
+            'win_pct': {username: round(float(win_pct[entry, u]), GUIDE_DECIMALS)
+                        for u, username in enumerate(usernames)},
+        })
+
+    return {
+        'num_simulations': index.count,
+        'win_pct': {username: round(float(overall[u]), GUIDE_DECIMALS)
+                    for u, username in enumerate(usernames)},
+        'games': games,
+    }
+
+def load_rooting_guide(analysis_file):
+    """
+    Build the rooting guide of an analysis from its stored files.
+
+    Args:
+        analysis_file (str): Path to the analysis JSON
+
+    Returns:
+        dict: rooting_guide() output, or None if the analysis has no
+              first-place bitmaps or its simulation file is gone
+    """
+    path = first_place_file(analysis_file)
+    if not os.path.exists(path):
+        return None
+    usernames, first_place, count, simulation_file = load_first_place(path)
+    if not os.path.exists(simulation_file):
+        print(f"Simulation file {simulation_file} of {path} not found")
+        return None
+
+    index = open_outcome_index(simulation_file)
+    if index.count != count:
+        raise ValueError(f"{path} covers {count} simulations but {simulation_file} has {index.count}")
+    weights = open_simulations(simulation_file).weights
+    return rooting_guide(index, usernames, first_place, weights)
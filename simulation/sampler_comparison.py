@@ -0,0 +1,88 @@
+"""
+Sampler Comparison Module
+
+This module measures how much each variance-reduced sampler actually helps
+for a given pool. Every sampler runs the same number of independent
+replicates of the same size; the spread of each user's first place
+percentage across replicates is the sampler's error, and the ratio of the
+naive sampler's variance to a sampler's variance is its efficiency (how many
+naive simulations one of its simulations is worth).
+"""
+
+import time
+
+import numpy as np
+
+from simulation.batch_generator import BatchBracketGenerator, SAMPLERS, batch_seed_sequence, new_root_seed
+from simulation.streaming import build_points_table, encode_user_picks, score_outcomes, rank_scores
+from utils.bracket_encoding import encode_bracket
+
+def compare_samplers(truth_bracket, user_brackets, samplers=SAMPLERS, count=2000, replicates=20, seed=None):
+    """
+    Run independent replicates with each sampler and compare their variance.
+
+    Args:
+        truth_bracket (dict): The truth bracket to complete
+        user_brackets (dict): Dictionary mapping usernames to brackets
+        samplers (sequence): Sampler names to compare; "random" is always included
+        count (int): Simulations per replicate
+        replicates (int): Number of independent replicates per sampler
+        seed (int, optional): Root seed; replicate r of every sampler uses the
+                              same seed sequence
+
+    Returns:
+        dict: Per-sampler report with the mean first place percentage and its
+              variance across replicates for each user, the mean variance over
+              users, the efficiency relative to "random" and the run time
+    """
+    if seed is None:
+        seed = new_root_seed()
+    samplers = ["random"] + [s for s in samplers if s != "random"]
+
+    usernames, picks = encode_user_picks(user_brackets)
+    points = build_points_table()
+    fixed = encode_bracket(truth_bracket)
+
+    report = {}
+    for sampler in samplers:
+        estimates = np.zeros((replicates, len(usernames)))
+        start = time.time()
+        for replicate in range(replicates):
+            rng = np.random.default_rng(batch_seed_sequence(seed, replicate))
+            outcomes = BatchBracketGenerator(truth_bracket, rng=rng, sampler=sampler).generate(count)
+            ranks = rank_scores(score_outcomes(picks, outcomes, points, fixed=fixed))
+            estimates[replicate] = 100 * (ranks == 1).mean(axis=1)
+
+        variance = estimates.var(axis=0, ddof=1)
+        report[sampler] = {
+            "mean_pct_first_place": dict(zip(usernames, estimates.mean(axis=0))),
+            "variance": dict(zip(usernames, variance)),
+            "mean_variance": float(variance.mean()),
+            "time": time.time() - start,
+        }
+
+    baseline = report["random"]["mean_variance"]
+    for stats in report.values():
+        # A pool where nobody's chances vary has nothing to reduce
+        stats["efficiency"] = baseline / stats["mean_variance"] if stats["mean_variance"] > 0 else float("inf")
+
+    return report
+
+def print_comparison(report, count, replicates):
+    """
+    Print a sampler comparison report as a table.
+
+    Args:
+        report (dict): Output of compare_samplers
+        count (int): Simulations per replicate
+        replicates (int): Number of replicates per sampler
+    """
+    print(f"\nSampler comparison: {replicates} replicates of {count} simulations each")
+    print(f"{'Sampler':<12} {'Mean var':>10} {'Efficiency':>11} {'Worst user SE':>14} {'Time (s)':>9}")
+    print("-" * 60)
+    for sampler, stats in report.items():
+        worst_se = np.sqrt(max(stats["variance"].values()))
+        print(f"{sampler:<12} {stats['mean_variance']:>10.4f} {stats['efficiency']:>10.2f}x "
+              f"{worst_se:>14.3f} {stats['time']:>9.2f}")
+    print("\nEfficiency is the naive variance divided by the sampler's variance, i.e. how many")
+    print("naive simulations each simulation of that sampler is worth for this pool.")
@@ -14,37 +14,73 @@ import matplotlib.pyplot as plt
 from datetime import datetime
 
 # Import scoring functions
-from utils.scoring import compare_with_truth, calculate_points_for_pick, get_correct_picks_and_scores
+from utils.scoring import (
+    calculate_points_for_pick, score_bracket, score_many, score_outcomes, get_rule_sets, get_scoring_rules
+)
+from simulation.simulation_store import is_simulation_file, open_simulations, open_outcome_index, BitmapWriter
+from simulation.rooting_guide import first_place_file, save_first_place
+from simulation.streaming import (
+    save_analysis_results, encode_user_picks, decided_slots, rank_scores, user_histograms, histogram_statistics,
+    head_to_head_counts, head_to_head_matrix, AnalysisAccumulator, ANALYSIS_SECTIONS
+)
+from utils.bracket_encoding import EMPTY, encode_bracket, encode_brackets
+
+# Simulations scored and ranked together by analyze_in_chunks
+ANALYSIS_CHUNK_SIZE = 65536
 
 class BracketAnalyzer:
     """Class for analyzing Monte Carlo simulation results"""
     
-    def __init__(self, simulations=None, user_brackets=None):
+    def __init__(self, simulations=None, user_brackets=None, weights=None, rule_sets=None):
         """
         Initialize the bracket analyzer.
         
         Args:
             simulations (list, optional): List of simulated brackets
             user_brackets (dict, optional): Dictionary of user brackets {username: bracket}
+            weights (array-like, optional): Probability of each simulation when the
+                                            simulations are weighted scenarios (e.g. from
+                                            exact enumeration). None means equally likely.
+            rule_sets (list or dict, optional): Named scoring rules to analyze side by
+                                                side, as accepted by get_rule_sets. The
+                                                first one is the primary analysis.
+                                                None means the standard rules only.
         """
         self.simulations = simulations
         self.user_brackets = user_brackets
+        self.weights = None if weights is None else np.asarray(weights, dtype=np.float64)
+        self.rule_sets = None if rule_sets is None else get_rule_sets(rule_sets)
         self.scores = None
+        self.rule_set_scores = None
         self.rankings = None
         self.analysis_results = None
+        self.rule_set_results = None
+        self.head_to_head = None
+        self.first_place = None
+        self.simulation_file = None
+        self.simulation_count = None
         
     def load_simulations(self, simulation_file):
         """
         Load simulations from a file.
         
+        Compact simulation files are memory-mapped rather than read, so only
+        the rows that are actually scored get paged in. Legacy pickled files
+        are still accepted.
+        
         Args:
             simulation_file (str): Path to the simulation file
             
         Returns:
-            list: The loaded simulations
+            SimulationSet or list: The loaded simulations
         """
-        with open(simulation_file, 'rb') as f:
-            self.simulations = pickle.load(f)
+        if is_simulation_file(simulation_file):
+            self.simulations = open_simulations(simulation_file)
+            self.weights = self.simulations.weights
+            self.simulation_file = simulation_file
+        else:
+            with open(simulation_file, 'rb') as f:
+                self.simulations = pickle.load(f)
         print(f"Loaded {len(self.simulations)} simulations from {simulation_file}")
         return self.simulations
     
@@ -78,6 +114,10 @@ class BracketAnalyzer:
             # Skip 'anonymous' user
             if username == 'anonymous':
                 continue
+            # These names would collide with sections of the analysis file
+            if username in ANALYSIS_SECTIONS:
+                print(f"Skipping user '{username}': the name is reserved for the analysis file")
+                continue
                 
             most_recent_file = None
             most_recent_time = 0
@@ -115,16 +155,69 @@ class BracketAnalyzer:
         print(f"Loaded brackets for {len(user_brackets)} users")
         return user_brackets
     
-    def calculate_scores(self):
+    def calculate_scores(self, vectorized=True, truth_bracket=None):
         """
         Calculate scores for all user brackets against all simulations.
         
+        Each user's points from decided games are added up once and only the
+        undecided slots are scored per simulation. With several rule sets,
+        all of them are scored in the same pass over the simulations and
+        self.scores holds the primary rule set's scores.
+        
+        Args:
+            vectorized (bool): Score with the array kernel (default). If False,
+                               fall back to score_bracket for every
+                               user and simulation, which gives the same
+                               scores far more slowly.
+            truth_bracket (dict, optional): Truth bracket the simulations
+                                            complete. If None, the decided
+                                            games are the slots with the same
+                                            winner in every simulation.
+        
         Returns:
             numpy.ndarray: 2D array of scores [users, simulations]
         """
         if not self.simulations or not self.user_brackets:
             raise ValueError("Simulations and user brackets must be loaded first")
         
+        if not vectorized:
+            if self.rule_sets is not None:
+                raise ValueError("Rule sets can only be scored with the vectorized kernel")
+            return self._calculate_scores_by_comparison()
+        
+        usernames, picks = encode_user_picks(self.user_brackets)
+        num_simulations = len(self.simulations)
+        print(f"Scoring {len(usernames)} users against {num_simulations} simulations")
+        
+        # Compact simulation files already hold team id rows; lists of bracket
+        # dicts are encoded first
+        if hasattr(self.simulations, 'outcomes'):
+            outcomes = self.simulations.outcomes
+        else:
+            outcomes = encode_brackets(self.simulations)
+        
+        if truth_bracket is not None:
+            fixed = encode_bracket(truth_bracket)
+        else:
+            fixed = decided_slots(outcomes)
+        undecided = int((fixed == EMPTY).sum())
+        print(f"Scoring {undecided} undecided slots per simulation")
+        
+        if self.rule_sets is not None:
+            # One points table per rule set; the match lookups are shared
+            print(f"Scoring rule sets: {', '.join(self.rule_sets)}")
+            points = np.stack([rules.points_table() for rules in self.rule_sets.values()])
+            scores = score_outcomes(picks, outcomes, points, fixed=fixed)
+            self.rule_set_scores = dict(zip(self.rule_sets, scores))
+            self.scores = scores[0]
+        else:
+            scores = score_many(picks, outcomes, fields=["total_with_bonus"], fixed=fixed)
+            self.scores = np.ascontiguousarray(scores["total_with_bonus"])
+        self.usernames = usernames
+        return self.scores
+    
+    def _calculate_scores_by_comparison(self):
+        """Score every user against every simulation with score_bracket."""
         # Create a 2D array to store scores [users, simulations]
         num_users = len(self.user_brackets)
         num_simulations = len(self.simulations)
@@ -142,10 +235,8 @@ class BracketAnalyzer:
             for user_idx, username in enumerate(usernames):
                 user_bracket = self.user_brackets[username]
                 
-                # Calculate score using the compare_with_truth function
-                result = compare_with_truth(user_bracket, simulation)
-                correct_picks = get_correct_picks_and_scores(result)
-                scores[user_idx, sim_idx] = correct_picks['total_with_bonus']
+                # Score the pick dicts directly, without copying the bracket
+                scores[user_idx, sim_idx] = score_bracket(user_bracket, simulation)['total_with_bonus']
         
         self.scores = scores
         self.usernames = usernames
@@ -154,7 +245,8 @@ class BracketAnalyzer:
     def calculate_rankings(self):
         """
         Calculate rankings for all users across all simulations.
-        Properly handles ties (users with the same score get the same rank).
+        Properly handles ties (users with the same score get the same rank):
+        a user's rank is one plus the number of users with a higher score.
         
         Returns:
             numpy.ndarray: 2D array of rankings [users, simulations]
@@ -180,31 +272,9 @@ class BracketAnalyzer:
             self.rankings = np.ones((1, num_simulations), dtype=np.int32)
             return self.rankings
         
-        # Create array to store rankings [users, simulations]
-        rankings = np.zeros((num_users, num_simulations), dtype=np.int32)
-        
-        # For each simulation, calculate rankings
-        for sim_idx in range(num_simulations):
-            # Get scores for this simulation
-            sim_scores = self.scores[:, sim_idx]
-            
-            # Calculate rankings with tie handling
-            # First, sort scores in descending order
-            sorted_indices = np.argsort(-sim_scores)
-            sorted_scores = sim_scores[sorted_indices]
-            
-            # Initialize ranks
-            ranks = np.zeros(num_users, dtype=np.int32)
-            
-            # Assign ranks
-            current_rank = 1
-            for i in range(num_users):
-                if i > 0 and sorted_scores[i] < sorted_scores[i-1]:
-                    current_rank = i + 1
-                ranks[sorted_indices[i]] = current_rank
-            
-            # Store rankings for this simulation
-            rankings[:, sim_idx] = ranks
+        # Competition ranks for the whole users x simulations matrix, in
+        # blocks of simulations
+        rankings = rank_scores(self.scores)
         
         self.rankings = rankings
         return rankings
@@ -213,93 +283,193 @@ class BracketAnalyzer:
         """
         Analyze the rankings to compute statistics for each user.
         
+        Every user's ranks and scores are histogrammed in one bincount each
+        (weighted by scenario probability for weighted scenarios), and all
+        statistics are read off the histograms at once. Scenarios with zero
+        probability never count as possible outcomes.
+        
         Returns:
-            dict: Dictionary mapping usernames to statistics
+            dict: Dictionary mapping usernames to statistics, including the
+                  full rank_distribution of each user
         """
         if self.rankings is None:
             self.calculate_rankings()
             
-        # Initialize result dictionary
-        self.analysis_results = {}
-        
-        # Number of users and simulations
         num_users = len(self.usernames)
-        num_simulations = len(self.simulations)
+        if num_users == 0:
+            self.analysis_results = {}
+            return self.analysis_results
         
-        # Check array shapes to understand structure
-        rankings_shape = self.rankings.shape
-        scores_shape = self.scores.shape
+        num_simulations = self.scores.shape[1]
+        print(f"Computing statistics for {num_users} users across {num_simulations} simulations")
+        
+        weights = None if self.weights is None else self.weights[:num_simulations]
+        rankings = np.asarray(self.rankings).reshape(num_users, num_simulations)
+        rank_counts = user_histograms(rankings, num_users + 1, weights)
+        # Simulations each user wins, for conditional win probabilities; only
+        # kept when save_analysis can write them next to a simulation file
+        self.first_place = None
+        if self.simulation_file is not None:
+            self.first_place = np.packbits(rankings == 1, axis=1)
+        score_counts = user_histograms(self.scores, int(self.scores.max()) + 1, weights)
+        
+        self.analysis_results = histogram_statistics(self.usernames, rank_counts, score_counts)
+        return self.analysis_results
+    
+    def analyze_rule_sets(self):
+        """
+        Analyze the rankings under every rule set.
         
-        print(f"DEBUG: Rankings shape: {rankings_shape}, Scores shape: {scores_shape}")
-        print(f"DEBUG: Number of users: {num_users}, Number of simulations: {num_simulations}")
+        Each rule set's scores are ranked and analyzed like the primary
+        ones. Afterwards the scores, rankings and analysis results of the
+        primary rule set are current again.
         
-        # For each user, calculate rank statistics
-        for i, username in enumerate(self.usernames):
-            # Skip if user index is out of bounds
-            if i >= rankings_shape[0]:
-                print(f"Warning: User index {i} out of bounds for rankings with shape {rankings_shape}")
-                continue
-                
-            # Extract all rankings for this user across simulations
-            try:
-                # Different handling based on array dimensions and sizes
-                if num_simulations == 1:
-                    # For a single simulation
-                    if rankings_shape[1] == 1:
-                        # If we have a 2D array with shape [num_users, 1]
-                        user_rankings = [self.rankings[i, 0]]
-                        user_scores = [self.scores[i, 0]]
-                    else:
-                        # If we have a 2D array with ranks for each user
-                        user_rankings = [self.rankings[i, j] for j in range(min(num_simulations, rankings_shape[1]))]
-                        user_scores = [self.scores[i, j] for j in range(min(num_simulations, scores_shape[1]))]
-                else:
-                    # For multiple simulations
-                    user_rankings = []
-                    user_scores = []
-                    for j in range(min(num_simulations, rankings_shape[1])):
-                        user_rankings.append(self.rankings[i, j])
-                        user_scores.append(self.scores[i, j])
-            except Exception as e:
-                print(f"Error extracting data for user {username} (index {i}): {str(e)}")
-                # Use empty data as fallback
-                user_rankings = [1]  # Default to first place
-                user_scores = [0]    # Default to zero score
-                
-            # Calculate the average rank
-            avg_rank = np.mean(user_rankings)
-            
-            # Calculate the median rank
-            median_rank = np.median(user_rankings)
-            
-            # Calculate the percentage of simulations where the user ranks first
-            pct_first_place = (np.array(user_rankings) == 1).sum() / num_simulations * 100
-            
-            # Calculate the percentage of simulations where the user ranks last
-            pct_last_place = (np.array(user_rankings) == num_users).sum() / num_simulations * 100
-            
-            # Find the best (minimum) and worst (maximum) ranks
-            min_rank = np.min(user_rankings)
-            max_rank = np.max(user_rankings)
-            
-            # Find the maximum and minimum scores
-            max_score = np.max(user_scores)
-            min_score = np.min(user_scores)
-            
-            # Store the statistics
-            self.analysis_results[username] = {
-                'avg_rank': avg_rank,
-                'median_rank': median_rank,
-                'pct_first_place': pct_first_place,
-                'pct_last_place': pct_last_place,
-                'min_rank': min_rank,
-                'max_rank': max_rank,
-                'max_score': max_score,
-                'min_score': min_score
-            }
+        Returns:
+            dict: Dictionary mapping rule set names to analyze_results() output
+        """
+        if self.rule_sets is None:
+            raise ValueError("No rule sets given")
+        if self.rule_set_scores is None:
+            self.calculate_scores()
         
+        self.rule_set_results = {}
+        # The primary rule set goes last, so its results stay current
+        for name, scores in reversed(list(self.rule_set_scores.items())):
+            print(f"Analyzing rule set: {name}")
+            self.scores = scores
+            self.calculate_rankings()
+            self.rule_set_results[name] = self.analyze_results()
+        
+        # Keep the sections in the order given
+        self.rule_set_results = {name: self.rule_set_results[name] for name in self.rule_sets}
+        return self.rule_set_results
+    
+    def calculate_head_to_head(self):
+        """
+        Calculate how often each user finishes ahead of each other user.
+        
+        Every pair of users is compared in every simulation, in blocks of
+        simulations, so the users x users x simulations comparison is never
+        built in full. Ties are reported separately.
+        
+        Returns:
+            dict: usernames, pct_ahead and pct_tied matrices, where
+                  pct_ahead[i][j] is the percentage of simulations where user i
+                  scored more than user j
+        """
+        if self.scores is None:
+            self.calculate_scores()
+        
+        num_simulations = self.scores.shape[1]
+        print(f"Calculating head-to-head results for {len(self.usernames)} users "
+              f"across {num_simulations} simulations")
+        
+        weights = None if self.weights is None else self.weights[:num_simulations]
+        wins = head_to_head_counts(self.scores, weights)
+        total = num_simulations if weights is None else weights.sum()
+        self.head_to_head = head_to_head_matrix(self.usernames, wins, total)
+        return self.head_to_head
+    
+    def analyze_in_chunks(self, chunk_size=ANALYSIS_CHUNK_SIZE, truth_bracket=None, head_to_head=False):
+        """
+        Analyze the simulations block by block without keeping scores or rankings.
+        
+        Each block of chunk_size simulations is scored, ranked and folded
+        into online accumulators (rank and score histograms), so peak memory
+        does not depend on the number of simulations. The results are the
+        same as calculate_scores, calculate_rankings and analyze_results
+        (and analyze_rule_sets, with rule sets) would give; self.scores and
+        self.rankings are left unset.
+        
+        Args:
+            chunk_size (int): Number of simulations per block
+            truth_bracket (dict, optional): Truth bracket the simulations
+                                            complete. If None, the decided
+                                            games of each block are found from
+                                            the block itself.
+            head_to_head (bool): Also count the head-to-head results of the
+                                 primary rule set, as calculate_head_to_head
+        
+        Returns:
+            dict: Dictionary mapping usernames to statistics (of the primary
+                  rule set, with rule sets)
+        """
+        if self.simulations is None or not self.user_brackets:
+            raise ValueError("Simulations and user brackets must be loaded first")
+        
+        usernames, picks = encode_user_picks(self.user_brackets)
+        fixed = None if truth_bracket is None else encode_bracket(truth_bracket)
+        if self.rule_sets is not None:
+            points = np.stack([rules.points_table() for rules in self.rule_sets.values()])
+        else:
+            points = get_scoring_rules().points_table()[None]
+        weighted = self.weights is not None
+        accumulators = [AnalysisAccumulator(usernames, weighted=weighted, head_to_head=head_to_head and index == 0)
+                        for index in range(len(points))]
+        
+        # First-place bitmaps grow with the run, so they are only kept when
+        # save_analysis can write them next to a simulation file
+        first_place = BitmapWriter(len(usernames)) if self.simulation_file is not None else None
+        
+        print(f"Analyzing {len(usernames)} users in chunks of {chunk_size} simulations")
+        for outcomes, weights in self._simulation_blocks(chunk_size):
+            block_fixed = fixed if fixed is not None else decided_slots(outcomes)
+            scores = score_outcomes(picks, outcomes, points, fixed=block_fixed)
+            for index, (accumulator, block_scores) in enumerate(zip(accumulators, scores)):
+                ranks = rank_scores(block_scores)
+                accumulator.update(block_scores, ranks, weights=weights)
+                if index == 0 and first_place is not None:
+                    first_place.append(ranks == 1)
+        
+        self.usernames = usernames
+        self.simulation_count = accumulators[0].count
+        self.head_to_head = accumulators[0].head_to_head()
+        self.first_place = first_place.bitmaps() if first_place is not None else None
+        print(f"Analyzed {self.simulation_count} simulations")
+        
+        if self.rule_sets is not None:
+            self.rule_set_results = {name: accumulator.results()
+                                     for name, accumulator in zip(self.rule_sets, accumulators)}
+            self.analysis_results = self.rule_set_results[next(iter(self.rule_sets))]
+        else:
+            self.analysis_results = accumulators[0].results()
         return self.analysis_results
     
+    def _simulation_blocks(self, chunk_size):
+        """
+        Read the simulations as blocks of encoded outcomes.
+        
+        Memory-mapped simulation files are sliced, so only one block is paged
+        in at a time; lists of bracket dicts are encoded a block at a time.
+        Any other iterable is taken to yield outcome blocks, for example
+        from a generator.
+        
+        Args:
+            chunk_size (int): Number of simulations per block
+            
+        Yields:
+            tuple: (outcomes, weights) for each block; weights is None for
+                   equally likely simulations
+        """
+        simulations = self.simulations
+        if hasattr(simulations, 'outcomes'):
+            simulations = simulations.outcomes
+        
+        if isinstance(simulations, (np.ndarray, list)):
+            blocks = (simulations[start:start + chunk_size] for start in range(0, len(simulations), chunk_size))
+        else:
+            blocks = iter(simulations)
+        
+        start = 0
+        for block in blocks:
+            if isinstance(block, list):
+                outcomes = encode_brackets(block)
+            else:
+                outcomes = np.asarray(block)
+            weights = None if self.weights is None else self.weights[start:start + len(outcomes)]
+            start += len(outcomes)
+            yield outcomes, weights
+    
     def save_analysis(self, output_file=None):
         """
         Save analysis results to a file.
@@ -312,6 +482,8 @@ class BracketAnalyzer:
         """
         if self.analysis_results is None:
             self.analyze_results()
+        if self.rule_sets is not None and self.rule_set_results is None:
+            self.analyze_rule_sets()
         
         if output_file is None:
             # Create the simulations directory if it doesn't exist
@@ -319,32 +491,18 @@ class BracketAnalyzer:
             
             # Generate a default filename based on current time
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            sim_count = len(self.simulations)
+            sim_count = self.simulation_count if self.simulation_count is not None else len(self.simulations)
             output_file = f"data/simulations/analysis_{sim_count}_{timestamp}.json"
         
-        # Ensure the directory exists
-        os.makedirs(os.path.dirname(output_file), exist_ok=True)
-        
-        # Convert numpy values to Python native types for JSON serialization
-        serializable_results = {}
-        for username, stats in self.analysis_results.items():
-            serializable_stats = {}
-            for key, value in stats.items():
-                if isinstance(value, np.integer):
-                    serializable_stats[key] = int(value)
-                elif isinstance(value, np.floating):
-                    serializable_stats[key] = float(value)
-                elif isinstance(value, np.ndarray):
-                    serializable_stats[key] = value.tolist()
-                else:
-                    serializable_stats[key] = value
-            serializable_results[username] = serializable_stats
-        
-        # Save the analysis results to a JSON file
-        with open(output_file, 'w') as f:
-            json.dump(serializable_results, f, indent=2)
+        output_file = save_analysis_results(self.analysis_results, output_file, rule_sets=self.rule_set_results,
+                                            head_to_head=self.head_to_head)
         
-        print(f"Saved analysis results to {output_file}")
+        # The rooting guide intersects the first-place bitmaps with the
+        # outcome index of the simulation file, so make sure both exist
+        if self.first_place is not None and self.simulation_file is not None:
+            save_first_place(first_place_file(output_file), self.usernames, self.first_place,
+                             len(self.simulations), self.simulation_file)
+            open_outcome_index(self.simulation_file)
         return output_file
     
     def visualize_rank_distribution(self, username=None, output_file=None):
@@ -383,9 +541,9 @@ class BracketAnalyzer:
             
             # Convert distribution to array
             y = np.zeros(len(self.usernames))
-            for rank, count in distribution.items():
+            for rank, pct in distribution.items():
                 if int(rank) <= len(y):
-                    y[int(rank) - 1] = count / len(self.simulations) * 100
+                    y[int(rank) - 1] = pct
             
             # Plot the distribution
             offset = (i - len(users_to_plot)/2 + 0.5) * width
@@ -408,7 +566,34 @@ class BracketAnalyzer:
 
 # Standalone functions for simpler use cases
 
-def analyze_simulations(simulation_file, users_dir='saved_brackets', output_file=None):
+def weighted_median(values, weights):
+    """
+    Median of values where each value carries a probability weight.
+    
+    With equal weights this gives the same result as numpy.median.
+    
+    Args:
+        values (array-like): The values
+        weights (array-like): Non-negative weight of each value
+        
+    Returns:
+        float: The weighted median
+    """
+    values = np.asarray(values, dtype=np.float64)
+    weights = np.asarray(weights, dtype=np.float64)
+    order = np.argsort(values, kind='stable')
+    values = values[order]
+    cumulative = np.cumsum(weights[order])
+    half = cumulative[-1] / 2.0
+    
+    idx = int(np.searchsorted(cumulative, half))
+    # If exactly half the weight lies at or below this value, average with the next one
+    if np.isclose(cumulative[idx], half) and idx + 1 < len(values):
+        return float((values[idx] + values[idx + 1]) / 2.0)
+    return float(values[idx])
+
+def analyze_simulations(simulation_file, users_dir='saved_brackets', output_file=None, rule_sets=None,
+                        chunk_size=None, head_to_head=False):
     """
     Analyze a simulation file and calculate statistics for all users.
     
@@ -416,16 +601,30 @@ def analyze_simulations(simulation_file, users_dir='saved_brackets', output_file
         simulation_file (str): Path to the simulation file
         users_dir (str): Directory containing user brackets
         output_file (str, optional): Path to save the analysis results
+        rule_sets (list or dict, optional): Named scoring rules to analyze as well
+        chunk_size (int, optional): Analyze in blocks of this many simulations
+                                    with analyze_in_chunks
+        head_to_head (bool): Also calculate the head-to-head matrix, which is
+                             saved with the analysis
         
     Returns:
-        dict: Analysis results
+        dict: Analysis results (of the first rule set, if any are given)
     """
-    analyzer = BracketAnalyzer()
+    analyzer = BracketAnalyzer(rule_sets=rule_sets)
     analyzer.load_simulations(simulation_file)
     analyzer.load_user_brackets(users_dir)
-    analyzer.calculate_scores()
-    analyzer.calculate_rankings()
-    results = analyzer.analyze_results()
+    if chunk_size:
+        results = analyzer.analyze_in_chunks(chunk_size, head_to_head=head_to_head)
+    elif rule_sets is not None:
+        analyzer.calculate_scores()
+        analyzer.analyze_rule_sets()
+        results = analyzer.analysis_results
+    else:
+        analyzer.calculate_scores()
+        analyzer.calculate_rankings()
+        results = analyzer.analyze_results()
+    if head_to_head and not chunk_size:
+        analyzer.calculate_head_to_head()
     
     if output_file:
         analyzer.save_analysis(output_file)
@@ -0,0 +1,558 @@
+"""
+Simulation Store Module
+
+This module reads and writes simulated tournament outcomes in a compact,
+versioned binary format. Each simulation is stored as one row of 63 int8
+team ids (see utils.bracket_encoding), so a file is a plain 2D array that
+can be opened with numpy.memmap and read row by row or slot by slot without
+loading the whole thing into memory.
+
+File layout:
+    6 bytes   magic (b"MMSIM\\x00")
+    2 bytes   format version (little-endian uint16)
+    4 bytes   header length (little-endian uint32)
+    n bytes   JSON header, padded with spaces to a 64-byte boundary
+    ...       count x 63 int8 team ids, row-major
+    ...       optional: count float64 scenario weights, 8-byte aligned
+
+The JSON header records the format version, the row count, the truth
+bracket hash, the probability model and the random seed, so cached files
+can be matched against the inputs that produced them. Files written by
+exact enumeration set "weighted" in the header and carry one probability
+weight per row; sampled files have equally weighted rows and no weights.
+
+Next to a simulation file, open_outcome_index() keeps an inverted index
+(file.idx.npz) from every (slot, team) outcome of an undecided game to a
+bitmap of the simulations where it happens. Conditional questions such as
+"who wins the pool if team X wins game G" are then answered by intersecting
+bitmaps, without reading the rows again.
+"""
+
+import os
+import json
+import struct
+import hashlib
+import pickle
+from datetime import datetime
+
+import numpy as np
+
+from utils.bracket_encoding import NUM_SLOTS, NUM_TEAMS, encode_bracket, encode_brackets, decode_outcome
+from simulation.win_models import SeedLinearModel
+
+MAGIC = b"MMSIM\x00"
+FORMAT_VERSION = 1
+HEADER_ALIGNMENT = 64
+SIMULATION_EXTENSION = ".sim"
+INDEX_EXTENSION = ".idx.npz"
+
+# Rows read at a time while building an outcome index
+INDEX_BLOCK_SIZE = 65536
+
+# Bytes of every bitmap unpacked at a time by intersection_counts; sums of
+# up to 65536 ones are exact in float32
+INTERSECTION_BLOCK_BYTES = 8192
+
+# Number of set bits in every byte value
+POPCOUNT = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+
+# Model used when the caller does not say otherwise
+DEFAULT_MODEL = SeedLinearModel().describe()
+
+def truth_bracket_hash(truth_bracket):
+    """
+    Hash the decided results of a truth bracket.
+
+    Only the encoded slot results go into the hash, so cosmetic differences
+    in the JSON (key order, CSS classes, abbreviations) do not change it.
+
+    Args:
+        truth_bracket (dict): The truth bracket
+
+    Returns:
+        str: Hex digest identifying the truth bracket's results
+    """
+    return hashlib.sha256(encode_bracket(truth_bracket).tobytes()).hexdigest()
+
+def is_simulation_file(path):
+    """
+    Check whether a file uses the compact simulation format.
+
+    Args:
+        path (str): Path to the file
+
+    Returns:
+        bool: True if the file starts with the simulation file magic
+    """
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+def _encode_header(metadata):
+    """Serialize the header and pad it so the data starts aligned."""
+    header = json.dumps(metadata, sort_keys=True).encode('utf-8')
+    prefix_len = len(MAGIC) + 6
+    padding = (-(prefix_len + len(header))) % HEADER_ALIGNMENT
+    header += b" " * padding
+    return MAGIC + struct.pack('<HI', FORMAT_VERSION, len(header)) + header
+
+def read_header(path):
+    """
+    Read the metadata header of a simulation file.
+
+    Args:
+        path (str): Path to the simulation file
+
+    Returns:
+        tuple: (metadata dict, byte offset of the outcome data)
+    """
+    with open(path, 'rb') as f:
+        magic = f.read(len(MAGIC))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a simulation file")
+        version, header_len = struct.unpack('<HI', f.read(6))
+        if version > FORMAT_VERSION:
+            raise ValueError(f"Unsupported simulation file version {version} in {path}")
+        metadata = json.loads(f.read(header_len).decode('utf-8'))
+    return metadata, len(MAGIC) + 6 + header_len
+
+def build_metadata(count, truth_bracket=None, model=None, seed=None, **extra):
+    """
+    Build the header metadata for a simulation file.
+
+    Args:
+        count (int): Number of simulations in the file
+        truth_bracket (dict, optional): Truth bracket the simulations complete
+        model (dict, optional): Description of the win probability model
+        seed (int, optional): Root random seed, if the run was seeded
+        **extra: Any additional JSON-serializable fields
+
+    Returns:
+        dict: The header metadata
+    """
+    metadata = {
+        "format_version": FORMAT_VERSION,
+        "count": int(count),
+        "num_slots": NUM_SLOTS,
+        "dtype": "int8",
+        "truth_hash": truth_bracket_hash(truth_bracket) if truth_bracket else None,
+        "model": model if model is not None else DEFAULT_MODEL,
+        "seed": seed,
+        "created": datetime.now().isoformat(),
+    }
+    metadata.update(extra)
+    return metadata
+
+def _weights_offset(data_offset, count):
+    """Byte offset of the weights section, which follows the rows."""
+    rows_end = data_offset + count * NUM_SLOTS
+    return rows_end + (-rows_end) % 8
+
+def create_simulation_file(output_file, metadata):
+    """
+    Create a simulation file and return a writable memmap of its rows.
+
+    Callers fill the returned array (in any order) and flush it, which lets
+    large runs write their results without holding them all in memory.
+
+    Args:
+        output_file (str): Path to the file to create
+        metadata (dict): Header metadata; must include 'count'
+
+    Returns:
+        numpy.memmap: Writable int8 array of shape (count, 63)
+    """
+    os.makedirs(os.path.dirname(output_file) or '.', exist_ok=True)
+    header = _encode_header(metadata)
+    count = int(metadata["count"])
+
+    size = len(header) + count * NUM_SLOTS
+    if metadata.get("weighted"):
+        size = _weights_offset(len(header), count) + count * 8
+
+    with open(output_file, 'wb') as f:
+        f.write(header)
+        f.truncate(size)
+
+    if count == 0:
+        return np.zeros((0, NUM_SLOTS), dtype=np.int8)
+    return np.memmap(output_file, dtype=np.int8, mode='r+',
+                     offset=len(header), shape=(count, NUM_SLOTS))
+
+def save_outcomes(outcomes, output_file, truth_bracket=None, model=None, seed=None,
+                  weights=None, **extra):
+    """
+    Save an outcome array to a simulation file.
+
+    Args:
+        outcomes (numpy.ndarray): int8 array of shape (count, 63)
+        output_file (str): Path to save the file
+        truth_bracket (dict, optional): Truth bracket the simulations complete
+        model (dict, optional): Description of the win probability model
+        seed (int, optional): Root random seed, if the run was seeded
+        weights (numpy.ndarray, optional): Probability weight of each row,
+                                           for exactly enumerated scenarios
+        **extra: Additional header fields
+
+    Returns:
+        str: Path to the saved file
+    """
+    outcomes = np.asarray(outcomes, dtype=np.int8)
+    if weights is not None:
+        weights = np.asarray(weights, dtype=np.float64)
+        if weights.shape != (len(outcomes),):
+            raise ValueError("weights must have one entry per simulation")
+        extra["weighted"] = True
+
+    metadata = build_metadata(len(outcomes), truth_bracket, model, seed, **extra)
+    rows = create_simulation_file(output_file, metadata)
+    if len(outcomes):
+        rows[:] = outcomes
+        rows.flush()
+        del rows
+
+    if weights is not None and len(weights):
+        _, offset = read_header(output_file)
+        weight_rows = np.memmap(output_file, dtype=np.float64, mode='r+',
+                                offset=_weights_offset(offset, len(weights)),
+                                shape=(len(weights),))
+        weight_rows[:] = weights
+        weight_rows.flush()
+        del weight_rows
+
+    print(f"Saved {len(outcomes)} simulations to {output_file}")
+    return output_file
+
+class SimulationSet:
+    """
+    A memory-mapped set of simulated outcomes.
+
+    The raw team id rows are available as `outcomes`. Indexing or iterating
+    the set yields bracket dicts decoded on demand, so code written against
+    the old list-of-brackets format keeps working without loading the file.
+    """
+
+    def __init__(self, outcomes, metadata=None, path=None, weights=None):
+        """
+        Initialize the simulation set.
+
+        Args:
+            outcomes (numpy.ndarray): int8 array of shape (count, 63)
+            metadata (dict, optional): Header metadata
+            path (str, optional): File the outcomes were read from
+            weights (numpy.ndarray, optional): Probability weight of each row,
+                                               or None if rows are equally likely
+        """
+        self.outcomes = outcomes
+        self.metadata = metadata or {}
+        self.path = path
+        self.weights = weights
+
+    def __len__(self):
+        return len(self.outcomes)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [decode_outcome(row) for row in self.outcomes[index]]
+        return decode_outcome(self.outcomes[index])
+
+    def __iter__(self):
+        for row in self.outcomes:
+            yield decode_outcome(row)
+
+    def rows(self, start=0, stop=None):
+        """
+        Get a block of outcome rows without decoding them.
+
+        Args:
+            start (int): First row
+            stop (int, optional): Row after the last one (default: end)
+
+        Returns:
+            numpy.ndarray: int8 array of shape (stop - start, 63)
+        """
+        return self.outcomes[start:stop]
+
+    def slot(self, slot):
+        """
+        Get the winner of one slot across all simulations.
+
+        Args:
+            slot (int): Slot index (0-62)
+
+        Returns:
+            numpy.ndarray: int8 array of shape (count,)
+        """
+        return self.outcomes[:, slot]
+
+def open_simulations(input_file):
+    """
+    Open a simulation file without reading its rows into memory.
+
+    Args:
+        input_file (str): Path to the simulation file
+
+    Returns:
+        SimulationSet: The memory-mapped simulations
+    """
+    metadata, offset = read_header(input_file)
+    count = int(metadata["count"])
+    weights = None
+    if count == 0:
+        outcomes = np.zeros((0, NUM_SLOTS), dtype=np.int8)
+    else:
+        outcomes = np.memmap(input_file, dtype=np.int8, mode='r',
+                             offset=offset, shape=(count, NUM_SLOTS))
+        if metadata.get("weighted"):
+            weights = np.memmap(input_file, dtype=np.float64, mode='r',
+                                offset=_weights_offset(offset, count), shape=(count,))
+    return SimulationSet(outcomes, metadata, input_file, weights)
+
+def count_bits(bitmaps, weights=None):
+    """
+    Count the set bits of packed bitmaps.
+
+    Args:
+        bitmaps (numpy.ndarray): uint8 array of packed bits, one bitmap per
+                                 row along the last axis
+        weights (numpy.ndarray, optional): Weight of every bit; if given, the
+                                           weights of the set bits are added up
+
+    Returns:
+        numpy.ndarray: Array with the last axis summed away, int64 counts or
+                       float64 weights
+    """
+    if weights is not None:
+        return np.unpackbits(bitmaps, axis=-1, count=len(weights)) @ np.asarray(weights, dtype=np.float64)
+    return POPCOUNT[bitmaps].sum(axis=-1, dtype=np.int64)
+
+def intersection_counts(bitmaps, other, weights=None, block_bytes=INTERSECTION_BLOCK_BYTES):
+    """
+    Count the set bits every bitmap of one set shares with every bitmap of another.
+
+    Counting the intersection of two bitmaps is a dot product of their bits,
+    so all pairs are counted at once with a matrix product over blocks of
+    unpacked bits, which is far faster than intersecting pairs one by one.
+
+    Args:
+        bitmaps (numpy.ndarray): Packed uint8 bitmaps of shape (m, nbytes)
+        other (numpy.ndarray): Packed uint8 bitmaps of shape (n, nbytes)
+        weights (numpy.ndarray, optional): Weight of every bit; if given, the
+                                           weights of the shared bits are added
+                                           up instead of counted
+        block_bytes (int): Bytes of every bitmap unpacked at a time
+
+    Returns:
+        numpy.ndarray: float64 array of shape (m, n)
+    """
+    counts = np.zeros((len(bitmaps), len(other)))
+    if weights is not None:
+        # The padding bits of the last byte are never set
+        weights = np.pad(np.asarray(weights, dtype=np.float64), (0, bitmaps.shape[1] * 8 - len(weights)))
+    for start in range(0, bitmaps.shape[1], block_bytes):
+        left = np.unpackbits(bitmaps[:, start:start + block_bytes], axis=1).astype(np.float32)
+        right = np.unpackbits(other[:, start:start + block_bytes], axis=1).astype(np.float32)
+        if weights is not None:
+            left = left * weights[start * 8:start * 8 + left.shape[1]]
+        counts += left @ right.T
+    return counts
+
+class BitmapWriter:
+    """Packs boolean columns into bitmap rows, a block of columns at a time."""
+
+    def __init__(self, rows):
+        """
+        Initialize an empty writer.
+
+        Args:
+            rows (int): Number of bitmaps being written
+        """
+        self._packed = []
+        self._carry = np.zeros((rows, 0), dtype=bool)
+
+    def append(self, bits):
+        """
+        Add a block of columns.
+
+        Args:
+            bits (numpy.ndarray): bool array of shape (rows, columns)
+        """
+        bits = np.concatenate([self._carry, bits], axis=1)
+        # Columns that do not fill a whole byte wait for the next block
+        whole = bits.shape[1] - bits.shape[1] % 8
+        self._packed.append(np.packbits(bits[:, :whole], axis=1))
+        self._carry = bits[:, whole:]
+
+    def bitmaps(self):
+        """
+        Get the packed bitmaps of all columns added.
+
+        Returns:
+            numpy.ndarray: uint8 array of shape (rows, ceil(columns / 8)), with
+                           column c in bit 7 - c % 8 of byte c // 8
+        """
+        return np.concatenate(self._packed + [np.packbits(self._carry, axis=1)], axis=1)
+
+class OutcomeIndex:
+    """
+    Inverted index from (slot, team) outcomes to bitmaps of simulations.
+
+    Only undecided games are indexed: slots that have the same winner in
+    every simulation carry no information.
+    """
+
+    def __init__(self, slots, teams, bitmaps, count):
+        """
+        Initialize the index.
+
+        Args:
+            slots (numpy.ndarray): Slot of every entry, in slot order
+            teams (numpy.ndarray): Team id of every entry
+            bitmaps (numpy.ndarray): uint8 array of shape (entries, ceil(count / 8));
+                                     bit i of row e is set if simulation i has
+                                     teams[e] winning slots[e]
+            count (int): Number of simulations indexed
+        """
+        self.slots = np.asarray(slots, dtype=np.int16)
+        self.teams = np.asarray(teams, dtype=np.int8)
+        self.bitmaps = bitmaps
+        self.count = int(count)
+        self._entries = {(int(slot), int(team)): entry
+                         for entry, (slot, team) in enumerate(zip(self.slots, self.teams))}
+
+    def __len__(self):
+        return len(self.slots)
+
+    @classmethod
+    def build(cls, outcomes, block_size=INDEX_BLOCK_SIZE):
+        """
+        Index an outcome array, reading it a block of rows at a time.
+
+        Args:
+            outcomes (numpy.ndarray): int8 array of shape (count, 63), e.g. the
+                                      memmap of a SimulationSet
+            block_size (int): Rows read at a time
+
+        Returns:
+            OutcomeIndex: The index
+        """
+        count = len(outcomes)
+        # First pass: which teams win each slot in some simulation
+        seen = np.zeros((NUM_SLOTS, NUM_TEAMS), dtype=bool)
+        for start in range(0, count, block_size):
+            block = np.asarray(outcomes[start:start + block_size])
+            seen[np.arange(NUM_SLOTS), block] = True
+        open_slots = np.flatnonzero(seen.sum(axis=1) > 1)
+        slots, teams = np.nonzero(seen[open_slots])
+        slots = open_slots[slots]
+
+        # Second pass: one bitmap per (slot, team) entry
+        writer = BitmapWriter(len(slots))
+        for start in range(0, count, block_size):
+            block = np.asarray(outcomes[start:start + block_size])
+            writer.append((block[:, slots] == teams).T)
+        return cls(slots, teams, writer.bitmaps(), count)
+
+    def bitmap(self, slot, team):
+        """
+        Get the simulations where a team wins a slot.
+
+        Args:
+            slot (int): Slot index (0-62)
+            team (int): Team id
+
+        Returns:
+            numpy.ndarray: Packed bitmap, or None if the outcome is not indexed
+        """
+        entry = self._entries.get((slot, team))
+        return None if entry is None else self.bitmaps[entry]
+
+    def save(self, output_file):
+        """
+        Save the index.
+
+        Args:
+            output_file (str): Path to save the file
+
+        Returns:
+            str: Path to the saved file
+        """
+        with open(output_file, 'wb') as f:
+            np.savez(f, slots=self.slots, teams=self.teams, bitmaps=self.bitmaps,
+                     count=np.array(self.count))
+        return output_file
+
+    @classmethod
+    def load(cls, input_file):
+        """
+        Load an index written by save().
+
+        Args:
+            input_file (str): Path to the file
+
+        Returns:
+            OutcomeIndex: The loaded index
+        """
+        with np.load(input_file, allow_pickle=False) as data:
+            return cls(data['slots'], data['teams'], data['bitmaps'], int(data['count']))
+
+def index_file(simulation_file):
+    """
+    Get the path of the outcome index that belongs to a simulation file.
+
+    Args:
+        simulation_file (str): Path to the simulation file
+
+    Returns:
+        str: Path to the index file
+    """
+    return os.path.splitext(simulation_file)[0] + INDEX_EXTENSION
+
+def open_outcome_index(simulation_file):
+    """
+    Load the outcome index of a simulation file, building it if needed.
+
+    The index is built and saved next to the simulation file the first time
+    it is asked for, and rebuilt if the simulation file is newer.
+
+    Args:
+        simulation_file (str): Path to the simulation file
+
+    Returns:
+        OutcomeIndex: The index
+    """
+    path = index_file(simulation_file)
+    if os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(simulation_file):
+        return OutcomeIndex.load(path)
+
+    index = OutcomeIndex.build(open_simulations(simulation_file).outcomes)
+    index.save(path)
+    print(f"Indexed {len(index)} outcomes of {index.count} simulations in {path}")
+    return index
+
+def convert_legacy_file(input_file, output_file=None, truth_bracket=None):
+    """
+    Convert a pickled list of bracket dicts into the compact format.
+
+    Args:
+        input_file (str): Path to a legacy brackets_*.bin file
+        output_file (str, optional): Path for the converted file. Defaults to
+                                     the input path with a .sim extension.
+        truth_bracket (dict, optional): Truth bracket the simulations were
+                                        generated from, to record its hash
+
+    Returns:
+        str: Path to the converted file
+    """
+    if output_file is None:
+        output_file = os.path.splitext(input_file)[0] + SIMULATION_EXTENSION
+
+    with open(input_file, 'rb') as f:
+        simulations = pickle.load(f)
+
+    outcomes = encode_brackets(simulations)
+    return save_outcomes(outcomes, output_file, truth_bracket=truth_bracket,
+                         model=None, seed=None,
+                         converted_from=os.path.basename(input_file))
@@ -0,0 +1,791 @@
+"""
+Streaming Simulation Module
+
+This module runs the Monte Carlo pipeline without materializing the full set
+of simulations. Each worker generates a chunk of outcomes, scores it against
+every user bracket straight away and reduces the chunk to per-user
+accumulators (rank histograms, first/last place counts, score min/max). The
+parent process only merges accumulators, so memory stays bounded no matter
+how many simulations are run.
+
+Runs are split into batches that each draw from their own seed sequence
+derived from a root seed, so a run can be divided into shards (on one
+machine or several) whose partial accumulators merge into exactly the
+result of the undivided run.
+"""
+
+import json
+import os
+import time
+import multiprocessing
+
+import numpy as np
+from tqdm import tqdm
+
+from simulation.batch_generator import BatchBracketGenerator, batch_seed_sequence, new_root_seed
+from simulation.win_models import SeedLinearModel
+from simulation.simulation_store import build_metadata, create_simulation_file, truth_bracket_hash
+from utils.bracket_encoding import encode_bracket, encode_brackets
+from utils.scoring import (
+    ScoringRules, get_scoring_rules, SCORE_BLOCK_SIZE, build_pick_table, decided_slots, score_outcomes
+)
+from utils.kernels import use_loops, rank_with_ties, count_ahead
+
+# Extension of partial analysis files written by sharded runs
+PARTIAL_EXTENSION = ".npz"
+
+# Simulations ranked together by rank_scores
+RANK_BLOCK_SIZE = 1024
+
+# Simulations counted together by head_to_head_counts; a uint8 counter holds up to 255
+HEAD_TO_HEAD_BLOCK_SIZE = 255
+
+# Largest users x users x sims comparison head_to_head_counts builds at once
+HEAD_TO_HEAD_CELLS = 1 << 20
+
+# Normal quantile for 95% confidence intervals
+Z_95 = 1.959963984540054
+
+# Keys save_analysis_results may add next to the usernames of an analysis
+# JSON; they cannot be used as usernames
+ANALYSIS_SECTIONS = ("rule_sets", "head_to_head")
+
+def build_points_table(chalk_bracket=None):
+    """
+    Build the points a correct pick earns for every (slot, team) pair.
+
+    The value is the round's base points plus the upset bonus that
+    compare_with_truth awards, read from the scoring rules.
+
+    Args:
+        chalk_bracket (dict, optional): The all-chalk bracket. If None, the
+                                        cached rules for data/bracket_all_chalk.json
+                                        are used.
+
+    Returns:
+        numpy.ndarray: int32 array of shape (63, 64)
+    """
+    rules = get_scoring_rules() if chalk_bracket is None else ScoringRules(chalk_bracket)
+    return rules.points_table()
+
+def encode_user_picks(user_brackets):
+    """
+    Encode user brackets as a pick matrix.
+
+    Args:
+        user_brackets (dict): Dictionary of user brackets {username: bracket}
+
+    Returns:
+        tuple: (usernames, picks) where picks is an int8 array of shape (users, 63)
+    """
+    usernames = list(user_brackets.keys())
+    return usernames, encode_brackets([user_brackets[username] for username in usernames])
+
+def rank_scores(scores, block_size=RANK_BLOCK_SIZE):
+    """
+    Rank users in every simulation, giving tied users the same rank.
+
+    Ranks follow BracketAnalyzer.calculate_rankings: a user's rank is one plus
+    the number of users with a strictly higher score. Scores are small
+    integers, so for a block of simulations the number of users at or above
+    every score comes from one bincount and a running sum over the score
+    range, with no sorting. Blocks of block_size simulations keep the
+    count table small.
+
+    Args:
+        scores (numpy.ndarray): Score array of shape (users, sims)
+        block_size (int): Number of simulations ranked together
+
+    Returns:
+        numpy.ndarray: int32 array of shape (users, sims)
+    """
+    if use_loops():
+        return rank_with_ties(scores)
+
+    scores = np.asarray(scores)
+    ranks = np.empty(scores.shape, dtype=np.int32)
+    if scores.size == 0:
+        return ranks
+
+    for start in range(0, scores.shape[1], block_size):
+        block = scores[:, start:start + block_size]
+        low = int(block.min())
+        width = int(block.max()) - low + 1
+
+        # Row r of the count table counts the scores of simulation r
+        cells = (block - low).astype(np.intp) + np.arange(block.shape[1], dtype=np.intp) * width
+        counts = np.bincount(cells.ravel(), minlength=block.shape[1] * width).reshape(-1, width)
+        at_or_above = np.cumsum(counts[:, ::-1], axis=1)[:, ::-1]
+        higher = (at_or_above - counts).ravel()
+        ranks[:, start:start + block_size] = higher[cells] + 1
+    return ranks
+
+def proportion_interval(successes, count, z=Z_95):
+    """
+    Wilson score interval for a proportion, in percent.
+
+    Unlike the plain binomial standard error this does not collapse to zero
+    when a user never (or always) finishes first, so rare outcomes still need
+    enough simulations before they count as precise.
+
+    Args:
+        successes (numpy.ndarray): Number of simulations with the outcome
+        count (int): Number of simulations
+        z (float): Normal quantile of the interval (default: 95%)
+
+    Returns:
+        tuple: (standard_error, low, high) arrays, all in percent
+    """
+    p = np.asarray(successes, dtype=np.float64) / count
+    z2 = z * z
+    denominator = 1.0 + z2 / count
+    center = (p + z2 / (2 * count)) / denominator
+    half_width = z * np.sqrt(p * (1 - p) / count + z2 / (4 * count * count)) / denominator
+    return half_width / z * 100, np.maximum(center - half_width, 0) * 100, np.minimum(center + half_width, 1) * 100
+
+# Rank and score percentiles reported for every user
+STAT_PERCENTILES = (10, 25, 75, 90)
+
+# Decimal places kept for rank_distribution percentages
+DISTRIBUTION_DECIMALS = 4
+
+def user_histograms(values, width, weights=None):
+    """
+    Histogram every user's values in one bincount.
+
+    Args:
+        values (numpy.ndarray): Non-negative integers of shape (users, sims)
+        width (int): Number of histogram bins; values must be below it
+        weights (numpy.ndarray, optional): Weight of each simulation. If None,
+                                           every simulation counts once.
+
+    Returns:
+        numpy.ndarray: Array of shape (users, width); int64 counts, or float64
+                       weights if weights are given
+    """
+    num_users = values.shape[0]
+    flat = (np.arange(num_users, dtype=np.intp)[:, None] * width + values).ravel()
+    if weights is not None:
+        weights = np.broadcast_to(weights, values.shape).ravel()
+    counts = np.bincount(flat, weights=weights, minlength=num_users * width)
+    return counts.reshape(num_users, width)
+
+def histogram_median(histograms):
+    """
+    Median of each row of a histogram, matching numpy.median on the raw values.
+
+    Float histograms hold probability weights; their median follows
+    simulation_analyzer.weighted_median, where values with no weight do not
+    count.
+
+    Args:
+        histograms (numpy.ndarray): Counts of shape (rows, values)
+
+    Returns:
+        numpy.ndarray: Median value of each row
+    """
+    if np.issubdtype(histograms.dtype, np.integer):
+        counts = histograms.sum(axis=1)
+        cumulative = np.cumsum(histograms, axis=1)
+        lower = np.argmax(cumulative > ((counts - 1) // 2)[:, None], axis=1)
+        upper = np.argmax(cumulative > (counts // 2)[:, None], axis=1)
+        return (lower + upper) / 2.0
+
+    rows = np.arange(len(histograms))
+    half = histograms.sum(axis=1) / 2.0
+    cumulative = np.cumsum(histograms, axis=1)
+    lower = np.argmax((cumulative > half[:, None]) | np.isclose(cumulative, half[:, None]), axis=1)
+
+    # If exactly half the weight lies at or below the median, average with the next value
+    columns = np.arange(histograms.shape[1])
+    later = (histograms > 0) & (columns[None, :] > lower[:, None])
+    upper = np.where(np.isclose(cumulative[rows, lower], half) & later.any(axis=1),
+                     np.argmax(later, axis=1), lower)
+    return (lower + upper) / 2.0
+
+def histogram_percentiles(histograms, percentiles=STAT_PERCENTILES):
+    """
+    Percentiles of each row of a histogram.
+
+    A row's p-th percentile is the smallest value with at least p percent of
+    the row's count (or weight) at or below it.
+
+    Args:
+        histograms (numpy.ndarray): Counts or weights of shape (rows, values)
+        percentiles (sequence): Percentiles to compute, between 0 and 100
+
+    Returns:
+        numpy.ndarray: int array of shape (len(percentiles), rows)
+    """
+    cumulative = np.cumsum(histograms, axis=1)
+    shares = cumulative / cumulative[:, -1:]
+    # Allow for rounding in the running sum of float weights
+    return np.stack([np.argmax(shares >= percentile / 100.0 - 1e-9, axis=1) for percentile in percentiles])
+
+def histogram_statistics(usernames, rank_counts, score_counts):
+    """
+    Compute every user's statistics from their rank and score histograms.
+
+    Args:
+        usernames (list): Usernames, one per histogram row
+        rank_counts (numpy.ndarray): rank_counts[u, r] is the number (or weight)
+                                     of simulations where user u finished rank r;
+                                     column 0 is unused
+        score_counts (numpy.ndarray): score_counts[u, s] is the number (or weight)
+                                      of simulations where user u scored s
+
+    Returns:
+        dict: Dictionary mapping usernames to statistics; rank_distribution
+              maps each rank the user can finish to the percentage of
+              simulations with that rank
+    """
+    num_users = len(usernames)
+    total = rank_counts[:, 1:].sum(axis=1)
+    ranks = np.arange(rank_counts.shape[1])
+    percentages = rank_counts / total[:, None] * 100
+
+    avg_rank = (rank_counts * ranks).sum(axis=1) / total
+    median_rank = histogram_median(rank_counts)
+    rank_percentiles = histogram_percentiles(rank_counts)
+    top_3 = percentages[:, 1:4].sum(axis=1)
+    top_5 = percentages[:, 1:6].sum(axis=1)
+
+    # Best and worst outcomes that have any chance at all
+    seen_ranks = rank_counts > 0
+    min_rank = np.argmax(seen_ranks, axis=1)
+    max_rank = rank_counts.shape[1] - 1 - np.argmax(seen_ranks[:, ::-1], axis=1)
+    seen_scores = score_counts > 0
+    min_score = np.argmax(seen_scores, axis=1)
+    max_score = score_counts.shape[1] - 1 - np.argmax(seen_scores[:, ::-1], axis=1)
+    score_median = histogram_median(score_counts)
+    score_percentiles = histogram_percentiles(score_counts)
+
+    analysis_results = {}
+    for i, username in enumerate(usernames):
+        stats = {
+            'avg_rank': float(avg_rank[i]),
+            'median_rank': float(median_rank[i]),
+            'pct_first_place': float(percentages[i, 1]),
+            'pct_last_place': float(percentages[i, num_users]),
+            'pct_top_3': float(top_3[i]),
+            'pct_top_5': float(top_5[i]),
+            'min_rank': int(min_rank[i]),
+            'max_rank': int(max_rank[i]),
+            'max_score': int(max_score[i]),
+            'min_score': int(min_score[i]),
+            'median_score': float(score_median[i]),
+        }
+        for row, percentile in enumerate(STAT_PERCENTILES):
+            stats[f'rank_p{percentile}'] = int(rank_percentiles[row, i])
+            stats[f'score_p{percentile}'] = int(score_percentiles[row, i])
+        # Only the ranks the user can finish, to keep the output compact
+        stats['rank_distribution'] = {
+            int(rank): round(float(percentages[i, rank]), DISTRIBUTION_DECIMALS)
+            for rank in np.flatnonzero(seen_ranks[i])
+        }
+        analysis_results[username] = stats
+    return analysis_results
+
+def head_to_head_counts(scores, weights=None, block_size=HEAD_TO_HEAD_BLOCK_SIZE):
+    """
+    Count, for every pair of users, the simulations where the first scored more.
+
+    Only strict wins are counted: user i ties user j in the simulations
+    counted by neither wins[i, j] nor wins[j, i]. Blocks of simulations are
+    compared at once while the users x users x sims comparison stays under
+    HEAD_TO_HEAD_CELLS; larger pools are compared one simulation at a time
+    into a uint8 counter that is added up every block, so memory only grows
+    with the square of the pool size.
+
+    Args:
+        scores (numpy.ndarray): Score array of shape (users, sims)
+        weights (numpy.ndarray, optional): Weight of each simulation; if given,
+                                           weights are added up instead of counts
+        block_size (int): Number of simulations counted together (at most 255)
+
+    Returns:
+        numpy.ndarray: Array of shape (users, users), int64 counts or float64
+                       weights
+    """
+    scores = np.asarray(scores)
+    num_users = scores.shape[0]
+    wins = np.zeros((num_users, num_users), dtype=np.int64 if weights is None else np.float64)
+    if weights is None and use_loops():
+        count_ahead(scores, wins)
+        return wins
+
+    together = num_users * num_users * block_size <= HEAD_TO_HEAD_CELLS
+    ahead = np.empty((num_users, num_users), dtype=bool)
+    counter = np.empty((num_users, num_users), dtype=np.uint8)
+    for start in range(0, scores.shape[1], block_size):
+        block = scores[:, start:start + block_size]
+        block_weights = None if weights is None else weights[start:start + block.shape[1]]
+        if together:
+            compared = block[:, None, :] > block[None, :, :]
+            if block_weights is None:
+                wins += compared.sum(axis=-1)
+            else:
+                wins += compared @ block_weights
+            continue
+
+        # One contiguous row of scores per simulation
+        rows = np.ascontiguousarray(block.T)
+        counter[:] = 0
+        for sim, row in enumerate(rows):
+            np.greater(row[:, None], row[None, :], out=ahead)
+            if block_weights is None:
+                counter += ahead.view(np.uint8)
+            else:
+                wins += ahead * block_weights[sim]
+        if block_weights is None:
+            wins += counter
+    return wins
+
+def head_to_head_matrix(usernames, wins, total):
+    """
+    Turn head-to-head counts into percentages.
+
+    Args:
+        usernames (list): Usernames in the order of the rows of wins
+        wins (numpy.ndarray): Counts from head_to_head_counts
+        total (float): Number (or total weight) of simulations counted
+
+    Returns:
+        dict: usernames, pct_ahead and pct_tied, where pct_ahead[i][j] is the
+              percentage of simulations where user i finished ahead of user j
+              and pct_tied[i][j] the percentage where they scored the same
+    """
+    ties = np.maximum(total - wins - wins.T, 0)
+    scale = 100 / total if total else 0
+    return {
+        'usernames': list(usernames),
+        'pct_ahead': np.round(wins * scale, DISTRIBUTION_DECIMALS).tolist(),
+        'pct_tied': np.round(ties * scale, DISTRIBUTION_DECIMALS).tolist(),
+    }
+
+class AnalysisAccumulator:
+    """
+    Per-user running statistics that can be updated chunk by chunk and merged.
+
+    The statistics are exactly those BracketAnalyzer.analyze_results reports,
+    but only a users x ranks and a users x scores histogram are kept, plus
+    the users x users head-to-head counts if asked for.
+    """
+
+    def __init__(self, usernames, metadata=None, weighted=False, head_to_head=False):
+        """
+        Initialize an empty accumulator.
+
+        Args:
+            usernames (list): Usernames in pick matrix order
+            metadata (dict, optional): Description of the run (seed, shard, batches)
+            weighted (bool): Whether simulations carry probability weights
+                             (weighted scenarios); histograms then hold weights
+            head_to_head (bool): Also count how often each user finishes
+                                 ahead of each other user
+        """
+        self.usernames = list(usernames)
+        self.metadata = metadata or {}
+        num_users = len(self.usernames)
+        self.count = 0
+        dtype = np.float64 if weighted else np.int64
+        # rank_counts[u, r] is the number of simulations where user u finished rank r
+        self.rank_counts = np.zeros((num_users, num_users + 1), dtype=dtype)
+        # score_counts[u, s] is the number of simulations where user u scored s;
+        # it grows to the highest score seen
+        self.score_counts = np.zeros((num_users, 1), dtype=dtype)
+        # wins[i, j] is the number of simulations where user i scored more than user j
+        self.wins = np.zeros((num_users, num_users), dtype=dtype) if head_to_head else None
+
+    def _add_score_counts(self, score_counts):
+        """Add a score histogram, widening either one to the wider of the two."""
+        width = max(self.score_counts.shape[1], score_counts.shape[1])
+        if self.score_counts.shape[1] < width:
+            self.score_counts = np.pad(self.score_counts, ((0, 0), (0, width - self.score_counts.shape[1])))
+        self.score_counts[:, :score_counts.shape[1]] += score_counts
+
+    def update(self, scores, ranks=None, weights=None):
+        """
+        Add a chunk of simulations.
+
+        Args:
+            scores (numpy.ndarray): Score array of shape (users, sims)
+            ranks (numpy.ndarray, optional): Ranks for the same array (computed if None)
+            weights (numpy.ndarray, optional): Weight of each simulation, for
+                                               a weighted accumulator
+        """
+        if scores.shape[1] == 0 or len(self.usernames) == 0:
+            return
+        if ranks is None:
+            ranks = rank_scores(scores)
+
+        self.rank_counts += user_histograms(ranks, self.rank_counts.shape[1], weights)
+        self._add_score_counts(user_histograms(scores, int(scores.max()) + 1, weights))
+        if self.wins is not None:
+            self.wins += head_to_head_counts(scores, weights)
+        self.count += scores.shape[1]
+
+    def merge(self, other):
+        """
+        Fold another accumulator over the same users into this one.
+
+        Args:
+            other (AnalysisAccumulator): The accumulator to merge
+
+        Returns:
+            AnalysisAccumulator: self
+        """
+        if sorted(other.usernames) != sorted(self.usernames):
+            raise ValueError("Cannot merge accumulators for different users")
+
+        # The same pool may have been loaded in a different order
+        index = {username: i for i, username in enumerate(other.usernames)}
+        order = [index[username] for username in self.usernames]
+
+        self.rank_counts += other.rank_counts[order]
+        self._add_score_counts(other.score_counts[order])
+        if self.wins is not None:
+            if other.wins is None:
+                raise ValueError("Cannot merge an accumulator without head-to-head counts")
+            self.wins += other.wins[np.ix_(order, order)]
+        self.count += other.count
+        return self
+
+    def save(self, output_file):
+        """
+        Save the accumulator as a partial analysis file.
+
+        Args:
+            output_file (str): Path to save the file
+
+        Returns:
+            str: Path to the saved file
+        """
+        os.makedirs(os.path.dirname(output_file) or '.', exist_ok=True)
+        header = dict(self.metadata, usernames=self.usernames, count=self.count)
+        arrays = {'rank_counts': self.rank_counts, 'score_counts': self.score_counts}
+        if self.wins is not None:
+            arrays['wins'] = self.wins
+        with open(output_file, 'wb') as f:
+            np.savez_compressed(f, header=np.array(json.dumps(header)), **arrays)
+        print(f"Saved partial analysis of {self.count} simulations to {output_file}")
+        return output_file
+
+    @classmethod
+    def load(cls, input_file):
+        """
+        Load a partial analysis file written by save().
+
+        Args:
+            input_file (str): Path to the file
+
+        Returns:
+            AnalysisAccumulator: The loaded accumulator
+        """
+        with np.load(input_file, allow_pickle=False) as data:
+            header = json.loads(str(data['header']))
+            accumulator = cls(header.pop('usernames'))
+            accumulator.count = header.pop('count')
+            accumulator.metadata = header
+            if 'score_counts' not in data:
+                raise ValueError(f"{input_file} has no score histogram; it was written by an "
+                                 f"older version, re-run its shard")
+            accumulator.rank_counts = data['rank_counts']
+            accumulator.score_counts = data['score_counts']
+            if 'wins' in data:
+                accumulator.wins = data['wins']
+        return accumulator
+
+    def first_place_interval(self):
+        """
+        Confidence interval of every user's pct_first_place.
+
+        Returns:
+            tuple: (standard_error, low, high) arrays in percent
+        """
+        return proportion_interval(self.rank_counts[:, 1], max(self.count, 1))
+
+    def head_to_head(self):
+        """
+        Compute the head-to-head percentages between all users.
+
+        Returns:
+            dict: head_to_head_matrix output, or None if the accumulator
+                  does not count head-to-head results
+        """
+        if self.wins is None or self.count == 0:
+            return None
+        # Every simulation adds its count (or weight) to each user's rank histogram
+        return head_to_head_matrix(self.usernames, self.wins, self.rank_counts[0].sum())
+
+    def results(self, intervals=False):
+        """
+        Compute the per-user statistics.
+
+        Args:
+            intervals (bool): Also report the standard error and 95% confidence
+                              interval of pct_first_place
+
+        Returns:
+            dict: Dictionary mapping usernames to statistics, in the same form
+                  as BracketAnalyzer.analyze_results
+        """
+        if self.count == 0 or len(self.usernames) == 0:
+            return {}
+
+        analysis_results = histogram_statistics(self.usernames, self.rank_counts, self.score_counts)
+
+        if intervals:
+            standard_error, low, high = self.first_place_interval()
+            for i, username in enumerate(self.usernames):
+                analysis_results[username].update({
+                    'pct_first_place_se': float(standard_error[i]),
+                    'pct_first_place_ci_low': float(low[i]),
+                    'pct_first_place_ci_high': float(high[i]),
+                    'num_simulations': self.count
+                })
+        return analysis_results
+
+def shard_batches(num_batches, shard=0, num_shards=1):
+    """
+    Get the global batch indices that belong to one shard.
+
+    Batches are dealt out round-robin, so every shard gets a near-equal share.
+
+    Args:
+        num_batches (int): Total number of batches in the run
+        shard (int): Index of the shard (0-based)
+        num_shards (int): Total number of shards
+
+    Returns:
+        list: Batch indices for the shard
+    """
+    if not 0 <= shard < num_shards:
+        raise ValueError(f"Shard {shard} is out of range for {num_shards} shards")
+    return list(range(shard, num_batches, num_shards))
+
+def run_scored_batch(args):
+    """
+    Generate one chunk of simulations and reduce it to accumulators.
+
+    Args:
+        args (tuple): Tuple containing (batch_idx, truth_bracket, batch_size,
+                      usernames, picks, points, keep_outcomes, root_seed, sampler,
+                      model, head_to_head)
+
+    Returns:
+        tuple: (batch_idx, accumulator, outcomes or None, batch_time)
+    """
+    (batch_idx, truth_bracket, batch_size, usernames, picks, points, keep_outcomes,
+     root_seed, sampler, model, head_to_head) = args
+    batch_start = time.time()
+
+    rng = np.random.default_rng(batch_seed_sequence(root_seed, batch_idx))
+    outcomes = BatchBracketGenerator(truth_bracket, rng=rng, sampler=sampler,
+                                     model=model).generate(batch_size)
+    accumulator = AnalysisAccumulator(usernames, head_to_head=head_to_head)
+    accumulator.update(score_outcomes(picks, outcomes, points, fixed=encode_bracket(truth_bracket)))
+
+    batch_time = time.time() - batch_start
+    return batch_idx, accumulator, outcomes if keep_outcomes else None, batch_time
+
+def run_streaming_analysis(truth_bracket, user_brackets, num_simulations=10000, batch_size=10000,
+                           num_processes=None, simulation_file=None, root_seed=None,
+                           shard=0, num_shards=1, first_batch=0, sampler="random", model=None,
+                           head_to_head=False):
+    """
+    Generate and score simulations in chunks, keeping only accumulators.
+
+    Chunks are scored with the standard rules only. To compare rule sets,
+    write a simulation file and analyze it with analyze_simulations.py
+    --rule-sets.
+
+    Args:
+        truth_bracket (dict): The truth bracket to complete
+        user_brackets (dict): Dictionary of user brackets {username: bracket}
+        num_simulations (int): Total number of simulations in the run (all shards)
+        batch_size (int): Number of simulations per chunk
+        num_processes (int, optional): Number of worker processes.
+                                       If None, will use available CPU cores.
+        simulation_file (str, optional): Also write the outcomes to this file.
+                                         By default no simulation file is written.
+        root_seed (int, optional): Root seed of the run. A fresh one is drawn
+                                   (and recorded) if None.
+        shard (int): Index of the shard to run (0-based)
+        num_shards (int): Number of shards the run is split into
+        first_batch (int): Global index of the first batch, used to continue
+                           an earlier run with the same root seed
+        sampler (str): How the random draws are generated, one of SAMPLERS
+        model (WinModel, optional): Win probability model (default: SeedLinearModel)
+        head_to_head (bool): Also count how often each user finishes ahead of
+                             each other user
+
+    Returns:
+        AnalysisAccumulator: The merged accumulator for this shard's simulations,
+                             with the run description in its metadata
+    """
+    if num_processes is None:
+        num_processes = max(1, multiprocessing.cpu_count() - 1)  # Leave one core free
+    if root_seed is None:
+        root_seed = new_root_seed()
+    if model is None:
+        model = SeedLinearModel()
+    # Compile the probability matrix once, before it is sent to the workers
+    model.matrix()
+    batch_size = max(1, min(batch_size, num_simulations))
+    num_batches = (num_simulations + batch_size - 1) // batch_size
+
+    usernames, picks = encode_user_picks(user_brackets)
+    points = build_points_table()
+    keep_outcomes = simulation_file is not None
+
+    batches = [first_batch + batch_idx for batch_idx in shard_batches(num_batches, shard, num_shards)]
+    batch_args = []
+    offsets = {}
+    shard_simulations = 0
+    for batch_idx in batches:
+        current_batch_size = min(batch_size, num_simulations - (batch_idx - first_batch) * batch_size)
+        offsets[batch_idx] = shard_simulations
+        shard_simulations += current_batch_size
+        batch_args.append((batch_idx, truth_bracket, current_batch_size,
+                           usernames, picks, points, keep_outcomes, root_seed, sampler, model,
+                           head_to_head))
+
+    metadata = {
+        "truth_hash": truth_bracket_hash(truth_bracket) if truth_bracket else None,
+        "root_seed": root_seed,
+        "num_simulations": num_simulations,
+        "batch_size": batch_size,
+        "sampler": sampler,
+        "model": model.describe(),
+        "shard": shard,
+        "num_shards": num_shards,
+        "batches": batches,
+    }
+
+    # Outcomes are written straight into the file as chunks arrive
+    rows = None
+    if keep_outcomes:
+        file_metadata = build_metadata(shard_simulations, truth_bracket, seed=root_seed, streamed=True,
+                                       shard=shard, num_shards=num_shards, batch_size=batch_size,
+                                       sampler=sampler, model=model.describe())
+        rows = create_simulation_file(simulation_file, file_metadata)
+
+    shard_label = f" (shard {shard + 1} of {num_shards})" if num_shards > 1 else ""
+    print(f"Streaming {shard_simulations} simulations{shard_label} ({len(batch_args)} chunks) "
+          f"against {len(usernames)} users using {num_processes} processes")
+
+    total = AnalysisAccumulator(usernames, metadata, head_to_head=head_to_head)
+    with multiprocessing.Pool(processes=num_processes) as pool:
+        for batch_idx, accumulator, outcomes, _ in tqdm(
+                pool.imap_unordered(run_scored_batch, batch_args),
+                total=len(batch_args), desc="Simulating and scoring"):
+            total.merge(accumulator)
+            if rows is not None:
+                start = offsets[batch_idx]
+                rows[start:start + len(outcomes)] = outcomes
+
+    if rows is not None:
+        rows.flush()
+        print(f"Saved {shard_simulations} simulations to {simulation_file}")
+
+    return total
+
+def merge_partial_files(input_files):
+    """
+    Merge partial analysis files from the shards of one run.
+
+    Args:
+        input_files (list): Paths to partial analysis files
+
+    Returns:
+        AnalysisAccumulator: The merged accumulator. Its metadata lists the
+                             merged batches and any that are still missing.
+    """
+    if not input_files:
+        raise ValueError("No partial analysis files to merge")
+
+    merged = None
+    seen_batches = set()
+    for input_file in input_files:
+        partial = AnalysisAccumulator.load(input_file)
+
+        if merged is None:
+            merged = AnalysisAccumulator(partial.usernames, dict(partial.metadata),
+                                         head_to_head=partial.wins is not None)
+        else:
+            # Shards can only be combined if they belong to the same run
+            for key in ("truth_hash", "root_seed", "num_simulations", "batch_size", "sampler", "model"):
+                if partial.metadata.get(key) != merged.metadata.get(key):
+                    raise ValueError(f"{input_file} has a different {key} than the other shards")
+
+        overlap = seen_batches.intersection(partial.metadata.get("batches", []))
+        if overlap:
+            raise ValueError(f"{input_file} repeats batches {sorted(overlap)} from another shard")
+        seen_batches.update(partial.metadata.get("batches", []))
+
+        merged.merge(partial)
+        print(f"Merged {partial.count} simulations from {input_file}")
+
+    num_batches = -(-merged.metadata["num_simulations"] // merged.metadata["batch_size"])
+    merged.metadata.update({
+        "batches": sorted(seen_batches),
+        "missing_batches": sorted(set(range(num_batches)) - seen_batches),
+    })
+    for key in ("shard", "num_shards"):
+        merged.metadata.pop(key, None)
+    return merged
+
+def _serializable_results(analysis_results):
+    """Convert numpy values in per-user statistics to Python native types."""
+    serializable_results = {}
+    for username, stats in analysis_results.items():
+        serializable_stats = {}
+        for key, value in stats.items():
+            if isinstance(value, np.integer):
+                serializable_stats[key] = int(value)
+            elif isinstance(value, np.floating):
+                serializable_stats[key] = float(value)
+            elif isinstance(value, np.ndarray):
+                serializable_stats[key] = value.tolist()
+            else:
+                serializable_stats[key] = value
+        serializable_results[username] = serializable_stats
+    return serializable_results
+
+def save_analysis_results(analysis_results, output_file, rule_sets=None, head_to_head=None):
+    """
+    Save per-user analysis results to a JSON file.
+
+    Args:
+        analysis_results (dict): Dictionary mapping usernames to statistics
+        output_file (str): Path to save the file
+        rule_sets (dict, optional): Dictionary mapping rule set names to
+                                    per-user statistics, saved as sections
+                                    under the "rule_sets" key
+        head_to_head (dict, optional): head_to_head_matrix output, saved
+                                       under the "head_to_head" key
+
+    Returns:
+        str: Path to the saved file
+    """
+    reserved = [username for username in analysis_results if username in ANALYSIS_SECTIONS]
+    if reserved:
+        raise ValueError(f"Usernames {reserved} are reserved for sections of the analysis file")
+
+    os.makedirs(os.path.dirname(output_file) or '.', exist_ok=True)
+
+    # Convert numpy values to Python native types for JSON serialization
+    serializable_results = _serializable_results(analysis_results)
+    if rule_sets is not None:
+        serializable_results["rule_sets"] = {
+            name: _serializable_results(results) for name, results in rule_sets.items()
+        }
+    if head_to_head is not None:
+        serializable_results["head_to_head"] = head_to_head
+
+    with open(output_file, 'w') as f:
+        json.dump(serializable_results, f, indent=2)
+
+    print(f"Saved analysis results to {output_file}")
+    return output_file
@@ -1,3 +1,31 @@
 """
 Simulation tests package for Monte Carlo simulations.
-""" 
\ No newline at end of file
+
+Shared fixtures: truth files of the repo, found relative to this package so
+the tests run from any directory, and small seeded pools of user brackets.
+"""
+
+import glob
+import json
+import os
+
+from bracket_logic import initialize_bracket
+from simulation.batch_generator import BatchBracketGenerator
+from utils.bracket_encoding import decode_outcome
+
+# Truth files of the repo
+TRUTH_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../truth_brackets'))
+
+def load_truth_file(pattern):
+    """Load the first truth bracket matching a glob pattern."""
+    path = sorted(glob.glob(os.path.join(TRUTH_DIR, pattern)))[0]
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def random_picks(count, seed):
+    """Draw count encoded brackets from the empty bracket."""
+    return BatchBracketGenerator(initialize_bracket(), seed=seed).generate(count)
+
+def user_pool(count, seed):
+    """Build a pool of count random user brackets named user_0, user_1, ..."""
+    return {f"user_{idx}": decode_outcome(row) for idx, row in enumerate(random_picks(count, seed))}
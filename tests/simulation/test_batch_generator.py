@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the batch bracket generator module.
+"""
+
+import unittest
+import sys
+import os
+
+import numpy as np
+
+# Add the parent directory to the path so we can import our modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+# Now we can import from the project root
+from bracket_logic import initialize_bracket
+from simulation.batch_generator import BatchBracketGenerator, SAMPLERS
+from simulation.bracket_generator import BracketGenerator
+from simulation.simulation_analyzer import BracketAnalyzer, weighted_median
+from simulation.win_models import seed_win_probability
+from tests.simulation import load_truth_file
+from utils.bracket_encoding import (
+    NUM_SLOTS, EMPTY, FEEDERS, TEAMS, encode_bracket, decode_outcome
+)
+
+class TestBatchBracketGenerator(unittest.TestCase):
+    """Test case for the BatchBracketGenerator class."""
+
+    def setUp(self):
+        """Set up the test fixture."""
+        self.empty_truth = initialize_bracket()
+        self.late_truth = load_truth_file('round_3_game_4*')
+
+    def test_seed_probability_matches_scalar_model(self):
+        """Test that the vectorized seed model matches BracketGenerator."""
+        scalar = BracketGenerator(self.empty_truth)
+        for seed1, seed2 in [(1, 16), (16, 1), (3, 10), (5, 5), (8, 9)]:
+            expected = scalar._calculate_win_probability({'seed': seed1}, {'seed': seed2})
+            self.assertAlmostEqual(float(seed_win_probability(seed1, seed2)), expected, places=6)
+
+    def test_outcomes_are_consistent_brackets(self):
+        """Test that every slot winner is one of the two teams feeding it."""
+        outcomes = BatchBracketGenerator(self.empty_truth, seed=1).generate(2000)
+        self.assertEqual(outcomes.shape, (2000, NUM_SLOTS))
+        self.assertFalse((outcomes == EMPTY).any())
+
+        nodes = np.concatenate([np.tile(np.arange(64), (len(outcomes), 1)), outcomes], axis=1)
+        for slot in range(NUM_SLOTS):
+            left = nodes[:, FEEDERS[slot, 0]]
+            right = nodes[:, FEEDERS[slot, 1]]
+            self.assertTrue(((outcomes[:, slot] == left) | (outcomes[:, slot] == right)).all())
+
+    def test_fixed_results_are_respected(self):
+        """Test that games decided in the truth bracket never change."""
+        fixed = encode_bracket(self.late_truth)
+        mask = fixed != EMPTY
+        outcomes = BatchBracketGenerator(self.late_truth, seed=2).generate(1000)
+        self.assertTrue((outcomes[:, mask] == fixed[mask]).all())
+
+    def test_same_seed_is_reproducible(self):
+        """Test that the same seed produces the same outcomes."""
+        first = BatchBracketGenerator(self.empty_truth, seed=3).generate(500)
+        second = BatchBracketGenerator(self.empty_truth, seed=3).generate(500)
+        np.testing.assert_array_equal(first, second)
+
+    def test_first_round_frequencies(self):
+        """Test that first-round upsets happen at the modelled rate."""
+        count = 50000
+        outcomes = BatchBracketGenerator(self.empty_truth, seed=4).generate(count)
+
+        # Slot 1 is the midwest 8 vs 9 game, slot 0 is the midwest 1 vs 16 game
+        expected = seed_win_probability(8, 9)
+        actual = (outcomes[:, 1] == 2).mean()
+        self.assertLess(abs(actual - expected), 0.01)
+        self.assertLess(abs((outcomes[:, 0] == 0).mean() - 0.99), 0.005)
+
+    def test_decode_round_trip(self):
+        """Test that decoding an outcome gives the same bracket back."""
+        outcome = BatchBracketGenerator(self.empty_truth, seed=5).generate(1)[0]
+        bracket = decode_outcome(outcome)
+        np.testing.assert_array_equal(encode_bracket(bracket), outcome)
+        self.assertEqual(bracket['champion']['name'], TEAMS[outcome[-1]]['name'])
+
+    def test_encode_truth_bracket(self):
+        """Test that encoding a truth bracket finds every decided team."""
+        encoded = encode_bracket(self.late_truth)
+        decided = sum(1 for region in ['midwest', 'west', 'south', 'east']
+                      for round_idx in range(1, 4)
+                      for team in self.late_truth[region][round_idx] if team)
+        self.assertEqual(int((encoded != EMPTY).sum()), decided)
+
+class TestExactEnumeration(unittest.TestCase):
+    """Test case for exact enumeration of the remaining games."""
+
+    def setUp(self):
+        """Set up the test fixture."""
+        self.truth = load_truth_file('round_5_game_1*')
+        self.generator = BatchBracketGenerator(self.truth)
+
+    def test_enumerates_every_scenario(self):
+        """Test that each completion appears once and weights sum to one."""
+        outcomes, weights = self.generator.enumerate_outcomes()
+        count = 2 ** self.generator.undecided_games
+
+        self.assertEqual(outcomes.shape, (count, NUM_SLOTS))
+        self.assertEqual(len(np.unique(outcomes, axis=0)), count)
+        self.assertAlmostEqual(weights.sum(), 1.0, places=12)
+
+        fixed = encode_bracket(self.truth)
+        mask = fixed != EMPTY
+        self.assertTrue((outcomes[:, mask] == fixed[mask]).all())
+
+    def test_weights_match_sampling(self):
+        """Test that scenario weights agree with sampled champion frequencies."""
+        outcomes, weights = self.generator.enumerate_outcomes()
+        sampled = BatchBracketGenerator(self.truth, seed=6).generate(50000)
+
+        for team in np.unique(outcomes[:, 62]):
+            exact = weights[outcomes[:, 62] == team].sum()
+            self.assertLess(abs((sampled[:, 62] == team).mean() - exact), 0.01)
+
+    def test_weighted_analysis(self):
+        """Test that the analyzer weights rank statistics by scenario probability."""
+        analyzer = BracketAnalyzer(weights=[0.7, 0.2, 0.1, 0.0])
+        analyzer.usernames = ['a', 'b']
+        analyzer.simulations = [None] * 4
+        analyzer.scores = np.array([[50, 10, 30, 0], [40, 20, 20, 90]])
+        analyzer.rankings = np.array([[1, 2, 1, 2], [2, 1, 1, 1]])
+
+        results = analyzer.analyze_results()
+        self.assertAlmostEqual(results['a']['avg_rank'], 1.2)
+        self.assertAlmostEqual(results['a']['pct_first_place'], 80.0)
+        self.assertEqual(results['a']['median_rank'], 1)
+        # The zero-probability scenario is not a possible outcome
+        self.assertEqual(results['b']['max_score'], 40)
+
+    def test_weighted_median_matches_numpy(self):
+        """Test that equal weights give the ordinary median."""
+        values = np.array([3, 1, 4, 1, 5, 9])
+        self.assertEqual(weighted_median(values, np.ones(6)), np.median(values))
+        self.assertEqual(weighted_median(values[:5], np.ones(5)), np.median(values[:5]))
+
+class TestSamplers(unittest.TestCase):
+    """Test case for the variance-reduced samplers."""
+
+    def setUp(self):
+        """Set up the test fixture."""
+        self.truth = load_truth_file('round_2_game_3*')
+        self.samplers = [s for s in SAMPLERS if s != 'sobol']
+        try:
+            import scipy.stats.qmc  # noqa: F401
+            self.samplers.append('sobol')
+        except ImportError:
+            pass
+
+    def test_samplers_respect_fixed_results(self):
+        """Test that every sampler completes the truth bracket consistently."""
+        fixed = encode_bracket(self.truth)
+        mask = fixed != EMPTY
+        for sampler in self.samplers:
+            outcomes = BatchBracketGenerator(self.truth, seed=7, sampler=sampler).generate(1001)
+            self.assertEqual(outcomes.shape, (1001, NUM_SLOTS), msg=sampler)
+            self.assertTrue((outcomes[:, mask] == fixed[mask]).all(), msg=sampler)
+
+            nodes = np.concatenate([np.tile(np.arange(64), (len(outcomes), 1)), outcomes], axis=1)
+            winners_fed = (outcomes == nodes[:, FEEDERS[:, 0]]) | (outcomes == nodes[:, FEEDERS[:, 1]])
+            self.assertTrue(winners_fed.all(), msg=sampler)
+
+    def test_samplers_match_slot_probabilities(self):
+        """Test that every sampler reaches each slot at the modelled rate."""
+        generator = BatchBracketGenerator(self.truth)
+        expected = generator.slot_win_probabilities()
+        for sampler in self.samplers:
+            outcomes = BatchBracketGenerator(self.truth, seed=8, sampler=sampler).generate(20000)
+            actual = np.zeros_like(expected)
+            for slot in range(NUM_SLOTS):
+                actual[slot] = np.bincount(outcomes[:, slot], minlength=64) / len(outcomes)
+            self.assertLess(np.abs(actual - expected).max(), 0.02, msg=sampler)
+
+    def test_unknown_sampler_is_rejected(self):
+        """Test that a misspelled sampler name fails early."""
+        with self.assertRaises(ValueError):
+            BatchBracketGenerator(self.truth, sampler='latin')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Unit tests for incremental simulation along the truth timeline.
+"""
+
+import unittest
+import sys
+import os
+
+import numpy as np
+
+# Add the parent directory to the path so we can import our modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+# Now we can import from the project root
+from simulation.batch_generator import BatchBracketGenerator
+from simulation.incremental import IncrementalSimulation, consistent_rows
+from simulation.streaming import build_points_table, score_outcomes
+from tests.simulation import load_truth_file, user_pool
+
+class TestIncrementalSimulation(unittest.TestCase):
+    """Test case for carrying simulations from one truth file to the next."""
+
+    def setUp(self):
+        """Set up two consecutive truth files and a small pool."""
+        self.user_brackets = user_pool(6, seed=21)
+        self.before = load_truth_file('round_2_game_2 *')
+        self.after = load_truth_file('round_2_game_3 *')
+
+    def test_top_up_keeps_consistent_simulations(self):
+        """Test that every simulation agrees with the new result and scores are reused."""
+        simulation = IncrementalSimulation(self.user_brackets, num_simulations=5000, seed=4)
+        simulation.advance(self.before)
+        accumulator = simulation.advance(self.after)
+
+        metadata = accumulator.metadata
+        self.assertGreater(metadata['kept'], 0)
+        self.assertEqual(metadata['kept'] + metadata['drawn'], 5000)
+        self.assertEqual(accumulator.count, 5000)
+        self.assertTrue(consistent_rows(simulation.outcomes, self.after).all())
+
+        # Carried-over scores equal a fresh scoring of the carried-over outcomes
+        expected = score_outcomes(simulation.picks, simulation.outcomes, build_points_table())
+        np.testing.assert_array_equal(simulation.scores, expected)
+
+    def test_conditioning_matches_fresh_simulation(self):
+        """Test that kept simulations follow the new truth file's distribution."""
+        simulation = IncrementalSimulation(self.user_brackets, num_simulations=40000, seed=5)
+        simulation.advance(self.before)
+        simulation.advance(self.after)
+
+        expected = BatchBracketGenerator(self.after).slot_win_probabilities()
+        for slot in [40, 52, 58, 62]:
+            actual = np.bincount(simulation.outcomes[:, slot], minlength=64) / 40000
+            self.assertLess(np.abs(actual - expected[slot]).max(), 0.015, msg=f"slot {slot}")
+
+    def test_correction_regenerates(self):
+        """Test that going back in the timeline starts a fresh set."""
+        simulation = IncrementalSimulation(self.user_brackets, num_simulations=1000, seed=6)
+        simulation.advance(self.after)
+        accumulator = simulation.advance(self.before)
+        self.assertEqual(accumulator.metadata['kept'], 0)
+        self.assertEqual(accumulator.metadata['drawn'], 1000)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the kernel backends.
+"""
+
+import unittest
+import sys
+import os
+
+# Add the parent directory to the path so we can import our modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+# Now we can import from the project root
+from simulation.backend_check import check_backends
+from tests.simulation import load_truth_file, user_pool
+from utils.kernels import NUMBA_AVAILABLE, get_backend, use_backend
+
+class TestKernels(unittest.TestCase):
+    """Test case for the loop kernels and backend selection."""
+
+    def test_loop_backend_matches_numpy(self):
+        """Test that the loop kernels simulate, score and rank exactly like NumPy."""
+        user_brackets = user_pool(6, seed=41)
+        truth_bracket = load_truth_file('round_1_game_20 *')
+
+        for sampler in ("random", "antithetic"):
+            report = check_backends(truth_bracket, user_brackets, count=40, seed=42,
+                                    sampler=sampler, backend="python")
+            self.assertEqual(report["matches"], {"outcomes": True, "scores": True, "ranks": True,
+                                                 "rankings": True, "head_to_head": True})
+
+    def test_backend_selection(self):
+        """Test that numba falls back to numpy when it is not installed."""
+        with use_backend("numpy"):
+            self.assertEqual(get_backend(), "numpy")
+        with use_backend("numba"):
+            self.assertEqual(get_backend(), "numba" if NUMBA_AVAILABLE else "numpy")
+        with self.assertRaises(ValueError):
+            with use_backend("fortran"):
+                pass
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the scoring module.
+"""
+
+import unittest
+import sys
+import os
+import json
+
+import numpy as np
+
+# Add the parent directory to the path so we can import our modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+# Now we can import from the project root
+from simulation.batch_generator import BatchBracketGenerator
+from utils.bracket_encoding import NUM_SLOTS, EMPTY, decode_outcome, encode_bracket, encode_brackets
+from tests.simulation import load_truth_file, random_picks
+from utils.scoring import (
+    SCORE_FIELDS, TruthState, compare_with_truth, get_rule_sets, get_scoring_rules, score_bracket, score_many,
+    score_outcomes, score_record
+)
+from utils.timeline import ScoreTimeline
+from utils.comparison_cache import ComparisonCache
+
+class TestScoreMany(unittest.TestCase):
+    """Test case for batch scoring against many truth states."""
+
+    def test_matches_score_bracket(self):
+        """Test that every record matches score_bracket for the same pair."""
+        picks = random_picks(6, seed=32)
+        truth_brackets = [load_truth_file(pattern) for pattern in
+                          ['round_0_game_0*', 'round_1_game_20 *', 'round_2_game_5 *', 'round_4_game_1 *']]
+        scores = score_many(picks, encode_brackets(truth_brackets))
+
+        self.assertEqual(scores.shape, (6, 4))
+        self.assertEqual(list(scores.dtype.names), SCORE_FIELDS)
+        for user_idx, row in enumerate(picks):
+            for truth_idx, truth_bracket in enumerate(truth_brackets):
+                self.assertEqual(score_record(scores[user_idx, truth_idx]),
+                                 score_bracket(decode_outcome(row), truth_bracket))
+
+        # A subset of fields scores the same
+        totals = score_many(picks, encode_brackets(truth_brackets), fields=["total_with_bonus"])
+        np.testing.assert_array_equal(totals["total_with_bonus"], scores["total_with_bonus"])
+
+class TestRuleSets(unittest.TestCase):
+    """Test case for scoring several rule sets in one pass."""
+
+    def test_stacked_tables_match_single_tables(self):
+        """Test that a stack of rule set tables scores like each table on its own."""
+        picks = random_picks(8, seed=36)
+        truth_bracket = load_truth_file('round_1_game_20 *')
+        outcomes = BatchBracketGenerator(truth_bracket, seed=37).generate(50)
+        rules = get_rule_sets(['standard', 'no_bonus', 'flat'])
+        points = np.stack([rule_set.points_table() for rule_set in rules.values()])
+
+        stacked = score_outcomes(picks, outcomes, points, block_size=16, fixed=encode_bracket(truth_bracket))
+        self.assertEqual(stacked.shape, (3, 8, 50))
+        for table_idx, table in enumerate(points):
+            np.testing.assert_array_equal(stacked[table_idx], score_outcomes(picks, outcomes, table))
+
+        # Each preset matches the score record field it corresponds to
+        reference = score_many(picks, outcomes, fields=['total', 'total_score', 'total_with_bonus'])
+        np.testing.assert_array_equal(stacked[0], reference['total_with_bonus'])
+        np.testing.assert_array_equal(stacked[1], reference['total_score'])
+        np.testing.assert_array_equal(stacked[2], 10 * reference['total'])
+
+class TestScoreTimeline(unittest.TestCase):
+    """Test case for the cumulative score timeline."""
+
+    def test_incremental_timeline_matches_score_many(self):
+        """Test that the timeline built game by game equals scoring every truth file."""
+        picks = random_picks(12, seed=33)
+        truth_brackets = [load_truth_file(pattern) for pattern in
+                          ['round_2_game_3 *', 'round_1_game_20 *', 'round_0_game_0*', 'round_2_game_4 *']]
+        # A finished bracket that does not extend the latest truth file, like a correction
+        truth_brackets.append(decode_outcome(BatchBracketGenerator(truth_brackets[1], seed=34).generate(1)[0]))
+
+        timeline = ScoreTimeline([f"user_{idx}" for idx in range(12)], picks, truth_brackets)
+        expected = score_many(picks, encode_brackets(truth_brackets))
+        np.testing.assert_array_equal(timeline.scores, expected)
+        self.assertEqual((timeline.incremental_steps, timeline.full_steps), (3, 2))
+
+        totals = expected["total_with_bonus"]
+        for column in range(len(truth_brackets)):
+            for user_idx in range(12):
+                self.assertEqual(timeline.ranks[user_idx, column], 1 + (totals[:, column] > totals[user_idx, column]).sum())
+            leaders = timeline.leaderboard(column)
+            self.assertEqual(timeline.record(leaders[0], column)['total_with_bonus'], totals[:, column].max())
+
+class TestComparisonCache(unittest.TestCase):
+    """Test case for memoized bracket comparisons."""
+
+    def test_hits_misses_and_eviction(self):
+        """Test that equal content hits the cache and the oldest pair is evicted."""
+        picks = random_picks(2, seed=35)
+        brackets = [decode_outcome(row) for row in picks]
+        truth_bracket = load_truth_file('round_1_game_20 *')
+        cache = ComparisonCache(max_entries=1)
+
+        first = cache.compare(brackets[0], truth_bracket)
+        self.assertEqual(first, compare_with_truth(brackets[0], truth_bracket))
+        # A copy with the same content is the same key
+        self.assertIs(cache.compare(json.loads(json.dumps(brackets[0])), truth_bracket), first)
+        self.assertEqual(cache.score(brackets[0], truth_bracket), score_bracket(brackets[0], truth_bracket))
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+        cache.compare(brackets[1], truth_bracket)
+        self.assertEqual(cache.stats()["evictions"], 1)
+        self.assertIsNot(cache.compare(brackets[0], truth_bracket), first)
+
+class TestTruthState(unittest.TestCase):
+    """Test case for alive teams and remaining points."""
+
+    def setUp(self):
+        """Set up a late truth file, every way it can finish and a small pool."""
+        self.truth_bracket = load_truth_file('round_3_game_6 *')
+        self.state = TruthState(self.truth_bracket)
+        self.completions, _ = BatchBracketGenerator(self.truth_bracket).enumerate_outcomes()
+        pool = random_picks(10, seed=31)
+        self.picks = np.vstack([pool, self.completions[:5]])
+
+    def test_best_remaining_matches_enumeration(self):
+        """Test that the best completion is the best of all completions."""
+        undecided = encode_bracket(self.truth_bracket) == EMPTY
+        bonus = get_scoring_rules().bonus[np.arange(NUM_SLOTS), self.completions.astype(np.intp)]
+        best_bonus = int((bonus * undecided).sum(axis=1).max())
+        best_base = int(get_scoring_rules().slot_base[undecided].sum())
+        self.assertEqual(self.state.best_remaining(), (best_base, best_bonus))
+
+    def test_potential_is_reachable(self):
+        """Test that remaining points are what the best completion for each bracket adds."""
+        base, bonus = self.state.potential(self.picks)
+        for user_idx, row in enumerate(self.picks):
+            current = score_bracket(decode_outcome(row), self.truth_bracket)['total_with_bonus']
+            finals = [score_bracket(decode_outcome(row), decode_outcome(completion))['total_with_bonus']
+                      for completion in self.completions]
+            self.assertEqual(current + base[user_idx] + bonus[user_idx], max(finals))
+
+    def test_partial_bracket_potential(self):
+        """Test that a bracket with unfilled picks can only still earn points for its filled picks."""
+        partial = self.picks[:4].copy()
+        partial[:, 48:] = EMPTY
+        partial[0, :] = EMPTY
+        base, bonus = self.state.potential(partial)
+        self.assertEqual((base[0], bonus[0]), (0, 0))
+        for user_idx, row in enumerate(partial):
+            bracket = decode_outcome(row)
+            current = score_bracket(bracket, self.truth_bracket)['total_with_bonus']
+            finals = [score_bracket(bracket, decode_outcome(completion))['total_with_bonus']
+                      for completion in self.completions]
+            self.assertEqual(current + base[user_idx] + bonus[user_idx], max(finals))
+        # Without a champion pick there is no champion to eliminate
+        self.assertFalse(self.state.eliminated(partial)[:, NUM_SLOTS - 1].any())
+
+    def test_eliminated_picks(self):
+        """Test that a pick is eliminated exactly when its team is out."""
+        eliminated = self.state.eliminated(self.picks)
+        undecided = ~self.state.decided
+        for row, mask in zip(self.picks, eliminated):
+            expected = undecided & ~self.state.alive[row.astype(np.intp)]
+            np.testing.assert_array_equal(mask, expected)
+
+if __name__ == '__main__':
+    unittest.main()
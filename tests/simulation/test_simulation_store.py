@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the simulation store module.
+"""
+
+import unittest
+import sys
+import os
+import pickle
+import tempfile
+
+import numpy as np
+
+# Add the parent directory to the path so we can import our modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+# Now we can import from the project root
+from bracket_logic import initialize_bracket
+from simulation.batch_generator import BatchBracketGenerator, batch_seed_sequence
+from simulation.bracket_generator import generate_random_completion, load_simulations
+from simulation.monte_carlo import MonteCarloSimulation
+from simulation.rooting_guide import load_rooting_guide
+from simulation.simulation_analyzer import BracketAnalyzer
+from simulation.simulation_store import (
+    save_outcomes, open_simulations, open_outcome_index, read_header, is_simulation_file,
+    convert_legacy_file, truth_bracket_hash, HEADER_ALIGNMENT
+)
+from tests.simulation import user_pool
+from utils.bracket_encoding import TEAM_INDEX, encode_bracket
+
+class TestSimulationStore(unittest.TestCase):
+    """Test case for saving and loading compact simulation files."""
+
+    def setUp(self):
+        """Set up the test fixture."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.truth_bracket = initialize_bracket()
+        self.outcomes = BatchBracketGenerator(self.truth_bracket, seed=7).generate(300)
+
+    def tearDown(self):
+        """Remove temporary files."""
+        self.temp_dir.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.temp_dir.name, name)
+
+    def test_round_trip(self):
+        """Test that saved outcomes are read back unchanged with their header."""
+        output_file = save_outcomes(self.outcomes, self.path('sims.sim'),
+                                    truth_bracket=self.truth_bracket, seed=7)
+        self.assertTrue(is_simulation_file(output_file))
+
+        simulations = open_simulations(output_file)
+        self.assertEqual(len(simulations), 300)
+        np.testing.assert_array_equal(simulations.outcomes, self.outcomes)
+        self.assertEqual(simulations.metadata['seed'], 7)
+        self.assertEqual(simulations.metadata['truth_hash'], truth_bracket_hash(self.truth_bracket))
+        self.assertEqual(simulations.metadata['model']['name'], 'seed_linear')
+
+        # The row data starts on an aligned offset
+        _, offset = read_header(output_file)
+        self.assertEqual(offset % HEADER_ALIGNMENT, 0)
+        self.assertEqual(os.path.getsize(output_file), offset + self.outcomes.size)
+
+    def test_workers_fill_shared_rows_in_batch_order(self):
+        """Test that batches land at their own offsets whatever order they finish in."""
+        simulator = MonteCarloSimulation(self.truth_bracket, output_dir=self.temp_dir.name)
+        output_file = simulator.run_simulation(250, batch_size=100, num_processes=2, seed=3)
+
+        expected = np.concatenate([
+            BatchBracketGenerator(self.truth_bracket, rng=np.random.default_rng(batch_seed_sequence(3, idx)))
+            .generate(size) for idx, size in enumerate([100, 100, 50])
+        ])
+        np.testing.assert_array_equal(open_simulations(output_file).outcomes, expected)
+
+    def test_simulation_set_decodes_brackets(self):
+        """Test that indexing a simulation set yields bracket dicts."""
+        save_outcomes(self.outcomes, self.path('sims.sim'))
+        simulations = load_simulations(self.path('sims.sim'))
+
+        bracket = simulations[5]
+        np.testing.assert_array_equal(encode_bracket(bracket), self.outcomes[5])
+        np.testing.assert_array_equal(simulations.slot(62), self.outcomes[:, 62])
+        self.assertEqual(len(list(simulations)), 300)
+
+    def test_convert_legacy_file(self):
+        """Test converting a pickled list of brackets."""
+        brackets = generate_random_completion(self.truth_bracket, count=20)
+        legacy_file = self.path('brackets_custom_20.bin')
+        with open(legacy_file, 'wb') as f:
+            pickle.dump(brackets, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        self.assertFalse(is_simulation_file(legacy_file))
+        converted = convert_legacy_file(legacy_file, truth_bracket=self.truth_bracket)
+        self.assertTrue(converted.endswith('.sim'))
+
+        simulations = open_simulations(converted)
+        for idx, bracket in enumerate(brackets):
+            np.testing.assert_array_equal(simulations.outcomes[idx], encode_bracket(bracket))
+        self.assertEqual(simulations.metadata['converted_from'], 'brackets_custom_20.bin')
+
+    def test_outcome_index_gives_conditional_win_chances(self):
+        """Test the outcome index and rooting guide against filtering the rows directly."""
+        simulation_file = save_outcomes(self.outcomes, self.path('sims.sim'))
+        index = open_outcome_index(simulation_file)
+        for slot, team in zip(index.slots, index.teams):
+            bits = np.unpackbits(index.bitmap(slot, team), count=len(self.outcomes)).astype(bool)
+            np.testing.assert_array_equal(bits, self.outcomes[:, slot] == team)
+
+        analyzer = BracketAnalyzer()
+        analyzer.load_simulations(simulation_file)
+        analyzer.user_brackets = user_pool(6, seed=8)
+        analyzer.analyze_in_chunks(chunk_size=37)
+        guide = load_rooting_guide(analyzer.save_analysis(self.path('analysis.json')))
+
+        # First place in every simulation, ties included
+        scores = BracketAnalyzer(open_simulations(simulation_file), analyzer.user_brackets).calculate_scores()
+        first = scores == scores.max(axis=0)
+        for game in guide['games']:
+            for outcome in game['outcomes']:
+                team = TEAM_INDEX[(outcome['team']['name'], outcome['team']['seed'])]
+                happens = self.outcomes[:, game['slot']] == team
+                self.assertAlmostEqual(outcome['pct_simulations'], happens.mean() * 100, places=3)
+                for idx, username in enumerate(analyzer.usernames):
+                    self.assertAlmostEqual(outcome['win_pct'][username], first[idx, happens].mean() * 100, places=3)
+
+    def test_truth_hash_ignores_cosmetic_fields(self):
+        """Test that the truth hash only depends on decided results."""
+        decorated = initialize_bracket()
+        decorated['east'][0][0]['classes'] = 'correct'
+        self.assertEqual(truth_bracket_hash(decorated), truth_bracket_hash(self.truth_bracket))
+
+        decided = initialize_bracket()
+        decided['east'][1][0] = decided['east'][0][0]
+        self.assertNotEqual(truth_bracket_hash(decided), truth_bracket_hash(self.truth_bracket))
+
+if __name__ == '__main__':
+    unittest.main()
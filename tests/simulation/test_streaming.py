@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the streaming simulation module.
+"""
+
+import unittest
+import sys
+import os
+import json
+import tempfile
+import copy
+
+import numpy as np
+
+# Add the parent directory to the path so we can import our modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+# Now we can import from the project root
+from simulation.batch_generator import BatchBracketGenerator
+from simulation.monte_carlo import MonteCarloSimulation
+from simulation.simulation_analyzer import BracketAnalyzer
+from simulation.streaming import (
+    AnalysisAccumulator, build_points_table, encode_user_picks, score_outcomes, decided_slots, rank_scores,
+    run_streaming_analysis, merge_partial_files, proportion_interval, head_to_head_counts, save_analysis_results
+)
+from tests.simulation import load_truth_file, user_pool
+from utils.bracket_encoding import EMPTY, decode_outcome, encode_bracket
+from utils.scoring import compare_with_truth, get_correct_picks_and_scores, score_bracket
+
+class TestStreaming(unittest.TestCase):
+    """Test case for chunked scoring and accumulators."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Score a small pool the slow way once for all tests."""
+        cls.user_brackets = user_pool(8, seed=11)
+
+        truth_bracket = load_truth_file('round_2_game_3*')
+        cls.truth_bracket = truth_bracket
+        cls.outcomes = BatchBracketGenerator(truth_bracket, seed=12).generate(120)
+
+        cls.analyzer = BracketAnalyzer([decode_outcome(row) for row in cls.outcomes], cls.user_brackets)
+        cls.analyzer.calculate_scores(vectorized=False)
+        cls.analyzer.calculate_rankings()
+        cls.expected = cls.analyzer.analyze_results()
+
+    def setUp(self):
+        """Score the same pool with the array kernel."""
+        self.usernames, self.picks = encode_user_picks(self.user_brackets)
+        self.scores = score_outcomes(self.picks, self.outcomes, build_points_table())
+
+    def test_scores_match_score_bracket(self):
+        """Test that the kernel reproduces total_with_bonus exactly."""
+        np.testing.assert_array_equal(self.scores, self.analyzer.scores)
+
+    def test_score_bracket_matches_compare_with_truth(self):
+        """Test that the fast path scores like the rendering path without modifying the bracket."""
+        for user_bracket in self.user_brackets.values():
+            before = copy.deepcopy(user_bracket)
+            compared = compare_with_truth(user_bracket, self.truth_bracket)
+            self.assertEqual(score_bracket(user_bracket, self.truth_bracket),
+                             get_correct_picks_and_scores(compared))
+            self.assertEqual(user_bracket, before)
+
+    def test_default_scoring_uses_kernel(self):
+        """Test that calculate_scores gives the same matrix for dicts and encoded rows."""
+        analyzer = BracketAnalyzer([decode_outcome(row) for row in self.outcomes], self.user_brackets)
+        np.testing.assert_array_equal(analyzer.calculate_scores(), self.analyzer.scores)
+
+        # Blocks smaller than the run give the same totals
+        blocked = score_outcomes(self.picks, self.outcomes, build_points_table(), block_size=7)
+        np.testing.assert_array_equal(blocked, self.scores)
+
+    def test_locked_score_split(self):
+        """Test that scoring only undecided slots on top of the locked-in score changes nothing."""
+        fixed = encode_bracket(self.truth_bracket)
+        np.testing.assert_array_equal(decided_slots(self.outcomes)[fixed != EMPTY], fixed[fixed != EMPTY])
+
+        split = score_outcomes(self.picks, self.outcomes, build_points_table(), block_size=50, fixed=fixed)
+        np.testing.assert_array_equal(split, self.scores)
+
+        analyzer = BracketAnalyzer([decode_outcome(row) for row in self.outcomes], self.user_brackets)
+        np.testing.assert_array_equal(analyzer.calculate_scores(truth_bracket=self.truth_bracket), self.analyzer.scores)
+
+    def test_ranks_match_analyzer(self):
+        """Test that ties share a rank exactly as in calculate_rankings."""
+        np.testing.assert_array_equal(rank_scores(self.scores), self.analyzer.rankings)
+
+        tied = np.array([[10, 5], [10, 7], [3, 7]])
+        np.testing.assert_array_equal(rank_scores(tied), [[1, 3], [1, 1], [3, 1]])
+
+        # Counting ranks in small blocks match a direct count of higher scores
+        scores = np.random.default_rng(12).integers(-5, 40, (9, 37))
+        expected = 1 + (scores[None, :, :] > scores[:, None, :]).sum(axis=1)
+        np.testing.assert_array_equal(rank_scores(scores, block_size=5), expected)
+
+    def test_statistics_match_direct_computation(self):
+        """Test the histogram statistics against numpy on the raw ranks and scores."""
+        # Without a simulation file there is nowhere to save first-place bitmaps
+        self.assertIsNone(self.analyzer.first_place)
+        rankings = self.analyzer.rankings
+        scores = self.analyzer.scores
+        for i, username in enumerate(self.analyzer.usernames):
+            stats = self.expected[username]
+            self.assertEqual(stats['median_rank'], np.median(rankings[i]))
+            self.assertEqual(stats['median_score'], np.median(scores[i]))
+            self.assertAlmostEqual(stats['pct_top_3'], (rankings[i] <= 3).mean() * 100)
+            self.assertAlmostEqual(stats['pct_top_5'], (rankings[i] <= 5).mean() * 100)
+            for percentile in (10, 25, 75, 90):
+                self.assertEqual(stats[f'rank_p{percentile}'],
+                                 np.percentile(rankings[i], percentile, method='inverted_cdf'))
+                self.assertEqual(stats[f'score_p{percentile}'],
+                                 np.percentile(scores[i], percentile, method='inverted_cdf'))
+
+            ranks, counts = np.unique(rankings[i], return_counts=True)
+            self.assertEqual(list(stats['rank_distribution']), list(ranks))
+            np.testing.assert_allclose(list(stats['rank_distribution'].values()),
+                                       counts / len(self.outcomes) * 100, atol=1e-4)
+
+    def test_merged_chunks_match_analysis(self):
+        """Test that merging chunk accumulators gives the full analysis."""
+        total = AnalysisAccumulator(self.usernames)
+        for start in range(0, len(self.outcomes), 50):
+            chunk = AnalysisAccumulator(self.usernames)
+            chunk.update(self.scores[:, start:start + 50])
+            total.merge(chunk)
+
+        results = total.results()
+        self.assertEqual(total.count, len(self.outcomes))
+        for username, stats in self.expected.items():
+            for key, value in stats.items():
+                self.assertAlmostEqual(results[username][key], value, msg=f"{username} {key}")
+
+    def test_chunked_analyzer_matches_analysis(self):
+        """Test that analyzing blocks of any size gives exactly the full analysis."""
+        for simulations in (self.outcomes, (self.outcomes[start:start + 50] for start in range(0, 120, 50))):
+            analyzer = BracketAnalyzer(simulations, self.user_brackets)
+            self.assertEqual(analyzer.analyze_in_chunks(chunk_size=7), self.expected)
+            self.assertEqual(analyzer.simulation_count, len(self.outcomes))
+            # Without a simulation file there is nowhere to save first-place bitmaps
+            self.assertIsNone(analyzer.first_place)
+
+    def test_head_to_head_matches_direct_count(self):
+        """Test the head-to-head counts and percentages against a direct comparison."""
+        # A pool this large is compared one simulation at a time
+        scores = np.random.default_rng(5).integers(0, 40, size=(300, 20))
+        direct = (scores[:, None, :] > scores[None, :, :]).sum(axis=-1)
+        self.assertTrue(np.array_equal(head_to_head_counts(scores), direct))
+
+        ahead = (self.scores[:, None, :] > self.scores[None, :, :]).mean(axis=-1) * 100
+        tied = (self.scores[:, None, :] == self.scores[None, :, :]).mean(axis=-1) * 100
+        analyzer = BracketAnalyzer(self.outcomes, self.user_brackets)
+        analyzer.analyze_in_chunks(chunk_size=7, head_to_head=True)
+        np.testing.assert_allclose(analyzer.head_to_head['pct_ahead'], ahead, atol=1e-4)
+        np.testing.assert_allclose(analyzer.head_to_head['pct_tied'], tied, atol=1e-4)
+
+    def test_section_names_are_reserved(self):
+        """Test that usernames cannot shadow the sections of a saved analysis."""
+        accumulator = AnalysisAccumulator(['user_0', 'head_to_head'])
+        accumulator.update(self.scores[:2])
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with self.assertRaises(ValueError):
+                save_analysis_results(accumulator.results(), os.path.join(temp_dir, 'analysis.json'))
+
+            # Brackets saved under a reserved name are not loaded
+            for username in ('user_0', 'rule_sets'):
+                with open(os.path.join(temp_dir, f"bracket_{username}_20260301_120000.json"), 'w') as f:
+                    json.dump(self.user_brackets['user_0'], f)
+            self.assertEqual(list(BracketAnalyzer().load_user_brackets(temp_dir)), ['user_0'])
+
+    def test_shards_merge_to_single_run(self):
+        """Test that merged shards of a seeded run equal the unsharded run."""
+        def run(shard=0, num_shards=1):
+            return run_streaming_analysis(self.truth_bracket, self.user_brackets, num_simulations=900,
+                                          batch_size=200, num_processes=1, root_seed=99,
+                                          shard=shard, num_shards=num_shards, head_to_head=True)
+
+        full = run()
+        with tempfile.TemporaryDirectory() as temp_dir:
+            files = [run(shard, 3).save(os.path.join(temp_dir, f"shard{shard}.npz")) for shard in range(3)]
+            merged = merge_partial_files(files)
+
+            with self.assertRaises(ValueError):
+                merge_partial_files(files[:2] + files[1:2])
+
+        self.assertEqual(merged.count, 900)
+        self.assertEqual(merged.metadata['missing_batches'], [])
+        self.assertEqual(merged.results(), full.results())
+        self.assertEqual(merged.head_to_head(), full.head_to_head())
+        self.assertIsNotNone(full.head_to_head())
+
+    def test_adaptive_run_stops_at_target(self):
+        """Test that an adaptive run stops once the target precision is met."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            simulator = MonteCarloSimulation(self.truth_bracket, output_dir=temp_dir)
+            adaptive = simulator.run_adaptive(self.user_brackets, target_se=1.0, max_simulations=20000,
+                                              round_size=400, batch_size=200, num_processes=1, seed=5)
+
+        self.assertTrue(adaptive.metadata['converged'])
+        self.assertLessEqual(adaptive.first_place_interval()[0].max(), 1.0)
+        self.assertLess(adaptive.count, 20000)
+
+        # The rounds continue one seed sequence, so the result equals a single run
+        single = run_streaming_analysis(self.truth_bracket, self.user_brackets, num_simulations=adaptive.count,
+                                        batch_size=200, num_processes=1, root_seed=5)
+        self.assertEqual(adaptive.results(), single.results())
+
+        stats = adaptive.results(intervals=True)['user_0']
+        self.assertLessEqual(stats['pct_first_place_ci_low'], stats['pct_first_place'])
+        self.assertGreaterEqual(stats['pct_first_place_ci_high'], stats['pct_first_place'])
+
+    def test_interval_never_collapses(self):
+        """Test that a user who never wins still has a nonzero standard error."""
+        standard_error, low, high = proportion_interval(np.array([0, 500]), 1000)
+        self.assertGreater(standard_error[0], 0)
+        self.assertAlmostEqual(low[0], 0)
+        self.assertAlmostEqual(standard_error[1], 100 * np.sqrt(0.25 / 1000), places=2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the win probability models.
+"""
+
+import unittest
+import sys
+import os
+import csv
+import tempfile
+
+import numpy as np
+
+# Add the parent directory to the path so we can import our modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+# Now we can import from the project root
+from bracket_logic import initialize_bracket
+from simulation.bracket_generator import BracketGenerator
+from simulation.monte_carlo import MonteCarloSimulation
+from simulation.simulation_store import open_simulations
+from simulation.win_models import (
+    SeedLinearModel, HistoricalSeedModel, RatingsModel, build_win_model, seed_win_probability
+)
+from utils.bracket_encoding import TEAMS, TEAM_SEEDS
+
+class TestWinModels(unittest.TestCase):
+    """Test case for the win probability models."""
+
+    def setUp(self):
+        """Write a ratings file that rates every team by seed."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.ratings_file = os.path.join(self.temp_dir.name, 'ratings.csv')
+        with open(self.ratings_file, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['team', 'seed', 'rating'])
+            for team in TEAMS:
+                writer.writerow([team['name'], team['seed'], 30 - 2 * team['seed']])
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_matrices_are_complementary(self):
+        """Test that P(i beats j) + P(j beats i) is one for every model."""
+        for model in [SeedLinearModel(), HistoricalSeedModel(), RatingsModel(self.ratings_file)]:
+            matrix = model.matrix().astype(np.float64)
+            self.assertEqual(matrix.shape, (64, 64))
+            np.testing.assert_allclose(matrix + matrix.T, 1.0, atol=1e-6, err_msg=model.name)
+
+    def test_seed_linear_matches_formula(self):
+        """Test that the default model reproduces the linear seed formula."""
+        expected = seed_win_probability(TEAM_SEEDS[:, None], TEAM_SEEDS[None, :])
+        np.testing.assert_allclose(SeedLinearModel().matrix(), expected, atol=1e-6)
+
+    def test_historical_rates_with_linear_fallback(self):
+        """Test that known matchups use their rate and others fall back."""
+        model = HistoricalSeedModel({"5-12": 0.6})
+        self.assertAlmostEqual(model.seed_probability(5, 12), 0.6)
+        self.assertAlmostEqual(model.seed_probability(12, 5), 0.4)
+        self.assertAlmostEqual(model.seed_probability(1, 16), float(seed_win_probability(1, 16)))
+
+    def test_ratings_model(self):
+        """Test the logistic curve and the error for unrated teams."""
+        model = RatingsModel(self.ratings_file, scale=4.0)
+        # 1 seed (rating 28) against 2 seed (rating 26)
+        self.assertAlmostEqual(float(model.matrix()[0, 14]), 1 / (1 + np.exp(-0.5)), places=6)
+        self.assertEqual(model.describe()['scale'], 4.0)
+
+        partial_file = os.path.join(self.temp_dir.name, 'partial.csv')
+        with open(partial_file, 'w') as f:
+            f.write('team,rating\nHouston,20\n')
+        with self.assertRaises(ValueError):
+            RatingsModel(partial_file)
+        with self.assertRaises(ValueError):
+            build_win_model('ratings')
+
+    def test_legacy_generator_reads_matrix(self):
+        """Test that the dict-based generator looks games up in the model matrix."""
+        model = RatingsModel(self.ratings_file)
+        generator = BracketGenerator(initialize_bracket(), model=model)
+        prob = generator._calculate_win_probability(TEAMS[0], TEAMS[14])
+        self.assertAlmostEqual(prob, float(model.matrix()[0, 14]))
+
+    def test_model_recorded_in_simulation_file(self):
+        """Test that the model description is stored with the simulations."""
+        model = HistoricalSeedModel()
+        simulator = MonteCarloSimulation(initialize_bracket(), output_dir=self.temp_dir.name, model=model)
+        output_file = simulator.run_simulation(200, batch_size=100, num_processes=1, seed=1)
+        self.assertEqual(open_simulations(output_file).metadata['model'], model.describe())
+
+if __name__ == '__main__':
+    unittest.main()
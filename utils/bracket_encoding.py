@@ -0,0 +1,249 @@
+"""
+Bracket Encoding Module
+
+This module maps bracket dictionaries onto a fixed 63-slot integer layout so
+that brackets can be simulated, stored and scored as NumPy arrays.
+
+Team ids 0-63 follow the first-round order of each region, with regions in
+REGIONS order (the same order initialize_bracket uses). Slots are laid out
+round by round so that every round is a contiguous block:
+
+    0-31   round 1 (winners of the first-round games), region by region
+    32-47  round 2
+    48-55  round 3 (the Elite Eight participants)
+    56-59  Final Four, one slot per region in REGIONS order
+    60-61  Championship (south/west semifinal, east/midwest semifinal)
+    62     Champion
+
+An undecided slot or an unrecognised team is stored as EMPTY (-1).
+"""
+
+import numpy as np
+
+from data.teams import teams
+
+# Regions in the order used for team ids and Final Four slots
+REGIONS = ["midwest", "west", "south", "east"]
+
+NUM_TEAMS = 64
+NUM_SLOTS = 63
+EMPTY = -1
+
+# (round name, first slot, last slot + 1) for each scoring round
+ROUNDS = [
+    ("round_1", 0, 32),
+    ("round_2", 32, 48),
+    ("round_3", 48, 56),
+    ("final_four", 56, 60),
+    ("championship", 60, 62),
+    ("champion", 62, 63),
+]
+
+# All 64 teams in team id order
+TEAMS = [team for region in REGIONS for team in teams[region]]
+
+# Lookup from (name, seed) to team id
+TEAM_INDEX = {(team["name"], team["seed"]): idx for idx, team in enumerate(TEAMS)}
+
+# Seed of each team id
+TEAM_SEEDS = np.array([team["seed"] for team in TEAMS], dtype=np.int8)
+
+def _build_slot_positions():
+    """Build the list of bracket-dict positions for every slot."""
+    positions = []
+    for round_idx in range(1, 4):
+        for region in REGIONS:
+            for i in range(2 ** (4 - round_idx)):
+                positions.append((region, round_idx, i))
+    for i in range(4):
+        positions.append(("finalFour", i))
+    for i in range(2):
+        positions.append(("championship", i))
+    positions.append(("champion",))
+    return positions
+
+# Where each slot lives in a bracket dict:
+# (region, round_idx, i), ("finalFour", i), ("championship", i) or ("champion",)
+SLOT_POSITIONS = _build_slot_positions()
+
+# Slot of each bracket-dict position, the inverse of SLOT_POSITIONS
+SLOT_INDEX = {position: slot for slot, position in enumerate(SLOT_POSITIONS)}
+
+def _build_feeders():
+    """
+    Build the two feeder nodes for every slot.
+
+    Nodes 0-63 are the teams themselves and node 64 + s is slot s, so a game
+    is decided between the occupants of its two feeder nodes.
+    """
+    feeders = np.zeros((NUM_SLOTS, 2), dtype=np.int16)
+
+    # Regional rounds and the Final Four: slot j of a round is fed by
+    # positions 2j and 2j + 1 of the previous round
+    prev_start = None
+    for name, start, stop in ROUNDS[:4]:
+        for j in range(stop - start):
+            if prev_start is None:
+                feeders[start + j] = (2 * j, 2 * j + 1)
+            else:
+                feeders[start + j] = (NUM_TEAMS + prev_start + 2 * j,
+                                      NUM_TEAMS + prev_start + 2 * j + 1)
+        prev_start = start
+
+    # Championship: south plays west, east plays midwest
+    ff_start = ROUNDS[3][1]
+    feeders[60] = (NUM_TEAMS + ff_start + 2, NUM_TEAMS + ff_start + 1)
+    feeders[61] = (NUM_TEAMS + ff_start + 3, NUM_TEAMS + ff_start + 0)
+
+    # Champion
+    feeders[62] = (NUM_TEAMS + 60, NUM_TEAMS + 61)
+    return feeders
+
+FEEDERS = _build_feeders()
+
+def _build_slot_teams():
+    """Build the mask of teams that can reach each slot."""
+    slot_teams = np.zeros((NUM_SLOTS, NUM_TEAMS), dtype=bool)
+    for slot in range(NUM_SLOTS):
+        for node in FEEDERS[slot]:
+            if node < NUM_TEAMS:
+                slot_teams[slot, node] = True
+            else:
+                slot_teams[slot] |= slot_teams[node - NUM_TEAMS]
+    return slot_teams
+
+# SLOT_TEAMS[s, t] is True if team t can win slot s (t is in the slot's subtree)
+SLOT_TEAMS = _build_slot_teams()
+
+# Scoring round (0-5, an index into ROUNDS) of every slot
+SLOT_ROUND = np.zeros(NUM_SLOTS, dtype=np.int8)
+for _round_idx, (_name, _start, _stop) in enumerate(ROUNDS):
+    SLOT_ROUND[_start:_stop] = _round_idx
+
+def team_id(team):
+    """
+    Get the team id for a team dict.
+
+    Args:
+        team (dict): Team with 'name' and 'seed' keys
+
+    Returns:
+        int: The team id, or EMPTY if the team is missing or unknown
+    """
+    if not team or not isinstance(team, dict):
+        return EMPTY
+    try:
+        return TEAM_INDEX.get((team.get("name"), team.get("seed")), EMPTY)
+    except TypeError:
+        # Unhashable seed value
+        return EMPTY
+
+def get_slot(bracket, slot):
+    """
+    Get the team stored in a slot of a bracket dict.
+
+    Args:
+        bracket (dict): The bracket
+        slot (int): Slot index (0-62)
+
+    Returns:
+        dict: The team in the slot, or None
+    """
+    position = SLOT_POSITIONS[slot]
+    try:
+        if len(position) == 3:
+            region, round_idx, i = position
+            return bracket[region][round_idx][i]
+        if len(position) == 2:
+            return bracket[position[0]][position[1]]
+        return bracket["champion"]
+    except (IndexError, KeyError, TypeError):
+        return None
+
+def set_slot(bracket, slot, team):
+    """
+    Store a team in a slot of a bracket dict.
+
+    Args:
+        bracket (dict): The bracket to modify
+        slot (int): Slot index (0-62)
+        team (dict): The team to store (or None)
+    """
+    position = SLOT_POSITIONS[slot]
+    if len(position) == 3:
+        region, round_idx, i = position
+        bracket[region][round_idx][i] = team
+    elif len(position) == 2:
+        bracket[position[0]][position[1]] = team
+    else:
+        bracket["champion"] = team
+
+def encode_bracket(bracket):
+    """
+    Encode a bracket dict as a 63-slot array of team ids.
+
+    Args:
+        bracket (dict): The bracket to encode (user picks or truth results)
+
+    Returns:
+        numpy.ndarray: int8 array of shape (63,), EMPTY where no team is set
+    """
+    encoded = np.full(NUM_SLOTS, EMPTY, dtype=np.int8)
+    if not bracket:
+        return encoded
+    for slot in range(NUM_SLOTS):
+        encoded[slot] = team_id(get_slot(bracket, slot))
+    return encoded
+
+def encode_brackets(brackets):
+    """
+    Encode a list of bracket dicts as a 2D array of team ids.
+
+    Args:
+        brackets (list): List of bracket dicts
+
+    Returns:
+        numpy.ndarray: int8 array of shape (len(brackets), 63)
+    """
+    encoded = np.full((len(brackets), NUM_SLOTS), EMPTY, dtype=np.int8)
+    for idx, bracket in enumerate(brackets):
+        encoded[idx] = encode_bracket(bracket)
+    return encoded
+
+def empty_bracket():
+    """
+    Create a bracket dict with the first round filled and every slot empty.
+
+    Returns:
+        dict: A bracket with the same structure as initialize_bracket
+    """
+    bracket = {}
+    for region in REGIONS:
+        region_idx = REGIONS.index(region)
+        bracket[region] = [
+            [dict(team) for team in TEAMS[region_idx * 16:(region_idx + 1) * 16]],
+            [None] * 8,
+            [None] * 4,
+            [None] * 2
+        ]
+    bracket["finalFour"] = [None] * 4
+    bracket["championship"] = [None] * 2
+    bracket["champion"] = None
+    return bracket
+
+def decode_outcome(outcome):
+    """
+    Convert a 63-slot array of team ids back into a bracket dict.
+
+    Args:
+        outcome (array-like): Team ids for each slot (EMPTY for undecided)
+
+    Returns:
+        dict: The decoded bracket
+    """
+    bracket = empty_bracket()
+    for slot in range(NUM_SLOTS):
+        tid = int(outcome[slot])
+        if tid != EMPTY:
+            set_slot(bracket, slot, dict(TEAMS[tid]))
+    return bracket
@@ -0,0 +1,124 @@
+"""
+Comparison Cache Module
+
+This module memoizes bracket comparisons across requests. The bracket pages
+compare the same user bracket with the same truth file on every page view
+and every move of the timeline slider, so results are kept in an LRU cache
+keyed by content hashes of the two brackets' JSON. Each entry holds the
+annotated bracket from compare_with_truth and the score record from
+score_bracket, each filled in the first time it is asked for.
+"""
+
+import hashlib
+import json
+from collections import OrderedDict
+
+from utils.scoring import compare_with_truth, score_bracket
+
+# Default number of (bracket, truth file) pairs kept
+DEFAULT_MAX_ENTRIES = 512
+
+def content_hash(data):
+    """
+    Hash the JSON content of a bracket.
+
+    Args:
+        data: A bracket or any JSON-serializable data
+
+    Returns:
+        str: Hex digest that is the same for brackets with equal content
+    """
+    encoded = json.dumps(data, sort_keys=True, separators=(',', ':')).encode('utf-8')
+    return hashlib.sha1(encoded).hexdigest()
+
+class ComparisonCache:
+    """LRU cache of annotated brackets and score records by content hash."""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries (int): Most (bracket, truth file) pairs to keep; the
+                               least recently used pair is evicted first
+        """
+        if max_entries < 1:
+            raise ValueError(f"max_entries must be at least 1, got {max_entries}")
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _lookup(self, bracket, truth_bracket, field, compute):
+        """Get one field of an entry, computing and storing it on a miss."""
+        key = (content_hash(bracket), content_hash(truth_bracket))
+        entry = self._entries.get(key)
+        if entry is not None and field in entry:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[field]
+
+        self.misses += 1
+        value = compute(bracket, truth_bracket)
+        if entry is None:
+            entry = self._entries[key] = {}
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        else:
+            self._entries.move_to_end(key)
+        entry[field] = value
+        return value
+
+    def compare(self, bracket, truth_bracket):
+        """
+        Get compare_with_truth(bracket, truth_bracket), memoized.
+
+        The returned bracket is shared between requests and must not be
+        modified.
+
+        Args:
+            bracket (dict): The bracket to compare
+            truth_bracket (dict): The truth bracket to compare against
+
+        Returns:
+            dict: The annotated bracket
+        """
+        if not bracket or not truth_bracket:
+            return compare_with_truth(bracket, truth_bracket)
+        return self._lookup(bracket, truth_bracket, "compared", compare_with_truth)
+
+    def score(self, bracket, truth_bracket):
+        """
+        Get score_bracket(bracket, truth_bracket), memoized.
+
+        Args:
+            bracket (dict): The bracket to score
+            truth_bracket (dict): The truth bracket to score against
+
+        Returns:
+            dict: A copy of the score record
+        """
+        return dict(self._lookup(bracket, truth_bracket, "score", score_bracket))
+
+    def clear(self):
+        """Drop every entry; the counters are kept."""
+        self._entries.clear()
+
+    def stats(self):
+        """
+        Get the cache counters.
+
+        Returns:
+            dict: Entries, size limit, hits, misses, evictions and hit rate
+        """
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
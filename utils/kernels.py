@@ -0,0 +1,203 @@
+"""
+Kernels Module
+
+This module holds loop versions of the hot simulation, scoring and ranking
+kernels, compiled with Numba when it is installed. The NumPy versions in
+simulation.batch_generator, utils.scoring and simulation.simulation_analyzer
+stay the reference implementations; callers use the loops here only when
+get_backend() selects them.
+
+The backend is chosen with set_backend() (the --backend flag of the
+simulation scripts) or the BRACKET_KERNEL_BACKEND environment variable:
+
+    auto    numba if it is installed, numpy otherwise (default)
+    numpy   the NumPy implementations
+    numba   the compiled loops; falls back to numpy if numba is missing
+    python  the same loops uncompiled, only useful to check them without numba
+
+Both backends return identical results for the same seed: the loops make
+the same comparisons on the same draws and add up the same integers.
+check_backends.py verifies this.
+"""
+
+import contextlib
+import os
+
+import numpy as np
+
+from utils.bracket_encoding import NUM_TEAMS
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+# Environment variable that selects the backend, inherited by worker processes
+BACKEND_ENV_VAR = "BRACKET_KERNEL_BACKEND"
+
+# Names accepted by set_backend() and BACKEND_ENV_VAR
+BACKENDS = ("auto", "numpy", "numba", "python")
+
+NUMBA_AVAILABLE = numba is not None
+
+_warned_missing_numba = False
+
+def set_backend(name):
+    """
+    Select the kernel backend for this process and the processes it starts.
+
+    Args:
+        name (str): One of BACKENDS
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend '{name}', expected one of {', '.join(BACKENDS)}")
+    os.environ[BACKEND_ENV_VAR] = name
+
+@contextlib.contextmanager
+def use_backend(name):
+    """
+    Select a kernel backend for the duration of a with block.
+
+    Args:
+        name (str): One of BACKENDS
+    """
+    previous = os.environ.get(BACKEND_ENV_VAR)
+    set_backend(name)
+    try:
+        yield
+    finally:
+        if previous is None:
+            del os.environ[BACKEND_ENV_VAR]
+        else:
+            os.environ[BACKEND_ENV_VAR] = previous
+
+def get_backend():
+    """
+    Get the kernel backend to use.
+
+    Returns:
+        str: "numpy", "numba" or "python"
+    """
+    global _warned_missing_numba
+    name = os.environ.get(BACKEND_ENV_VAR, "auto")
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown {BACKEND_ENV_VAR} '{name}', expected one of {', '.join(BACKENDS)}")
+
+    if name == "auto":
+        return "numba" if NUMBA_AVAILABLE else "numpy"
+    if name == "numba" and not NUMBA_AVAILABLE:
+        if not _warned_missing_numba:
+            print("Warning: numba is not installed (pip install numba); using the numpy backend")
+            _warned_missing_numba = True
+        return "numpy"
+    return name
+
+def use_loops():
+    """
+    Check whether the loop kernels in this module should be used.
+
+    Returns:
+        bool: True for the numba and python backends
+    """
+    return get_backend() != "numpy"
+
+def _jit(function):
+    """Compile a kernel with Numba when it is installed."""
+    if numba is None:
+        return function
+    return numba.njit(cache=True, nogil=True)(function)
+
+@_jit
+def play_games(nodes, draws, open_slots, feeders, win_prob):
+    """
+    Decide the undecided games of a block of simulations in place.
+
+    Walks every simulation's bracket slot by slot; feeders are always
+    decided first because slots are in round order.
+
+    Args:
+        nodes (numpy.ndarray): int8 array of shape (sims, 127). Nodes 0-63 hold
+                               the teams and nodes 64-126 the slot winners,
+                               with decided slots already filled in.
+        draws (numpy.ndarray): float32 array of shape (sims, len(open_slots));
+                               column j decides open_slots[j]
+        open_slots (numpy.ndarray): Undecided slots in round order
+        feeders (numpy.ndarray): FEEDERS from utils.bracket_encoding
+        win_prob (numpy.ndarray): Probability that team i beats team j
+    """
+    for sim in range(nodes.shape[0]):
+        for column in range(open_slots.shape[0]):
+            slot = open_slots[column]
+            team1 = nodes[sim, feeders[slot, 0]]
+            team2 = nodes[sim, feeders[slot, 1]]
+            if draws[sim, column] < win_prob[team1, team2]:
+                nodes[sim, NUM_TEAMS + slot] = team1
+            else:
+                nodes[sim, NUM_TEAMS + slot] = team2
+
+@_jit
+def add_slot_points(block_scores, table, winners, slots):
+    """
+    Add every user's points for the given slots to a block of scores in place.
+
+    Args:
+        block_scores (numpy.ndarray): int32 array of shape (sims, columns)
+        table (numpy.ndarray): Pick table from build_pick_table, of shape
+                               (63, 65, columns)
+        winners (numpy.ndarray): Winners of shape (len(slots), sims); EMPTY
+                                 winners add nothing
+        slots (numpy.ndarray): Slots to score
+    """
+    for sim in range(block_scores.shape[0]):
+        for row in range(slots.shape[0]):
+            winner = winners[row, sim]
+            if winner < 0:
+                continue
+            points = table[slots[row], winner]
+            for column in range(block_scores.shape[1]):
+                block_scores[sim, column] += points[column]
+
+@_jit
+def rank_with_ties(scores):
+    """
+    Rank users by score in every simulation, giving tied users the same rank.
+
+    A user's rank is one plus the number of users with a strictly higher
+    score.
+
+    Args:
+        scores (numpy.ndarray): Score array of shape (users, sims)
+
+    Returns:
+        numpy.ndarray: int32 array of shape (users, sims)
+    """
+    num_users, num_sims = scores.shape
+    rankings = np.empty((num_users, num_sims), dtype=np.int32)
+    for sim in range(num_sims):
+        sim_scores = scores[:, sim].copy()
+        order = np.argsort(-sim_scores)
+        current_rank = 1
+        for i in range(num_users):
+            if i > 0 and sim_scores[order[i]] < sim_scores[order[i - 1]]:
+                current_rank = i + 1
+            rankings[order[i], sim] = current_rank
+    return rankings
+
+@_jit
+def count_ahead(scores, wins):
+    """
+    Count, for every pair of users, the simulations where the first scored more.
+
+    Args:
+        scores (numpy.ndarray): Score array of shape (users, sims)
+        wins (numpy.ndarray): int64 array of shape (users, users); wins[i, j]
+                              is increased by the number of simulations where
+                              user i scored more than user j
+    """
+    num_users, num_sims = scores.shape
+    for sim in range(num_sims):
+        for i in range(num_users):
+            score = scores[i, sim]
+            for j in range(num_users):
+                if score > scores[j, sim]:
+                    wins[i, j] += 1
@@ -8,8 +8,17 @@ calculating points, and determining rankings.
 import json
 import os
 import copy
+import functools
 from collections import defaultdict
 
+import numpy as np
+
+from utils.bracket_encoding import (
+    NUM_SLOTS, NUM_TEAMS, EMPTY, ROUNDS, SLOT_ROUND, FEEDERS, SLOT_TEAMS, TEAM_SEEDS, SLOT_INDEX,
+    encode_bracket, encode_brackets, get_slot
+)
+from utils.kernels import use_loops, add_slot_points
+
 def calculate_rankings(user_brackets, truth_bracket):
     """
     Calculate rankings for all users based on their bracket scores.
@@ -21,21 +30,28 @@ def calculate_rankings(user_brackets, truth_bracket):
     Returns:
         list: List of dictionaries with rankings, sorted by points
     """
-    rankings = []
+    usernames = list(user_brackets.keys())
+    picks = encode_brackets([user_brackets[username] for username in usernames])
+    truth = encode_bracket(truth_bracket)
+    
+    # Score every user in one call
+    scores = score_many(picks, truth)[:, 0]
+    
+    # Picks made for games that have been played
+    decided_picks = ((picks != EMPTY) & (truth != EMPTY)).sum(axis=1)
     
-    # Calculate scores for each user
-    for username, bracket in user_brackets.items():
-        # Compare with truth bracket
-        results = compare_with_truth(bracket, truth_bracket)
+    rankings = []
+    for user_idx, username in enumerate(usernames):
+        record = score_record(scores[user_idx])
         
         # Create ranking entry
         ranking = {
             'username': username,
-            'total_points': results['total_points'],
-            'correct_picks': results['correct_picks'],
-            'incorrect_picks': results['incorrect_picks'],
-            'round_points': {str(k): v['points'] for k, v in results['rounds'].items()},
-            'region_points': {k: v['points'] for k, v in results['regions'].items()}
+            'total_points': record['total_with_bonus'],
+            'correct_picks': record['total'],
+            'incorrect_picks': int(decided_picks[user_idx]) - record['total'],
+            'round_points': {round_name: record[f"{round_name}_score"] + record[f"{round_name}_bonus"]
+                             for round_name in ROUND_POINTS_KEYS},
         }
         
         rankings.append(ranking)
@@ -107,6 +123,193 @@ POINTS_MAP = {
     "champion": 160
 }
 
+# POINTS_MAP key for each scoring round name used in utils.bracket_encoding
+ROUND_POINTS_KEYS = {
+    "round_1": 1,
+    "round_2": 2,
+    "round_3": 3,
+    "final_four": "final_four",
+    "championship": "championship",
+    "champion": "champion",
+}
+
+# Fields of a score record: correct picks, base score and upset bonus per
+# round, each followed by its total, and the overall total with bonus
+SCORE_FIELDS = (
+    list(ROUND_POINTS_KEYS) + ["total"] +
+    [f"{round_name}_score" for round_name in ROUND_POINTS_KEYS] + ["total_score"] +
+    [f"{round_name}_bonus" for round_name in ROUND_POINTS_KEYS] + ["total_bonus"] +
+    ["total_with_bonus"]
+)
+
+# Structured dtype of score_many results, one int32 per score record field
+SCORE_DTYPE = np.dtype([(field, np.int32) for field in SCORE_FIELDS])
+
+# Simulations (or truth brackets) scored together by score_outcomes
+SCORE_BLOCK_SIZE = 1024
+
+class ScoringRules:
+    """
+    Points for every pick, precomputed once from the scoring constants.
+
+    A correct pick in a slot earns the round's base points plus an upset
+    bonus: the seed difference to the chalk pick in the same slot times the
+    round's bonus multiplier. This class tabulates both parts for every
+    (slot, team) pair so that scorers look points up instead of reloading
+    the chalk bracket and recomputing bonuses for every bracket.
+    """
+
+    def __init__(self, chalk_bracket=None, round_points=None, bonus_multipliers=None):
+        """
+        Build the tables.
+
+        Args:
+            chalk_bracket (dict, optional): The all-chalk bracket. If None, it
+                                            is loaded from data/bracket_all_chalk.json.
+            round_points (dict, optional): Base points by round name, overriding
+                                           POINTS_MAP for the rounds given
+            bonus_multipliers (dict, optional): Upset bonus multiplier by round name,
+                                                overriding UPSET_BONUS_MULTIPLIERS
+                                                for the rounds given
+        """
+        if chalk_bracket is None:
+            chalk_bracket = get_chalk_bracket()
+        chalk = encode_bracket(chalk_bracket) if chalk_bracket else np.full(NUM_SLOTS, EMPTY, dtype=np.int8)
+
+        for overrides in (round_points, bonus_multipliers):
+            unknown = set(overrides or {}) - set(ROUND_POINTS_KEYS)
+            if unknown:
+                raise ValueError(f"Unknown round names: {sorted(unknown)}")
+
+        # Base points and bonus multiplier of every slot
+        self.round_points = {name: POINTS_MAP[key] for name, key in ROUND_POINTS_KEYS.items()}
+        self.round_points.update(round_points or {})
+        self.bonus_multipliers = dict(UPSET_BONUS_MULTIPLIERS)
+        self.bonus_multipliers.update(bonus_multipliers or {})
+        self.slot_base = np.zeros(NUM_SLOTS, dtype=np.int32)
+        self.slot_multiplier = np.zeros(NUM_SLOTS, dtype=np.int32)
+        for round_name, start, stop in ROUNDS:
+            self.slot_base[start:stop] = self.round_points[round_name]
+            self.slot_multiplier[start:stop] = self.bonus_multipliers[round_name]
+
+        # Seed of the chalk pick in every slot (0 where there is none)
+        self.has_chalk = chalk != EMPTY
+        self.chalk_seeds = np.where(self.has_chalk, TEAM_SEEDS[chalk.astype(np.intp)], 0).astype(np.int32)
+
+        # bonus[slot, team] is the upset bonus a correct pick of team earns in slot
+        seed_diff = np.abs(TEAM_SEEDS[None, :].astype(np.int32) - self.chalk_seeds[:, None])
+        self.bonus = np.where(self.has_chalk[:, None], seed_diff * self.slot_multiplier[:, None], 0).astype(np.int32)
+        self.base = np.repeat(self.slot_base[:, None], NUM_TEAMS, axis=1)
+
+    def points_table(self):
+        """
+        Get the total points of a correct pick for every (slot, team) pair.
+
+        Returns:
+            numpy.ndarray: int32 array of shape (63, 64), base plus bonus
+        """
+        return self.base + self.bonus
+
+    def field_table(self, field):
+        """
+        Get the table that scores one score record field.
+
+        Summing the table over the correct picks of a bracket gives the
+        field: ones for pick counts, base points for scores and upset
+        bonuses for bonuses, restricted to the field's round.
+
+        Args:
+            field (str): One of SCORE_FIELDS
+
+        Returns:
+            numpy.ndarray: int32 array of shape (63, 64)
+        """
+        parts = {
+            "": np.ones((NUM_SLOTS, NUM_TEAMS), dtype=np.int32),
+            "_score": self.base,
+            "_bonus": self.bonus,
+        }
+        if field == "total_with_bonus":
+            return self.points_table()
+        for suffix, table in parts.items():
+            if field == f"total{suffix}":
+                return table
+            for round_name, start, stop in ROUNDS:
+                if field == f"{round_name}{suffix}":
+                    masked = np.zeros((NUM_SLOTS, NUM_TEAMS), dtype=np.int32)
+                    masked[start:stop] = table[start:stop]
+                    return masked
+        raise ValueError(f"Unknown score field '{field}'")
+
+    def seed_bonus(self, slot, seed):
+        """
+        Get the upset bonus for a pick of the given seed in a slot.
+
+        Works for any team dict, including teams outside the field.
+
+        Args:
+            slot (int): Slot index (0-62)
+            seed (int): Seed of the picked team
+
+        Returns:
+            int: The bonus, or None if the chalk bracket has no team in the slot
+        """
+        if not self.has_chalk[slot]:
+            return None
+        return int(abs(int(self.chalk_seeds[slot]) - int(seed)) * self.slot_multiplier[slot])
+
+@functools.lru_cache(maxsize=None)
+def get_scoring_rules():
+    """
+    Get the scoring rules for the standard chalk bracket.
+
+    The rules are built on first use and shared for the rest of the process.
+
+    Returns:
+        ScoringRules: The cached rules
+    """
+    return ScoringRules()
+
+# Named alternate rule sets, as ScoringRules keyword arguments
+RULE_SET_PRESETS = {
+    "standard": {},
+    "no_bonus": {"bonus_multipliers": {round_name: 0 for round_name in ROUND_POINTS_KEYS}},
+    "flat": {
+        "round_points": {round_name: 10 for round_name in ROUND_POINTS_KEYS},
+        "bonus_multipliers": {round_name: 0 for round_name in ROUND_POINTS_KEYS},
+    },
+}
+
+def get_rule_sets(rule_sets):
+    """
+    Build named scoring rules from preset names or specifications.
+
+    Args:
+        rule_sets (list or dict): Names from RULE_SET_PRESETS, or a dict mapping
+                                  names to ScoringRules, to ScoringRules keyword
+                                  arguments or to None for a preset of that name
+
+    Returns:
+        dict: Mapping of name to ScoringRules, in the order given
+    """
+    if not isinstance(rule_sets, dict):
+        rule_sets = {name: None for name in rule_sets}
+
+    rules = {}
+    for name, spec in rule_sets.items():
+        if spec is None:
+            if name not in RULE_SET_PRESETS:
+                raise ValueError(f"Unknown rule set '{name}'; presets are {sorted(RULE_SET_PRESETS)}")
+            spec = RULE_SET_PRESETS[name]
+        if isinstance(spec, ScoringRules):
+            rules[name] = spec
+        elif not spec:
+            # The standard rules are shared
+            rules[name] = get_scoring_rules()
+        else:
+            rules[name] = ScoringRules(**spec)
+    return rules
+
 def calculate_points_for_pick(team, round_idx):
     """Calculate both base and bonus points for a pick."""
     if not team:
@@ -117,11 +320,349 @@ def calculate_points_for_pick(team, round_idx):
     
     return base_points, bonus_points
 
+# Scoring round name of every slot
+SLOT_ROUND_NAMES = [ROUNDS[round_idx][0] for round_idx in SLOT_ROUND]
+
+def _is_same_team(pick, truth_team):
+    """Check whether a pick matches a truth team by name and seed."""
+    return pick.get("name") == truth_team.get("name") and pick.get("seed") == truth_team.get("seed")
+
+def _empty_score_record():
+    """Create a score record with every count, score and bonus at zero."""
+    return {field: 0 for field in SCORE_FIELDS}
+
+def _finish_score_record(record):
+    """Fill in the base scores and totals of a record from its counts and bonuses."""
+    round_points = get_scoring_rules().round_points
+    for round_name, points in round_points.items():
+        record[f"{round_name}_score"] = record[round_name] * points
+    record["total"] = sum(record[round_name] for round_name in round_points)
+    record["total_score"] = sum(record[f"{round_name}_score"] for round_name in round_points)
+    record["total_bonus"] = sum(record[f"{round_name}_bonus"] for round_name in round_points)
+    record["total_with_bonus"] = record["total_score"] + record["total_bonus"]
+    return record
+
+def score_bracket(picks, truth_bracket):
+    """
+    Score a bracket against the truth bracket.
+
+    This is the scoring fast path: it reads both brackets slot by slot and
+    never copies or modifies either one. Use compare_with_truth only when
+    the bracket is going to be rendered.
+
+    Args:
+        picks (dict): The bracket to score
+        truth_bracket (dict): The truth bracket
+
+    Returns:
+        dict: Correct picks, base score and bonus per round plus totals, in
+              the same layout as get_correct_picks_and_scores
+    """
+    record = _empty_score_record()
+    if not picks or not truth_bracket:
+        return record
+
+    rules = get_scoring_rules()
+    for slot in range(NUM_SLOTS):
+        pick = get_slot(picks, slot)
+        truth_team = get_slot(truth_bracket, slot)
+        if not pick or not truth_team or not isinstance(pick, dict):
+            continue
+        if _is_same_team(pick, truth_team):
+            round_name = SLOT_ROUND_NAMES[slot]
+            record[round_name] += 1
+            bonus = rules.seed_bonus(slot, pick.get("seed", 0))
+            if bonus:
+                record[f"{round_name}_bonus"] += bonus
+
+    return _finish_score_record(record)
+
+class TruthState:
+    """
+    What can still happen from a truth bracket, computed once per truth file.
+
+    A team is alive until it loses a decided game. A slot can still be won by
+    its decided winner, or, while it is undecided, by any alive team from
+    its part of the bracket. From these masks every user's remaining points
+    are a masked lookup over their pick vector, and the best possible
+    completion of the truth bracket is a small dynamic program over the
+    bracket tree.
+    """
+
+    def __init__(self, truth_bracket, rules=None):
+        """
+        Build the masks and the remaining-points tables.
+
+        Args:
+            truth_bracket (dict): The truth bracket
+            rules (ScoringRules, optional): Scoring rules (default: get_scoring_rules())
+        """
+        self.rules = rules if rules is not None else get_scoring_rules()
+        self.fixed = encode_bracket(truth_bracket)
+        self.decided = self.fixed != EMPTY
+
+        # A team is out if it is in the subtree of a decided slot it did not win
+        teams = np.arange(NUM_TEAMS)
+        won = teams[None, :] == self.fixed[:, None]
+        lost = SLOT_TEAMS & self.decided[:, None] & ~won
+        self.alive = ~lost.any(axis=0)
+
+        # possible[slot, team] is True if team can still end up winning slot
+        self.possible = np.where(self.decided[:, None], won, SLOT_TEAMS & self.alive[None, :])
+
+        # Points still available for a pick of team in slot, with a zero
+        # column at index NUM_TEAMS for EMPTY picks
+        open_picks = self.possible & ~self.decided[:, None]
+        self.remaining_base = np.zeros((NUM_SLOTS, NUM_TEAMS + 1), dtype=np.int32)
+        self.remaining_bonus = np.zeros((NUM_SLOTS, NUM_TEAMS + 1), dtype=np.int32)
+        self.remaining_base[:, :NUM_TEAMS] = np.where(open_picks, self.rules.base, 0)
+        self.remaining_bonus[:, :NUM_TEAMS] = np.where(open_picks, self.rules.bonus, 0)
+
+    @staticmethod
+    def _pick_columns(picks):
+        """Map EMPTY picks onto the zero column of the remaining-points tables."""
+        picks = np.asarray(picks)
+        return np.where(picks == EMPTY, NUM_TEAMS, picks).astype(np.intp)
+
+    def potential(self, picks):
+        """
+        Get the points picks can still earn from undecided games.
+
+        Args:
+            picks (numpy.ndarray): Encoded picks of shape (63,) or (users, 63)
+
+        Returns:
+            tuple: (base, bonus) still available, as ints for one bracket or
+                   int arrays of shape (users,)
+        """
+        columns = self._pick_columns(picks)
+        slots = np.arange(NUM_SLOTS)
+        base = self.remaining_base[slots, columns].sum(axis=-1)
+        bonus = self.remaining_bonus[slots, columns].sum(axis=-1)
+        if np.ndim(base) == 0:
+            return int(base), int(bonus)
+        return base, bonus
+
+    def eliminated(self, picks):
+        """
+        Find the picks of undecided games that can no longer come true.
+
+        Args:
+            picks (numpy.ndarray): Encoded picks of shape (63,) or (users, 63)
+
+        Returns:
+            numpy.ndarray: Boolean mask with the shape of picks
+        """
+        picks = np.asarray(picks)
+        columns = np.where(picks == EMPTY, 0, picks).astype(np.intp)
+        still_possible = self.possible[np.arange(NUM_SLOTS), columns]
+        return (picks != EMPTY) & ~self.decided & ~still_possible
+
+    def best_remaining(self):
+        """
+        Get the most points any completion of the truth bracket can add.
+
+        Every undecided game earns its base points whoever wins, so the best
+        completion is the one with the largest upset bonus. It is found
+        bottom-up: for every slot and every team that can win it, the best
+        bonus in the slot's subtree with that team winning.
+
+        Returns:
+            tuple: (base, bonus) still available to a perfect bracket
+        """
+        bonus = np.where(self.decided[:, None], 0, self.rules.bonus).astype(np.float64)
+        best = np.full((NUM_SLOTS, NUM_TEAMS), -np.inf)
+        for slot in range(NUM_SLOTS):
+            sides = []
+            for node in FEEDERS[slot]:
+                if node < NUM_TEAMS:
+                    side = np.full(NUM_TEAMS, -np.inf)
+                    side[node] = 0.0
+                else:
+                    side = best[node - NUM_TEAMS]
+                sides.append(side)
+            # The winner's own subtree plus the best of the other subtree
+            through = np.maximum(sides[0] + sides[1].max(), sides[1] + sides[0].max())
+            best[slot] = np.where(self.possible[slot], bonus[slot] + through, -np.inf)
+
+        base = int(self.rules.slot_base[~self.decided].sum())
+        return base, int(best[NUM_SLOTS - 1].max())
+
+def build_pick_table(picks, points):
+    """
+    Tabulate what every user earns for every possible winner of every slot.
+
+    table[slot, team, user] is the points the user's pick in that slot earns
+    if team wins it: the pick's base-plus-bonus value where the user picked
+    that team, and 0 elsewhere. It is the equality mask of the picks times
+    their per-slot points, laid out so that scoring an outcome is one row
+    lookup per slot.
+
+    With a stack of points tables, one column block of users is laid out
+    per table, so every table is scored by the same row lookups.
+
+    Args:
+        picks (numpy.ndarray): int8 array of shape (users, 63)
+        points (numpy.ndarray): Points table from build_points_table, or a
+                                stack of them of shape (tables, 63, 64)
+
+    Returns:
+        numpy.ndarray: int32 array of shape (63, 65, tables * users). Row 64
+                       is all zero, so an EMPTY (-1) winner looks up nothing.
+    """
+    picks = np.asarray(picks)
+    points = np.asarray(points)
+    tables = points.reshape((-1,) + points.shape[-2:])
+    num_users = len(picks)
+    table = np.zeros((NUM_SLOTS, NUM_TEAMS + 1, len(tables) * num_users), dtype=np.int32)
+    for slot in range(NUM_SLOTS):
+        users = np.flatnonzero(picks[:, slot] != EMPTY)
+        teams = picks[users, slot].astype(np.intp)
+        for table_idx, points_table in enumerate(tables):
+            table[slot, teams, users + table_idx * num_users] = points_table[slot, teams]
+    return table
+
+def decided_slots(outcomes):
+    """
+    Find the slots that have the same winner in every simulation.
+
+    For simulations of one truth bracket these are the games the truth
+    bracket has already decided.
+
+    Args:
+        outcomes (numpy.ndarray): int8 array of shape (sims, 63)
+
+    Returns:
+        numpy.ndarray: int8 array of shape (63,) with the common winner of
+                       each decided slot and EMPTY elsewhere
+    """
+    outcomes = np.asarray(outcomes)
+    fixed = np.full(NUM_SLOTS, EMPTY, dtype=np.int8)
+    if len(outcomes) == 0:
+        return fixed
+    same = (outcomes == outcomes[0]).all(axis=0)
+    fixed[same] = outcomes[0, same]
+    return fixed
+
+def score_outcomes(picks, outcomes, points, block_size=SCORE_BLOCK_SIZE, fixed=None):
+    """
+    Score every user against every simulated outcome.
+
+    Points from decided games are the same in every simulation, so each
+    user's locked-in score is added up once from the fixed results and only
+    the undecided slots are scored per simulation. Outcomes are scored in
+    blocks of block_size simulations so that the running totals of a block
+    stay in cache while the undecided slots are added in.
+
+    A stack of points tables (for example one per rule set) is scored in
+    the same pass: the winners of each block are read once and every table
+    adds one more column block to each row lookup.
+
+    Args:
+        picks (numpy.ndarray): int8 array of shape (users, 63)
+        outcomes (numpy.ndarray): int8 array of shape (sims, 63)
+        points (numpy.ndarray): Points table from build_points_table, or a
+                                stack of them of shape (tables, 63, 64)
+        block_size (int): Number of simulations scored together
+        fixed (numpy.ndarray, optional): Encoded truth bracket the outcomes
+                                         complete (EMPTY for undecided slots).
+                                         Every outcome must agree with it.
+                                         If None, all 63 slots are scored.
+
+    Returns:
+        numpy.ndarray: int32 array of shape (users, sims) matching
+                       score_bracket()['total_with_bonus'], or of shape
+                       (tables, users, sims) for a stack of tables
+    """
+    points = np.asarray(points)
+    table = build_pick_table(picks, points)
+    scores = np.empty((table.shape[2], len(outcomes)), dtype=np.int32)
+
+    if fixed is None:
+        fixed = np.full(NUM_SLOTS, EMPTY, dtype=np.int8)
+    fixed = np.asarray(fixed)
+    decided = np.flatnonzero(fixed != EMPTY)
+    # Slots where no pick can earn anything are skipped altogether
+    scorable = points.reshape((-1,) + points.shape[-2:]).any(axis=(0, 2))
+    undecided = np.flatnonzero((fixed == EMPTY) & scorable)
+
+    # Locked-in score of every user from the decided games
+    locked = table[decided, fixed[decided].astype(np.intp)].sum(axis=0, dtype=np.int32)
+
+    for start in range(0, len(outcomes), block_size):
+        # Slot-major copy of the block's undecided slots, so each slot's
+        # winners are contiguous
+        block = np.asarray(outcomes[start:start + block_size])
+        winners = np.ascontiguousarray(block[:, undecided].T).astype(np.intp)
+        block_scores = np.tile(locked, (len(block), 1))
+        if use_loops():
+            add_slot_points(block_scores, table, winners, undecided)
+        else:
+            for row, slot in enumerate(undecided):
+                block_scores += table[slot][winners[row]]
+        scores[:, start:start + block_size] = block_scores.T
+
+    if points.ndim == 3:
+        return scores.reshape(len(points), len(picks), len(outcomes))
+    return scores
+
+def score_many(user_picks, truth_states, fields=None, rules=None, block_size=SCORE_BLOCK_SIZE, fixed=None):
+    """
+    Score many brackets against many truth states in one call.
+
+    A truth state is an encoded (partial or complete) truth bracket: a truth
+    file on the timeline, or one simulated outcome. Each requested field is
+    scored with the array kernel using its table from ScoringRules.field_table.
+
+    Args:
+        user_picks (numpy.ndarray): Encoded picks of shape (users, 63)
+        truth_states (numpy.ndarray): Encoded truth brackets of shape
+                                      (truths, 63), EMPTY for undecided games
+        fields (list, optional): Fields to compute (default: SCORE_FIELDS)
+        rules (ScoringRules, optional): Scoring rules (default: get_scoring_rules())
+        block_size (int): Number of truth states scored together
+        fixed (numpy.ndarray, optional): Results shared by every truth state,
+                                         as for score_outcomes
+
+    Returns:
+        numpy.ndarray: Structured array of shape (users, truths) with one
+                       int32 field per requested field; score_record turns an
+                       element into the dict score_bracket returns
+    """
+    if fields is None:
+        fields = SCORE_FIELDS
+    if rules is None:
+        rules = get_scoring_rules()
+    picks = np.atleast_2d(np.asarray(user_picks))
+    truths = np.atleast_2d(np.asarray(truth_states))
+
+    dtype = np.dtype([(field, SCORE_DTYPE[field]) for field in fields])
+    scores = np.zeros((len(picks), len(truths)), dtype=dtype)
+    for field in fields:
+        scores[field] = score_outcomes(picks, truths, rules.field_table(field), block_size, fixed)
+    return scores
+
+def score_record(score):
+    """
+    Convert one element of a score_many result into a score record dict.
+
+    Args:
+        score (numpy.void): Element of a score_many result
+
+    Returns:
+        dict: The fields as ints, in the layout score_bracket returns
+    """
+    return {field: int(score[field]) for field in score.dtype.names}
+
 # Function to compare a bracket with the truth bracket and add comparison CSS classes
 def compare_with_truth(bracket, truth_bracket=None):
     """
     Compare a bracket with the truth bracket and add CSS classes.
     
+    This annotates a copy of the bracket for display (classes, truthTeam,
+    isEliminated and bonus on every pick). To score a bracket, use
+    score_bracket, which does not copy anything.
+    
     Args:
         bracket: The bracket to compare
         truth_bracket: Optional truth bracket to compare against. If None,
@@ -135,9 +676,8 @@ def compare_with_truth(bracket, truth_bracket=None):
     # Deep copy the bracket to avoid modifying the original
     result_bracket = copy.deepcopy(bracket)
     
-    # Try to get the chalk bracket for bonus calculations
-    chalk_bracket = get_chalk_bracket()
-    # print(f"Chalk bracket loaded: {chalk_bracket is not None}")
+    # Bonuses come from the precomputed scoring rules
+    rules = get_scoring_rules()
     
     # Debug counts
     correct_count = 0
@@ -168,27 +708,12 @@ def compare_with_truth(bracket, truth_bracket=None):
                     try:
                         truth_team = truth_bracket[region][round_idx][i] if round_idx < len(truth_bracket[region]) else None
                         
-                        # Calculate potential bonus points regardless of whether this round exists in truth bracket
-                        if chalk_bracket and round_idx > 0:
-                            # Find the same POSITION in chalk bracket for this round
-                            chalk_team = None
-                            if round_idx < len(chalk_bracket[region]):
-                                # Get the team at the same position in chalk bracket
-                                if i < len(chalk_bracket[region][round_idx]):
-                                    chalk_team = chalk_bracket[region][round_idx][i]
-                            
-                            # Calculate bonus if we found the team in chalk bracket
-                            if chalk_team:
-                                seed_diff = abs(int(chalk_team.get("seed", 0)) - int(team.get("seed", 0)))
-                                if seed_diff > 0:
-                                    # If team's seed is higher (numerically) than chalk_team's seed, it's an upset
-                                    bonus = seed_diff * UPSET_BONUS_MULTIPLIERS[f"round_{round_idx}"]
-                                    team["bonus"] = int(bonus)  # Ensure it's an integer
-                                    bonus_count += 1
-                                    # print(f"Added bonus of {bonus} to {team['name']} in {region} round {round_idx} position {i}")
-                                else:
-                                    team["bonus"] = 0  # Explicitly set to zero instead of None
-                                    # print(f"Set bonus to 0 for {team['name']} in {region} round {round_idx} (no upset)")
+                        # Look up the potential bonus regardless of whether this round exists in truth bracket
+                        bonus = rules.seed_bonus(SLOT_INDEX[(region, round_idx, i)], team.get("seed", 0))
+                        if bonus is not None:
+                            team["bonus"] = bonus
+                            if bonus > 0:
+                                bonus_count += 1
                         
                         # If truth team is None (future round), we're done with this team
                         if not truth_team:
@@ -233,21 +758,10 @@ def compare_with_truth(bracket, truth_bracket=None):
             try:
                 truth_team = truth_bracket["finalFour"][i] if i < len(truth_bracket["finalFour"]) else None
                 
-                # Calculate potential bonus for all teams regardless of truth team
-                if chalk_bracket:
-                    # Get the chalk team at the same position in the Final Four
-                    chalk_team = None
-                    if i < len(chalk_bracket["finalFour"]):
-                        chalk_team = chalk_bracket["finalFour"][i]
-                    
-                    if chalk_team:
-                        seed_diff = abs(int(chalk_team.get("seed", 0)) - int(team.get("seed", 0)))
-                        if seed_diff > 0:
-                            bonus = seed_diff * UPSET_BONUS_MULTIPLIERS["final_four"]
-                            team["bonus"] = int(bonus)  # Ensure it's an integer
-                            # print(f"Added Final Four bonus of {bonus} to {team['name']} (pos {i})")
-                        else:
-                            team["bonus"] = 0
+                # Look up the potential bonus for all teams regardless of truth team
+                bonus = rules.seed_bonus(SLOT_INDEX[("finalFour", i)], team.get("seed", 0))
+                if bonus is not None:
+                    team["bonus"] = bonus
                 
                 # Skip comparison if truth team doesn't exist yet
                 if not truth_team:
@@ -289,21 +803,10 @@ def compare_with_truth(bracket, truth_bracket=None):
             try:
                 truth_team = truth_bracket["championship"][i] if i < len(truth_bracket["championship"]) else None
                 
-                # Calculate potential bonus for all teams regardless of truth team
-                if chalk_bracket:
-                    # Get the chalk team at the same position in the Championship
-                    chalk_team = None
-                    if i < len(chalk_bracket["championship"]):
-                        chalk_team = chalk_bracket["championship"][i]
-                    
-                    if chalk_team:
-                        seed_diff = abs(int(chalk_team.get("seed", 0)) - int(team.get("seed", 0)))
-                        if seed_diff > 0:
-                            bonus = seed_diff * UPSET_BONUS_MULTIPLIERS["championship"]
-                            team["bonus"] = int(bonus)  # Ensure it's an integer
-                            # print(f"Added Championship bonus of {bonus} to {team['name']} (pos {i})")
-                        else:
-                            team["bonus"] = 0
+                # Look up the potential bonus for all teams regardless of truth team
+                bonus = rules.seed_bonus(SLOT_INDEX[("championship", i)], team.get("seed", 0))
+                if bonus is not None:
+                    team["bonus"] = bonus
                 
                 # Skip comparison if truth team doesn't exist yet
                 if not truth_team:
@@ -343,19 +846,10 @@ def compare_with_truth(bracket, truth_bracket=None):
         try:
             truth_champion = truth_bracket["champion"]
             
-            # Calculate potential bonus for champion regardless of truth champion
-            if chalk_bracket:
-                # Get the chalk champion
-                chalk_team = chalk_bracket.get("champion")
-                
-                if chalk_team:
-                    seed_diff = abs(int(chalk_team.get("seed", 0)) - int(result_bracket["champion"].get("seed", 0)))
-                    if seed_diff > 0:
-                        bonus = seed_diff * UPSET_BONUS_MULTIPLIERS["champion"]
-                        result_bracket["champion"]["bonus"] = int(bonus)  # Ensure it's an integer
-                        # print(f"Added Champion bonus of {bonus} to {result_bracket['champion']['name']}")
-                    else:
-                        result_bracket["champion"]["bonus"] = 0
+            # Look up the potential bonus for champion regardless of truth champion
+            bonus = rules.seed_bonus(SLOT_INDEX[("champion",)], result_bracket["champion"].get("seed", 0))
+            if bonus is not None:
+                result_bracket["champion"]["bonus"] = bonus
             
             # Skip comparison if truth champion doesn't exist yet
             if not truth_champion:
@@ -534,27 +1028,8 @@ def get_correct_picks_and_scores(compared_bracket):
             correct_picks["champion_bonus"] = compared_bracket["champion"]["bonus"]
             correct_picks["total_bonus"] += compared_bracket["champion"]["bonus"]
 
-    # Calculate scores using standard point values
-    correct_picks["round_1_score"] = correct_picks["round_1"] * 10
-    correct_picks["round_2_score"] = correct_picks["round_2"] * 20
-    correct_picks["round_3_score"] = correct_picks["round_3"] * 40
-    correct_picks["final_four_score"] = correct_picks["final_four"] * 80
-    correct_picks["championship_score"] = correct_picks["championship"] * 120
-    correct_picks["champion_score"] = correct_picks["champion"] * 160
-    
-    # Calculate total score
-    correct_picks["total_score"] = (
-        correct_picks["round_1_score"] + 
-        correct_picks["round_2_score"] + 
-        correct_picks["round_3_score"] + 
-        correct_picks["final_four_score"] + 
-        correct_picks["championship_score"] + 
-        correct_picks["champion_score"]
-    )
-    
-    # Calculate total with bonus
-    correct_picks["total_with_bonus"] = correct_picks["total_score"] + correct_picks["total_bonus"]
-    return correct_picks
+    # Calculate scores from the base points of each round, and the totals
+    return _finish_score_record(correct_picks)
     
 
 if __name__ == "__main__":
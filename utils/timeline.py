@@ -0,0 +1,131 @@
+"""
+Score Timeline Module
+
+This module precomputes every user's score and rank at every truth file.
+Truth files are nested: each one adds a single result to the one before, so
+a user's score record at one truth file is the record at the previous file
+plus the points for the one new game. The timeline is built in game order
+with one such update per truth file, and the leaderboard and timeline
+endpoints then read scores and ranks from it by lookup.
+"""
+
+import numpy as np
+
+from utils.bracket_encoding import EMPTY, encode_brackets
+from utils.scoring import SCORE_DTYPE, SLOT_ROUND_NAMES, get_scoring_rules, score_many, score_record
+
+def competition_ranks(scores):
+    """
+    Rank users by score in every column, giving tied users the same rank.
+
+    A user's rank is one plus the number of users with a strictly higher
+    score, as on the leaderboard.
+
+    Args:
+        scores (numpy.ndarray): Score array of shape (users, columns)
+
+    Returns:
+        numpy.ndarray: int32 array of shape (users, columns)
+    """
+    scores = np.asarray(scores)
+    ranks = np.empty(scores.shape, dtype=np.int32)
+    for column in range(scores.shape[1]):
+        ordered = np.sort(scores[:, column])
+        higher = len(ordered) - np.searchsorted(ordered, scores[:, column], side='right')
+        ranks[:, column] = higher + 1
+    return ranks
+
+class ScoreTimeline:
+    """Score records and ranks of every user at every truth file."""
+
+    def __init__(self, usernames, picks, truth_brackets, rules=None):
+        """
+        Build the timeline.
+
+        Args:
+            usernames (list): Usernames, one per row of picks
+            picks (numpy.ndarray): Encoded picks of shape (users, 63)
+            truth_brackets (list): Truth brackets in any order; columns of
+                                   the timeline follow this order
+            rules (ScoringRules, optional): Scoring rules (default: get_scoring_rules())
+        """
+        self.usernames = list(usernames)
+        self.user_index = {username: idx for idx, username in enumerate(self.usernames)}
+        self.picks = np.asarray(picks)
+        self.rules = rules if rules is not None else get_scoring_rules()
+        self.truths = encode_brackets(truth_brackets)
+
+        self.scores = np.zeros((len(self.usernames), len(self.truths)), dtype=SCORE_DTYPE)
+        self.incremental_steps = 0
+        self.full_steps = 0
+        self._build()
+
+        self.ranks = competition_ranks(self.scores["total_with_bonus"])
+
+    def _build(self):
+        """Fill in the score records in game order."""
+        decided = self.truths != EMPTY
+        previous = None
+        # Truth files with fewer results come first
+        for column in np.argsort(decided.sum(axis=1), kind='stable'):
+            if previous is not None and self._extends(previous, column):
+                new_slots = np.flatnonzero(decided[column] & ~decided[previous])
+                self.scores[:, column] = self.scores[:, previous]
+                for slot in new_slots:
+                    self._add_game(column, slot)
+                self.incremental_steps += 1
+            else:
+                # First truth file, or a correction: score it from scratch
+                self.scores[:, column] = score_many(self.picks, self.truths[column])[:, 0]
+                self.full_steps += 1
+            previous = column
+
+    def _extends(self, previous, column):
+        """Check that a truth file keeps every result of another one."""
+        earlier = self.truths[previous] != EMPTY
+        return bool((self.truths[column][earlier] == self.truths[previous][earlier]).all())
+
+    def _add_game(self, column, slot):
+        """Add the points for one newly decided game to a column."""
+        winner = int(self.truths[column, slot])
+        correct = (self.picks[:, slot] == winner).astype(np.int32)
+        base = int(self.rules.slot_base[slot])
+        bonus = int(self.rules.bonus[slot, winner])
+        round_name = SLOT_ROUND_NAMES[slot]
+
+        # A view, so the column is updated in place
+        scores = self.scores[:, column]
+        for field, value in [(round_name, 1), ("total", 1),
+                             (f"{round_name}_score", base), ("total_score", base),
+                             (f"{round_name}_bonus", bonus), ("total_bonus", bonus),
+                             ("total_with_bonus", base + bonus)]:
+            scores[field] += correct * value
+
+    def record(self, username, column):
+        """
+        Get a user's score record at one truth file.
+
+        Args:
+            username (str): The user
+            column (int): Index of the truth file in the timeline
+
+        Returns:
+            dict: The score record, or None for an unknown user
+        """
+        user_idx = self.user_index.get(username)
+        if user_idx is None:
+            return None
+        return score_record(self.scores[user_idx, column])
+
+    def leaderboard(self, column):
+        """
+        Get the users in leaderboard order at one truth file.
+
+        Args:
+            column (int): Index of the truth file in the timeline
+
+        Returns:
+            list: Usernames sorted by rank; tied users keep their input order
+        """
+        order = np.argsort(self.ranks[:, column], kind='stable')
+        return [self.usernames[user_idx] for user_idx in order]